@@ -115,14 +115,18 @@ router.post("/followup", verifyToken, async (req, res) => {
 
 router.post("/chat", verifyToken, async (req, res) => {
     try {
-        const { message, history = [] } = req.body;
+        const { message, history = [], conversation_id } = req.body;
 
+        // The AI service keeps the conversation; history only seeds a new one
         const aiResponse = await fetch(`${PYTHON_AI_URL}/chat`, {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ message, history })
+            body: JSON.stringify(conversation_id ? { message, conversation_id } : { message, history })
         });
 
+        if (aiResponse.status === 404) {
+            return res.status(404).json({ message: "Conversation expired" });
+        }
         if (!aiResponse.ok) {
             return res.status(502).json({ message: "AI chat service error" });
         }
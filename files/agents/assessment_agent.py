@@ -18,6 +18,10 @@ This is the "brain" of the system — it synthesizes:
 
 from agents.triage_agent import TriageAgent
 from utils.llm_client import LLMClient
+from utils.log import get_logger
+from utils.usage import prompt_sections
+
+log = get_logger("assessment")
 
 ASSESSMENT_PROMPT = """
 You are a senior attending physician writing a formal clinical assessment.
@@ -81,14 +85,17 @@ class AssessmentAgent:
     async def run(self, session) -> dict:
         """Generate final SOAP note + full assessment."""
         medications_str = ", ".join(session.medications) if session.medications else "None reported"
+        rag_context = session.rag_context[:3000]
         prompt = ASSESSMENT_PROMPT.format(
             context=session.to_context_string(),
             medications=medications_str,
-            rag_context=session.rag_context[:3000],
+            rag_context=rag_context,
             preliminary_triage=session.preliminary_triage or "UNKNOWN"
         )
+        sections = prompt_sections(prompt, context=session.context_sections(), medications=medications_str,
+                                   rag=rag_context)
 
-        result = await self.llm.json_call(prompt, max_tokens=2000)
+        result = await self.llm.json_call(prompt, max_tokens=2000, sections=sections)
 
         # Ensure all expected keys exist with fallbacks
         result.setdefault("triage", {
@@ -109,7 +116,6 @@ class AssessmentAgent:
             "This AI assessment is for informational purposes only. "
             "Consult a qualified healthcare provider.")
 
-        print(f"           [ASSESSMENT] Final triage: {result['triage']['color']} "
-              f"(score: {result['triage']['urgency_score']}/10)")
+        log.info("Final triage", triage=result["triage"]["color"], urgency_score=result["triage"]["urgency_score"])
 
         return result
@@ -0,0 +1,162 @@
+"""
+BulkDrugChecker
+================
+Screens many patient medication lists in one run (overnight formulary /
+panel screening) with a single shared DrugInteractionAgent:
+
+  - each drug label is fetched once for the whole batch (agent.label_memo)
+  - each uncached pair is synthesized once, even when several patients
+    that share it are in flight together (agent pair coalescing)
+  - at most BULK_CONCURRENCY patients are checked at a time, and input is
+    only pulled as slots free up
+  - results are yielded per patient as they finish, then one summary
+
+Input records:  {"id": "p1", "medications": [...], "conditions": [...]}
+Output records: {"id": "p1", "interactions": [...]}  or  {"id": ..., "error": ...}
+                ("failed_pairs": n when some pairs could not be checked — their
+                interactions carry source "failed")
+Final record:   {"summary": {...throughput...}}
+
+Used by POST /drug-check/bulk and bulk_drug_check.py.
+"""
+
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+from agents.drug_agent import DrugInteractionAgent
+from utils.tracing import span
+
+BULK_CONCURRENCY = int(os.getenv("MEDAI_BULK_CONCURRENCY", "8"))
+
+
+async def iter_ndjson(chunks):
+    """Parse NDJSON from an async iterator of byte chunks. Bad lines yield an {"error"} record."""
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield parse_ndjson_line(line, line_no)
+    if buffer.strip():
+        yield parse_ndjson_line(buffer, line_no + 1)
+
+
+def parse_ndjson_line(line: bytes, line_no: int) -> dict:
+    try:
+        record = json.loads(line)
+    except ValueError as e:  # JSONDecodeError, or UnicodeDecodeError for non-UTF-8 bytes
+        return {"id": f"line-{line_no}", "error": f"Invalid JSON: {e}"}
+    if isinstance(record, list):
+        record = {"medications": record}
+    if not isinstance(record, dict):
+        return {"id": f"line-{line_no}", "error": "Expected an object or a list of medications"}
+    record.setdefault("id", f"line-{line_no}")
+    return record
+
+
+class BulkDrugChecker:
+
+    def __init__(self, concurrency: int = BULK_CONCURRENCY):
+        self.agent = DrugInteractionAgent()
+        self.agent.label_memo = {}
+        self.concurrency = concurrency
+        self.patients = 0
+        self.errors = 0
+        self.interactions = 0
+        self.incomplete = 0
+
+    async def run(self, records):
+        """Async generator: check every record, yield per-patient results then a summary."""
+        start = time.perf_counter()
+        slots = asyncio.Semaphore(self.concurrency)
+        results = asyncio.Queue()
+        tasks = set()
+
+        async def check(record):
+            try:
+                await results.put(await self._check_one(record))
+            finally:
+                slots.release()
+
+        async def feed():
+            try:
+                async for record in _aiter(records):
+                    await slots.acquire()
+                    task = asyncio.ensure_future(check(record))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            finally:
+                # Patients already started still report, even if reading the input failed
+                if tasks:
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                await results.put(None)
+
+        feeder = asyncio.ensure_future(feed())
+        try:
+            while (result := await results.get()) is not None:
+                yield result
+            await feeder  # re-raises an input error once the finished results are out
+        finally:
+            feeder.cancel()
+            for task in list(tasks):
+                task.cancel()
+
+        yield {"summary": self.summary(time.perf_counter() - start)}
+
+    async def _check_one(self, record: dict) -> dict:
+        self.patients += 1
+        if "error" in record:
+            self.errors += 1
+            return record
+        medications = record.get("medications") or []
+        conditions = record.get("conditions") or []
+        for field, value in (("medications", medications), ("conditions", conditions)):
+            if not _is_string_list(value):
+                self.errors += 1
+                return {"id": record["id"], "error": f"{field} must be a list of strings"}
+        conditions = [{"name": c} for c in conditions]
+        try:
+            with span("drug", kind="agent", patient=record["id"]):
+                interactions = await self.agent.run(SimpleNamespace(medications=medications), conditions)
+        except Exception as e:
+            self.errors += 1
+            return {"id": record["id"], "error": str(e)}
+        row = {"id": record["id"], "interactions": interactions}
+        failed = sum(1 for item in interactions if item.get("source") == "failed")
+        self.interactions += len(interactions) - failed
+        if failed:
+            self.incomplete += 1
+            row["failed_pairs"] = failed
+        return row
+
+    def summary(self, elapsed: float) -> dict:
+        return {
+            "patients": self.patients,
+            "errors": self.errors,
+            "incomplete": self.incomplete,
+            "interactions": self.interactions,
+            "labels_fetched": len(self.agent.label_memo),
+            "llm_calls": self.agent.llm_calls,
+            "pair_cache": self.agent.pair_cache.stats(),
+            "elapsed_s": round(elapsed, 2),
+            "patients_per_s": round(self.patients / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+def _is_string_list(value) -> bool:
+    # A bare string would otherwise be checked one character at a time
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+async def _aiter(records):
+    if hasattr(records, "__aiter__"):
+        async for record in records:
+            yield record
+    else:
+        for record in records:
+            yield record
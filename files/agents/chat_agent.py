@@ -0,0 +1,127 @@
+"""
+ChatAgent
+==========
+Patient-facing medical chatbot behind /chat and /chat/stream — answers
+health questions in plain language.
+
+Uses the async Groq client so a chat never blocks the event loop.
+stream() yields text deltas as the model produces them: time to first
+token is what the user waits for, not the whole completion. Closing the
+generator (client disconnected) closes the upstream stream, so an
+abandoned chat stops generating tokens.
+
+The conversation context comes from utils.conversation_store (summary +
+recent turns); summarize() is the compaction step it runs in the
+background for long conversations.
+
+Config (env):
+  MEDAI_CHAT_MAX_TOKENS   completion token limit (default 300)
+  MEDAI_CHAT_SUMMARY_MAX_TOKENS  summary length limit (default 250)
+"""
+
+import asyncio
+import os
+from groq import AsyncGroq
+from utils.llm_client import LLMClient, record_llm_call
+from utils.log import get_logger
+from utils.tracing import span
+from utils.usage import prompt_sections
+
+CHAT_MAX_TOKENS = int(os.getenv("MEDAI_CHAT_MAX_TOKENS", "300"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("MEDAI_CHAT_SUMMARY_MAX_TOKENS", "250"))
+CHAT_FALLBACK = ("I'm having trouble connecting right now. "
+                 "For urgent concerns, please call your doctor or emergency services.")
+
+log = get_logger("chat")
+
+CHAT_PROMPT = """You are MediTriage AI — a friendly, knowledgeable medical assistant.
+Answer health questions clearly in plain English. Always recommend consulting a doctor for diagnosis.
+Keep answers concise (2-4 sentences unless detail is needed). Never diagnose directly.
+
+Conversation so far:
+{history}
+Patient: {message}
+
+Respond in plain text (NOT JSON). Be empathetic, clear, and helpful."""
+
+SUMMARY_PROMPT = """Summarize this conversation between a patient and a medical assistant for the assistant's own memory.
+Keep every medically relevant detail: symptoms, durations, medications, conditions, age, answers already given.
+Write 3-6 plain sentences, no preamble.
+
+Earlier summary:
+{summary}
+
+Conversation to add:
+{transcript}"""
+
+
+class ChatAgent:
+
+    def __init__(self):
+        self.client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
+
+    def _request(self, message: str, context: str) -> dict:
+        prompt = CHAT_PROMPT.format(history=context, message=message)
+        return {
+            "model": LLMClient.MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": CHAT_MAX_TOKENS,
+            "temperature": 0.7,
+        }
+
+    @staticmethod
+    def _sections(request: dict, message: str, context: str) -> dict:
+        return prompt_sections(request["messages"][0]["content"], history=context, message=message)
+
+    async def reply(self, message: str, context: str) -> str:
+        request = self._request(message, context)
+        with span("chat", kind="llm", model=LLMClient.MODEL) as call:
+            try:
+                resp = await self.client.chat.completions.create(**request)
+            except Exception as e:
+                record_llm_call(call, LLMClient.MODEL, status="error")
+                log.error("Groq error", error=f"{type(e).__name__}: {e}")
+                return CHAT_FALLBACK
+            record_llm_call(call, LLMClient.MODEL, resp.usage, sections=self._sections(request, message, context))
+            return resp.choices[0].message.content.strip()
+
+    async def stream(self, message: str, context: str):
+        """Async generator of text deltas. Closing it early cancels the upstream generation."""
+        request = self._request(message, context)
+        with span("chat_stream", kind="llm", model=LLMClient.MODEL) as call:
+            try:
+                stream = await self.client.chat.completions.create(**request, stream=True)
+            except Exception:
+                record_llm_call(call, LLMClient.MODEL, status="error")
+                raise
+            usage, status = None, "cancelled"
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    # Groq reports usage on the final chunk only
+                    usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+                status = "ok"
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                record_llm_call(call, LLMClient.MODEL, usage, status, sections=self._sections(request, message, context))
+                # Shielded: on disconnect this runs inside a cancelled task, and the close must still happen
+                await asyncio.shield(stream.close())
+
+    async def summarize(self, summary: str, transcript: str) -> str:
+        with span("chat_summary", kind="llm", model=LLMClient.MODEL) as call:
+            try:
+                resp = await self.client.chat.completions.create(
+                    model=LLMClient.MODEL,
+                    messages=[{"role": "user", "content": SUMMARY_PROMPT.format(summary=summary or "(none)",
+                                                                                transcript=transcript)}],
+                    max_tokens=CHAT_SUMMARY_MAX_TOKENS,
+                    temperature=0.2,
+                )
+            except Exception:
+                record_llm_call(call, LLMClient.MODEL, status="error")
+                raise
+            record_llm_call(call, LLMClient.MODEL, resp.usage)
+            return resp.choices[0].message.content.strip()
@@ -7,10 +7,20 @@ Checks for drug interactions using a two-layer approach:
              Queries https://api.fda.gov/drug/label.json
              Fetches drug label warnings and interaction sections
              Real FDA data, updated regularly
+             Served from a local bulk-dump store when one is built
+             (import_openfda_labels.py), else cached per drug (LabelCache)
 
-  Layer 2 — LLM Synthesis
-             Sends drug list + conditions to LLM to identify
-             clinically significant interactions with proposed treatments
+  Layer 2 — Local interaction table (utils/interaction_table.py)
+             Well-known pairs (e.g. warfarin + NSAID) answered directly,
+             no LLM call
+
+  Layer 3 — LLM Synthesis, memoized per pair (utils/pair_cache.py)
+             The check is split into unordered drug-drug and drug-condition
+             pairs. Pairs answered for any earlier patient come from the
+             pair cache; only the rest go to the LLM, batched in one prompt.
+             A pair the LLM gave no usable answer for is reported with
+             severity "Unknown" and source "failed" — never as "no
+             interaction"
 
 OpenFDA Docs: https://open.fda.gov/apis/drug/label/
 
@@ -24,9 +34,32 @@ import asyncio
 import aiohttp
 import json
 import os
+from utils.drug_names import get_drug_normalizer
+from utils.interaction_table import split_known_pairs
+from utils.pair_cache import condition_pair_key, drug_pair_key, get_pair_cache
+from utils.http_client import get_http_session, openfda_slot
+from utils.label_cache import get_label_cache
+from utils.label_stream import LabelSectionExtractor
+from utils.label_store import LABEL_FIELDS, OPENFDA_OFFLINE, get_offline_store
 from utils.llm_client import LLMClient
+from utils.log import get_logger
+from utils.metrics import counter
+from utils.tracing import span
+from utils.usage import prompt_sections
 
 OPENFDA_BASE = "https://api.fda.gov/drug/label.json"
+SECTION_CHARS = 500
+STREAM_CHUNK = 16 * 1024
+
+OPENFDA_REQUESTS = counter("medai_openfda_requests_total", "OpenFDA label requests by HTTP status", ("status",))
+
+log = get_logger("drug")
+
+# Bump when DRUG_INTERACTION_PROMPT changes — invalidates cached pair results
+INTERACTION_PROMPT_VERSION = "2"
+
+# Placeholder conditions that carry no drug-condition signal
+GENERIC_CONDITIONS = {"", "unknown", "general health check"}
 
 DRUG_INTERACTION_PROMPT = """
 You are a clinical pharmacist reviewing potential drug interactions.
@@ -35,7 +68,12 @@ Patient's current medications: {medications}
 Likely conditions being assessed: {conditions}
 OpenFDA interaction data retrieved: {fda_data}
 
-Identify ALL clinically relevant drug-drug interactions and drug-condition interactions.
+Combinations to evaluate (each has an id):
+{pairs}
+Already identified (do NOT repeat these): {known}
+
+Identify ALL clinically relevant interactions within the combinations to evaluate.
+Only report combinations from the list above, and tag each with its pair_id.
 For each interaction found:
   - Severity: Minor (nuisance), Moderate (monitor), Major (avoid/emergency)
   - Clinical consequence
@@ -45,6 +83,7 @@ Respond ONLY in this JSON format:
 {{
   "interactions": [
     {{
+      "pair_id": "P1",
       "drug1": "medication name",
       "drug2": "other medication or condition",
       "severity": "Minor|Moderate|Major",
@@ -59,10 +98,21 @@ Respond ONLY in this JSON format:
 """
 
 
+class PairSynthesisFailed(Exception):
+    """A pair got no parseable answer from the LLM call that was synthesizing it."""
+
+
 class DrugInteractionAgent:
 
     def __init__(self):
         self.llm = LLMClient()
+        self.normalizer = get_drug_normalizer()
+        self.pair_cache = get_pair_cache(f"{INTERACTION_PROMPT_VERSION}:{LLMClient.MODEL}")
+        # Pairs currently being synthesized by another run() on this agent → future of items
+        self._pair_inflight = {}
+        # Set to {} (see BulkDrugChecker) to fetch each label once per agent lifetime
+        self.label_memo = None
+        self.llm_calls = 0
 
     async def run(self, session, conditions: list) -> list:
         """
@@ -72,72 +122,280 @@ class DrugInteractionAgent:
         if not session.medications:
             return []
 
-        fda_data = await self._query_openfda(session.medications)
+        canonical = {drug: self.normalizer.normalize(drug) for drug in session.medications}
+        # Canonical → this patient's spelling; several entries for one drug ("Advil", "ibuprofen")
+        # are all shown, so nothing the patient listed disappears from the report
+        display = {}
+        for drug, name in canonical.items():
+            if name not in display:
+                display[name] = drug
+            elif drug.strip().lower() not in display[name].lower().split(" / "):
+                display[name] = f"{display[name]} / {drug}"
 
-        condition_names = [c.get("name", "") for c in conditions]
-        prompt = DRUG_INTERACTION_PROMPT.format(
-            medications=", ".join(session.medications),
-            conditions=", ".join(condition_names) or "Unknown",
-            fda_data=json.dumps(fda_data, indent=2)[:2000]  # truncate for token budget
-        )
+        known, unknown = split_known_pairs(list(canonical.values()))
+        interactions = [
+            {
+                "drug1": display[a], "drug2": display[b],
+                "severity": severity, "mechanism": mechanism,
+                "description": description, "action": action,
+                "source": "table",
+            }
+            for (a, b), (severity, mechanism, description, action) in known.items()
+        ]
+
+        condition_names = [c.get("name", "") for c in conditions
+                           if c.get("name", "").strip().lower() not in GENERIC_CONDITIONS]
 
-        result = await self.llm.json_call(prompt)
-        interactions = result.get("interactions", [])
+        # Every combination that still needs synthesis, keyed for the pair cache
+        wanted = {drug_pair_key(a, b): (a, b) for a, b in unknown}
+        for name in display:
+            for condition in condition_names:
+                wanted[condition_pair_key(name, condition)] = (name, condition)
 
-        print(f"           [DRUG] Found {len(interactions)} interaction(s). "
-              f"Overall risk: {result.get('overall_risk', 'Unknown')}")
+        cached = await self.pair_cache.get_many(list(wanted))
+        for key, items in cached.items():
+            interactions.extend(self._relabel(item, display, "cache") for item in items)
+
+        pending = {key: pair for key, pair in wanted.items() if key not in cached}
+        # Pairs another concurrent check is already sending are awaited, not re-sent
+        waiting = {key: self._pair_inflight[key] for key in pending if key in self._pair_inflight}
+        own = {key: pair for key, pair in pending.items() if key not in waiting}
+
+        if own:
+            interactions.extend(await self._synthesize_shared(
+                session.medications, canonical, display, condition_names, own, known))
+        for key, future in waiting.items():
+            try:
+                items = await future
+            except PairSynthesisFailed:
+                interactions.append(self._failed(wanted[key], display))
+                continue
+            interactions.extend(self._relabel(item, display, "cache") for item in items)
+
+        if not own:
+            log.info("Interactions from local table/pair cache, LLM skipped",
+                     interactions=len(interactions), cached_pairs=len(cached) + len(waiting))
+            return interactions
+
+        log.info("Interactions found", interactions=len(interactions), table=len(known),
+                 cached_pairs=len(cached) + len(waiting), llm_pairs=len(own))
 
         return interactions
 
-    async def _query_openfda(self, medications: list) -> dict:
+    async def _synthesize_shared(self, medications, canonical, display, condition_names, pending, known) -> list:
         """
-        Query OpenFDA drug label API for interaction warnings.
-        Returns dict of {drug_name: interaction_warnings}
+        _synthesize, publishing each pair's result to concurrent runs waiting on it. If the
+        call raises, waiters get the same exception; pairs without a parsed result fail.
         """
-        results = {}
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in pending}
+        self._pair_inflight.update(futures)
+        try:
+            by_key, unmatched = await self._synthesize(medications, canonical, display,
+                                                       condition_names, pending, known)
+        except BaseException as exc:
+            if not isinstance(exc, Exception):  # cancelled: the waiters were not
+                exc = PairSynthesisFailed("Synthesis was cancelled")
+            self._publish(futures, {}, exc)
+            raise
+        self._publish(futures, by_key, PairSynthesisFailed("No parseable result for this pair"))
 
-        async with aiohttp.ClientSession() as http_session:
-            tasks = [self._fetch_drug_label(http_session, drug) for drug in medications]
-            drug_data = await asyncio.gather(*tasks, return_exceptions=True)
+        fresh = [self._relabel(item, display, "llm") for items in by_key.values() for item in items]
+        fresh.extend(dict(item, source="llm") for item in unmatched)
+        failed = [key for key in pending if key not in by_key]
+        if failed:
+            log.warning("Interaction synthesis incomplete", failed_pairs=len(failed), pairs=len(pending))
+            fresh.extend(self._failed(pending[key], display) for key in failed)
+        return fresh
 
-        for drug, data in zip(medications, drug_data):
-            if isinstance(data, Exception):
-                results[drug] = f"[OpenFDA query failed: {data}]"
+    def _publish(self, futures: dict, by_key: dict, failure: Exception):
+        for key, future in futures.items():
+            self._pair_inflight.pop(key, None)
+            if key in by_key:
+                future.set_result(by_key[key])
             else:
-                results[drug] = data
+                future.set_exception(failure)
+                future.exception()  # retrieved: nobody may be waiting on this pair
 
-        return results
+    async def _synthesize(self, medications, canonical, display, condition_names, pending, known) -> tuple:
+        """
+        One batched LLM call for all uncached pairs; caches each pair's result.
+        Returns ({pair_key: items with canonical names}, unattributed items).
+        """
+        ids = {f"P{i}": key for i, key in enumerate(pending, 1)}
+        pending_drugs = {pending[key][0] for key in pending} | {
+            pending[key][1] for key in pending if key.startswith("dd:")
+        }
+        fda_data = await self._query_openfda([d for d in medications if canonical[d] in pending_drugs])
 
-    async def _fetch_drug_label(self, session: aiohttp.ClientSession, drug_name: str) -> str:
-        """Fetch drug label from OpenFDA and extract interaction section."""
-        url = f"{OPENFDA_BASE}?search=openfda.brand_name:{drug_name}+generic_name:{drug_name}&limit=1"
-        try:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=8)) as resp:
-                if resp.status != 200:
-                    url2 = f"{OPENFDA_BASE}?search=openfda.generic_name:{drug_name.lower()}&limit=1"
-                    async with session.get(url2, timeout=aiohttp.ClientTimeout(total=8)) as resp2:
-                        if resp2.status != 200:
-                            return f"No FDA data found for {drug_name}"
-                        data = await resp2.json()
-                else:
-                    data = await resp.json()
-
-            results = data.get("results", [])
-            if not results:
-                return f"No label found for {drug_name}"
-
-            label = results[0]
-            sections = []
-            for field in ["drug_interactions", "warnings", "contraindications", "precautions"]:
-                content = label.get(field)
-                if content:
-                    if isinstance(content, list):
-                        content = " ".join(content)
-                    sections.append(f"[{field.upper()}] {content[:500]}")
-
-            return "\n".join(sections) if sections else f"No interaction data in FDA label for {drug_name}"
-
-        except asyncio.TimeoutError:
-            return f"[OpenFDA timeout for {drug_name}]"
-        except Exception as e:
-            return f"[OpenFDA error for {drug_name}: {str(e)}]"
+        def describe(key):
+            first, second = pending[key]
+            return f"{display[first]} + {display.get(second, second)}"
+
+        parts = {
+            "medications": ", ".join(medications),
+            "conditions": ", ".join(condition_names) or "Unknown",
+            "fda_data": json.dumps(fda_data, indent=2)[:2000],  # truncate for token budget
+            "pairs": "\n".join(f"  {pid}: {describe(key)}" for pid, key in ids.items()),
+            "known": "; ".join(f"{display[a]} + {display[b]}" for a, b in known) or "None",
+        }
+        prompt = DRUG_INTERACTION_PROMPT.format(**parts)
+
+        self.llm_calls += 1
+        result = await self.llm.json_call(prompt, sections=prompt_sections(prompt, **parts))
+        if not isinstance(result.get("interactions"), list):
+            return {}, []  # failed call — nothing to cache
+
+        by_key = {key: [] for key in pending}
+        unmatched = []
+        malformed = False
+        for item in result["interactions"]:
+            if not isinstance(item, dict):
+                malformed = True  # stray string/null from the model
+                continue
+            key = ids.get(str(item.pop("pair_id", "")).strip())
+            if key is None:
+                key = self._match_pair(item, pending)
+            if key is None:
+                unmatched.append(item)
+                continue
+            first, second = pending[key]
+            # Cache with canonical names so any patient's spelling can reuse it
+            item["drug1"], item["drug2"] = first, second
+            by_key[key].append(item)
+
+        if unmatched or malformed:
+            # Can't tell which pair these belong to, so empty results are not trustworthy
+            by_key = {key: items for key, items in by_key.items() if items}
+        await self.pair_cache.put_many(by_key)
+        return by_key, unmatched
+
+    def _match_pair(self, item: dict, pending: dict):
+        """Fallback when the LLM omits pair_id: match on normalized names."""
+        d1 = self.normalizer.normalize(item.get("drug1", ""))
+        d2 = self.normalizer.normalize(item.get("drug2", ""))
+        for key in (drug_pair_key(d1, d2), condition_pair_key(d1, item.get("drug2", "")),
+                    condition_pair_key(d2, item.get("drug1", ""))):
+            if key in pending:
+                return key
+        return None
+
+    @staticmethod
+    def _failed(pair: tuple, display: dict) -> dict:
+        """Marker for a pair that could not be checked — it must not read as "no interaction"."""
+        first, second = pair
+        return {
+            "drug1": display.get(first, first), "drug2": display.get(second, second),
+            "severity": "Unknown", "mechanism": "",
+            "description": "The interaction check for this combination could not be completed.",
+            "action": "Review this combination with a pharmacist before relying on this report.",
+            "source": "failed",
+        }
+
+    @staticmethod
+    def _relabel(item: dict, display: dict, source: str) -> dict:
+        """Copy of a stored interaction with canonical names swapped for this patient's spelling."""
+        return dict(item, drug1=display.get(item["drug1"], item["drug1"]),
+                    drug2=display.get(item["drug2"], item["drug2"]), source=source)
+
+    async def _query_openfda(self, medications: list) -> dict:
+        return await query_openfda(medications, self.label_memo)
+
+
+async def query_openfda(medications: list, label_memo: dict = None) -> dict:
+    """
+    Query OpenFDA drug label API for interaction warnings.
+    Returns dict of {drug_name: interaction_warnings}. Needs no LLM client, so
+    warm_label_cache.py can call it directly. label_memo: see BulkDrugChecker.
+    """
+    # Several inputs may name the same drug ("Advil", "ibuprofen") — look it up once
+    normalizer = get_drug_normalizer()
+    canonical = {drug: normalizer.normalize(drug) for drug in medications}
+    unique = list(dict.fromkeys(canonical.values()))
+
+    if label_memo is None:
+        tasks = [lookup_label(name) for name in unique]
+    else:
+        tasks = []
+        for name in unique:
+            if name not in label_memo:
+                label_memo[name] = asyncio.ensure_future(lookup_label(name))
+            tasks.append(label_memo[name])
+    drug_data = await asyncio.gather(*tasks, return_exceptions=True)
+    by_name = dict(zip(unique, drug_data))
+
+    results = {}
+    for drug in medications:
+        data = by_name[canonical[drug]]
+        if isinstance(data, Exception):
+            results[drug] = f"[OpenFDA query failed: {data}]"
+        else:
+            results[drug] = data
+
+    return results
+
+async def lookup_label(drug_name: str) -> str:
+    """
+    Label sections for one canonical drug name. Order: offline bulk store (if built),
+    then the label cache, then api.fda.gov (unless MEDAI_OPENFDA_OFFLINE=1).
+    """
+    store = get_offline_store()
+    if store is not None:
+        sections = store.lookup(drug_name)
+        if sections is not None or OPENFDA_OFFLINE:
+            return _format_sections(drug_name, sections)
+    elif OPENFDA_OFFLINE:
+        return f"No FDA data found for {drug_name}"
+
+    try:
+        sections = await get_label_cache().get_or_fetch(
+            drug_name,
+            lambda: _fetch_drug_label(get_http_session(), drug_name),
+        )
+    except asyncio.TimeoutError:
+        return f"[OpenFDA timeout for {drug_name}]"
+    except Exception as e:
+        return f"[OpenFDA error for {drug_name}: {str(e)}]"
+
+    return _format_sections(drug_name, sections)
+
+def _format_sections(drug_name: str, sections) -> str:
+    if not sections:
+        return f"No FDA data found for {drug_name}"
+    return "\n".join(f"[{field.upper()}] {content[:SECTION_CHARS]}" for field, content in sections.items())
+
+async def _fetch_drug_label(session: aiohttp.ClientSession, drug_name: str) -> dict:
+    """
+    Fetch drug label from OpenFDA and extract interaction sections.
+    Returns {} when FDA has no label; raises on transport/server errors
+    so failures are never cached.
+    """
+    # One precise query per drug: known canonical generics by generic name only,
+    # unresolved input by generic OR brand name
+    if get_drug_normalizer().is_known(drug_name):
+        search = f'openfda.generic_name:"{drug_name}"'
+    else:
+        search = f'openfda.generic_name:"{drug_name}"+openfda.brand_name:"{drug_name}"'
+    url = f"{OPENFDA_BASE}?search={search}&limit=1"
+    extractor = LabelSectionExtractor(LABEL_FIELDS, SECTION_CHARS)
+    async with openfda_slot():
+        with span("openfda", kind="http", drug=drug_name) as call:
+            status = "error"
+            try:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=8)) as resp:
+                    status = str(resp.status)
+                    call.set(status=resp.status)
+                    if resp.status == 404:
+                        return {}
+                    resp.raise_for_status()
+                    # Parse incrementally and stop once results[0]'s sections are in hand
+                    async for chunk in resp.content.iter_chunked(STREAM_CHUNK):
+                        if extractor.feed(chunk):
+                            break
+                    # Drain (without parsing) so the keep-alive connection can be reused
+                    async for _ in resp.content.iter_chunked(STREAM_CHUNK):
+                        pass
+            finally:
+                OPENFDA_REQUESTS.inc(status=status)
+
+    return extractor.sections()
@@ -16,9 +16,21 @@ Example output for "chest pain":
   3. Are you sweating, nauseous, or feel like something is "wrong"?
   4. Did it start suddenly or gradually over hours/days?
   5. Do you have a history of heart disease, clots, or high blood pressure?
+
+Common presentations are answered from the precomputed question bank
+(utils.question_bank), keyed by the symptom cluster RAGAgent retrieved —
+no LLM call. The LLM is used when the symptoms map to no known cluster
+or carry modifiers (age, pregnancy, ...); those generations are logged
+so build_question_bank.py can fold them into the bank.
 """
 
+from utils.executor import run_cpu
 from utils.llm_client import LLMClient
+from utils.log import get_logger
+from utils.question_bank import cluster_key, find_modifiers, get_question_bank, log_history
+from utils.usage import prompt_sections
+
+log = get_logger("followup")
 
 FOLLOWUP_PROMPT = """
 You are an experienced emergency medicine physician conducting an initial patient assessment.
@@ -55,18 +67,31 @@ class FollowUpAgent:
 
     def __init__(self):
         self.llm = LLMClient()
+        self.bank = get_question_bank()
 
     async def generate_questions(self, session) -> list:
         """Generate questions only — no CLI input. For API use."""
-        prompt = FOLLOWUP_PROMPT.format(
-            context=session.to_context_string(),
-            rag_context=session.rag_context[:1500]
-        )
-        result = await self.llm.json_call(prompt)
-        questions = result.get("questions", [])
+        cluster = cluster_key(session.rag_topics)
+        modifiers = find_modifiers(session.symptoms)
+        if not modifiers:
+            questions = self.bank.get(cluster)
+            if questions is not None:
+                log.info("Question bank hit", cluster=cluster)
+                session.followup_questions = questions
+                return questions
+
+        questions = await self.generate_with_llm(session)
+        await run_cpu(log_history, cluster, modifiers, questions)
         session.followup_questions = questions
         return questions
 
+    async def generate_with_llm(self, session) -> list:
+        rag_context = session.rag_context[:1500]
+        prompt = FOLLOWUP_PROMPT.format(context=session.to_context_string(), rag_context=rag_context)
+        result = await self.llm.json_call(
+            prompt, sections=prompt_sections(prompt, context=session.context_sections(), rag=rag_context))
+        return result.get("questions", [])
+
     async def run(self, session):
         """
         1. Generate context-aware questions
@@ -76,10 +101,10 @@ class FollowUpAgent:
         questions = await self.generate_questions(session)
 
         if not questions:
-            print("           [FOLLOWUP] No follow-up questions generated.")
+            log.info("No follow-up questions generated")
             return
 
-        print(f"           [FOLLOWUP] Generated {len(questions)} follow-up questions.\n")
+        log.info("Generated follow-up questions", questions=len(questions))
 
         # Collect answers interactively
         answers = {}
@@ -92,4 +117,4 @@ class FollowUpAgent:
             answers[question] = answer if answer else "Not provided"
 
         session.add_followup_answers(answers)
-        print("\n           [FOLLOWUP] Answers collected.")
+        log.info("Answers collected", answers=len(answers))
@@ -0,0 +1,160 @@
+"""
+LiveIntake
+===========
+One interactive intake over a WebSocket: the server-side counterpart of
+the CLI flow in MedicalOrchestrator, where FollowUpAgent.run() blocks on
+input(). One PatientSession lives for the whole connection, and each
+stage starts as soon as its inputs exist instead of waiting for the
+next HTTP request:
+
+  intake received  → RAGAgent, and the drug-drug check (needs only the
+                     medication list: labels, table, pair cache, LLM)
+  RAG done         → follow-up questions and preliminary triage together;
+                     questions are pushed the moment they exist
+  answers arrive   → stored one at a time while triage finishes
+  all answered     → AssessmentAgent, then the drug-condition check
+  (or "submit")      against its conditions — drug-drug pairs are already
+                     in the pair cache, so only the new pairs reach the LLM
+
+Every stage result is pushed as its own event; "result" carries the same
+dict /assess returns. Agents are created once per connection, and every
+stage runs in a span of the connection's trace (utils.tracing).
+"""
+
+import asyncio
+from agents.rag_agent import RAGAgent
+from agents.triage_agent import TriageAgent
+from agents.followup_agent import FollowUpAgent
+from agents.assessment_agent import AssessmentAgent
+from agents.drug_agent import DrugInteractionAgent
+from utils.log import get_logger
+from utils.session import PatientSession
+from utils.tracing import span, start_trace
+from utils.usage import usage_stats
+
+log = get_logger("intake")
+
+
+class LiveIntake:
+
+    def __init__(self, push):
+        """push: async (event dict) -> None, sends one event to the client."""
+        self.push = push
+        self.session = PatientSession()
+        self.rag_agent = RAGAgent()
+        self.triage_agent = TriageAgent()
+        self.followup_agent = FollowUpAgent()
+        self.assessment_agent = AssessmentAgent()
+        self.drug_agent = DrugInteractionAgent()
+        self.drug_agent.label_memo = {}  # labels fetched for the early check are reused by the final one
+        self._answers = {}
+        self._tasks = set()
+        self.done = asyncio.Event()  # set once "result" or "error" was pushed
+        self._context_ready = None   # RAG + preliminary triage + questions
+        self._medication_check = None
+        self._finishing = None
+        self.debug = False
+
+    @property
+    def started(self) -> bool:
+        return self._context_ready is not None
+
+    def start(self, symptoms: str, medications: list, debug: bool = False):
+        self.debug = debug
+        # Stage tasks are started from here on, so they all inherit the trace
+        self.session.trace = start_trace("/ws/intake")
+        self.session.set_intake(symptoms=symptoms, medications=medications, image_path=None)
+        self._context_ready = self._spawn(self._prepare())
+        if self.session.medications:
+            self._medication_check = self._spawn(self._check_medications())
+
+    def answer(self, question: str, answer: str):
+        """Record one answer; finishes the intake once every question has one."""
+        self._answers[question] = answer.strip() or "Not provided"
+        self.session.add_followup_answers(self._answers)
+        if self.session.followup_questions:
+            self._finish_when_answered()
+
+    def _finish_when_answered(self):
+        if all(q in self._answers for q in self.session.followup_questions):
+            self.finish()
+
+    def finish(self):
+        """Run the final stages with whatever answers are in. Idempotent."""
+        if self._finishing is None:
+            self._finishing = self._spawn(self._finish())
+        return self._finishing
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(self._guard(coro))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _guard(self, coro):
+        """Runs one stage; the first failure ends the intake with an "error" event."""
+        try:
+            return await coro
+        except Exception as e:
+            log.error("Stage failed", error=f"{type(e).__name__}: {e}")
+            if not self.done.is_set():
+                self.done.set()
+                await self.push({"type": "error", "detail": "Assessment failed — please try again"})
+
+    # ── Stages ───────────────────────────────────────────────────────────────
+
+    async def _prepare(self):
+        with span("rag", kind="agent"):
+            await self.rag_agent.run(self.session)
+        await asyncio.gather(self._questions(), self._preliminary_triage())
+
+    async def _questions(self):
+        with span("followup", kind="agent"):
+            questions = await self.followup_agent.generate_questions(self.session)
+        await self.push({"type": "questions", "questions": questions})
+        self._finish_when_answered()  # also when there are no questions, or answers came first
+
+    async def _preliminary_triage(self):
+        with span("triage", kind="agent"):
+            await self.triage_agent.run_preliminary(self.session)
+        await self.push({"type": "preliminary_triage", "triage": self.session.preliminary_triage})
+
+    async def _check_medications(self) -> list:
+        with span("drug_medications", kind="agent"):
+            interactions = await self.drug_agent.run(self.session, [])
+        await self.push({"type": "drug_interactions", "final": False, "interactions": interactions})
+        return interactions
+
+    async def _finish(self):
+        await self._context_ready
+        if self.done.is_set():
+            return
+        with span("assessment", kind="agent"):
+            result = await self.assessment_agent.run(self.session)
+        await self.push({"type": "assessment", "assessment": result})
+
+        if self.session.medications:
+            if self._medication_check is not None:
+                await self._medication_check  # its pairs are cached by now; keeps events in order
+            if self.done.is_set():
+                return
+            with span("drug", kind="agent"):
+                result["drug_interactions"] = await self.drug_agent.run(self.session, result.get("conditions", []))
+            await self.push({"type": "drug_interactions", "final": True,
+                             "interactions": result["drug_interactions"]})
+        else:
+            result["drug_interactions"] = []
+
+        self.session.final_result = result
+        trace = self.session.trace
+        usage_stats.record(trace)
+        event = {"type": "result", "result": result}
+        if self.debug:
+            event["debug"] = trace.debug()
+        await self.push(event)
+        self.done.set()
+        log.info("Intake complete", **trace.to_dict())
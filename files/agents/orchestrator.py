@@ -11,6 +11,7 @@ Controls the full agentic pipeline:
   [6] DrugAgent        → OpenFDA drug interaction check
 
 Each agent reads from and writes back to the shared PatientSession.
+Every step runs in a span of session.trace (utils.tracing).
 """
 
 import asyncio
@@ -20,6 +21,10 @@ from agents.vision_agent import VisionAgent
 from agents.followup_agent import FollowUpAgent
 from agents.assessment_agent import AssessmentAgent
 from agents.drug_agent import DrugInteractionAgent
+from utils.log import get_logger
+from utils.tracing import span, start_trace
+
+log = get_logger("orchestrator")
 
 
 class MedicalOrchestrator:
@@ -33,41 +38,48 @@ class MedicalOrchestrator:
         self.drug_agent = DrugInteractionAgent()
 
     async def run(self, session) -> dict:
-        print("\n[ORCHESTRATOR] Starting agentic pipeline...\n")
+        session.trace = start_trace("cli")
+        log.info("Starting agentic pipeline", trace_id=session.trace.id)
 
         # ── Step 1: RAG — retrieve relevant medical context ──────────────────
-        print("[AGENT 1/6] RAGAgent: Retrieving medical context...")
-        await self.rag_agent.run(session)
+        log.info("[1/6] RAGAgent: Retrieving medical context")
+        with span("rag", kind="agent"):
+            await self.rag_agent.run(session)
 
         # ── Step 2: Preliminary triage ────────────────────────────────────────
-        print("[AGENT 2/6] TriageAgent: Computing preliminary triage...")
-        await self.triage_agent.run_preliminary(session)
-        print(f"           Preliminary triage: {session.preliminary_triage}")
+        log.info("[2/6] TriageAgent: Computing preliminary triage")
+        with span("triage", kind="agent"):
+            await self.triage_agent.run_preliminary(session)
+        log.info("Preliminary triage", triage=session.preliminary_triage)
 
         # ── Step 3: Vision (parallel with triage if image present) ───────────
         if session.has_image():
-            print("[AGENT 3/6] VisionAgent: Analyzing uploaded image...")
-            await self.vision_agent.run(session)
+            log.info("[3/6] VisionAgent: Analyzing uploaded image")
+            with span("vision", kind="agent"):
+                await self.vision_agent.run(session)
         else:
-            print("[AGENT 3/6] VisionAgent: No image provided, skipping.")
+            log.info("[3/6] VisionAgent: No image provided, skipping")
 
         # ── Step 4: Follow-up Q&A engine ──────────────────────────────────────
-        print("[AGENT 4/6] FollowUpAgent: Generating clinical follow-up questions...")
-        await self.followup_agent.run(session)
+        log.info("[4/6] FollowUpAgent: Generating clinical follow-up questions")
+        with span("followup", kind="agent"):
+            await self.followup_agent.run(session)
 
         # ── Step 5: Final assessment + SOAP note ──────────────────────────────
-        print("[AGENT 5/6] AssessmentAgent: Generating SOAP note + differential...")
-        result = await self.assessment_agent.run(session)
+        log.info("[5/6] AssessmentAgent: Generating SOAP note + differential")
+        with span("assessment", kind="agent"):
+            result = await self.assessment_agent.run(session)
 
         # ── Step 6: Drug interaction check ────────────────────────────────────
         if session.medications:
-            print("[AGENT 6/6] DrugAgent: Checking OpenFDA drug interactions...")
-            drug_data = await self.drug_agent.run(session, result.get("conditions", []))
+            log.info("[6/6] DrugAgent: Checking OpenFDA drug interactions")
+            with span("drug", kind="agent"):
+                drug_data = await self.drug_agent.run(session, result.get("conditions", []))
             result["drug_interactions"] = drug_data
         else:
             result["drug_interactions"] = []
-            print("[AGENT 6/6] DrugAgent: No medications listed, skipping.")
+            log.info("[6/6] DrugAgent: No medications listed, skipping")
 
         session.final_result = result
-        print("\n[ORCHESTRATOR] Pipeline complete.\n")
+        log.info("Pipeline complete", duration_ms=round(session.trace.elapsed_ms()))
         return result
@@ -11,10 +11,24 @@ Production setup uses:
 For Day-1 demo: Falls back to a curated keyword-matched knowledge base
 if ChromaDB is not set up. Swap out _fallback_retrieve() with real
 vector search in production.
+
+The keys of the retrieved entries are stored in session.rag_topics; they
+identify the symptom cluster for the follow-up question bank.
+
+Config (env):
+  MEDAI_RAG_TOPIC_DISTANCE  max vector distance for a retrieved entry to count
+                            as a topic (default 1.0)
 """
 
 import os
+from utils.encoder import get_encoder
+from utils.executor import run_cpu
 from utils.llm_client import LLMClient
+from utils.log import get_logger
+
+RAG_TOPIC_DISTANCE = float(os.getenv("MEDAI_RAG_TOPIC_DISTANCE", "1.0"))
+
+log = get_logger("rag")
 
 # Curated mini knowledge base for demo (replace with real vector DB)
 MEDICAL_KB = {
@@ -76,9 +90,10 @@ class RAGAgent:
         """
         try:
             import chromadb
-            from sentence_transformers import SentenceTransformer
 
-            self.encoder = SentenceTransformer("all-MiniLM-L6-v2")
+            self.encoder = get_encoder()
+            if self.encoder is None:
+                raise ImportError("sentence-transformers not available")
             self.chroma = chromadb.Client()
             self.collection = self.chroma.get_or_create_collection("medical_kb")
 
@@ -90,35 +105,42 @@ class RAGAgent:
                 self.collection.add(documents=docs, embeddings=embeddings, ids=ids)
 
             self.use_vector = True
-            print("           [RAG] ChromaDB vector store initialized.")
+            log.info("ChromaDB vector store initialized")
         except Exception:
             self.use_vector = False
-            print("           [RAG] ChromaDB unavailable. Using keyword fallback.")
+            log.warning("ChromaDB unavailable, using keyword fallback")
 
     async def run(self, session):
         """Retrieve relevant context and store in session.rag_context."""
         if self.use_vector:
-            context = self._vector_retrieve(session.symptoms)
+            # encode() is CPU-bound — keep it off the event loop
+            context, topics = await run_cpu(self._vector_retrieve, session.symptoms)
         else:
-            context = self._fallback_retrieve(session.symptoms)
+            context, topics = self._fallback_retrieve(session.symptoms)
 
         session.rag_context = context
-        print(f"           [RAG] Retrieved {len(context)} chars of medical context.")
+        session.rag_topics = topics
+        log.info("Retrieved medical context", chars=len(context), topics=topics)
 
-    def _vector_retrieve(self, query: str, top_k: int = 3) -> str:
-        """Semantic search via ChromaDB."""
+    def _vector_retrieve(self, query: str, top_k: int = 3) -> tuple:
+        """Semantic search via ChromaDB. Returns (context, topics)."""
         query_embedding = self.encoder.encode([query]).tolist()
         results = self.collection.query(query_embeddings=query_embedding, n_results=top_k)
         docs = results.get("documents", [[]])[0]
-        return "\n\n---\n\n".join(docs)
+        ids = results.get("ids", [[]])[0]
+        distances = (results.get("distances") or [[]])[0] or [0.0] * len(ids)
+        topics = [doc_id for doc_id, distance in zip(ids, distances) if distance <= RAG_TOPIC_DISTANCE]
+        return "\n\n---\n\n".join(docs), topics
 
-    def _fallback_retrieve(self, symptoms: str) -> str:
-        """Keyword-based fallback when vector DB is unavailable."""
+    def _fallback_retrieve(self, symptoms: str) -> tuple:
+        """Keyword-based fallback when vector DB is unavailable. Returns (context, topics)."""
         symptoms_lower = symptoms.lower()
         matched = []
+        topics = []
         for keyword, content in MEDICAL_KB.items():
             if keyword in symptoms_lower:
                 matched.append(content.strip())
+                topics.append(keyword)
         if not matched:
             # Return general context if no keyword match
             matched.append("""
@@ -126,4 +148,4 @@ General Clinical Note: Assess symptom onset, severity (1-10), duration, radiatio
 associated symptoms, aggravating/relieving factors, relevant medical history,
 medications, allergies, and social history. Apply OPQRST framework.
 """.strip())
-        return "\n\n---\n\n".join(matched)
+        return "\n\n---\n\n".join(matched), topics
@@ -16,7 +16,12 @@ The final triage (in assessment_agent) overrides this after follow-up answers.
 """
 
 import re
+from utils.executor import run_cpu
 from utils.llm_client import LLMClient
+from utils.log import get_logger
+from utils.usage import prompt_sections
+
+log = get_logger("triage")
 
 # ── Hard-coded RED flag triggers (rule-based, instant) ──────────────────────
 RED_FLAG_PATTERNS = [
@@ -81,17 +86,16 @@ class TriageAgent:
 
     async def run_preliminary(self, session):
         """Fast preliminary triage — stored in session.preliminary_triage."""
-        rule_triage = self._rule_based_triage(session.symptoms)
+        rule_triage = await run_cpu(self._rule_based_triage, session.symptoms)
         if rule_triage == "RED":
             session.preliminary_triage = "RED"
-            print("           [TRIAGE] Rule-based RED flag triggered!")
+            log.warning("Rule-based RED flag triggered")
             return
 
-        prompt = TRIAGE_PROMPT.format(
-            symptoms=session.symptoms,
-            rag_context=session.rag_context[:1500]  # truncate for speed
-        )
-        result = await self.llm.json_call(prompt)
+        rag_context = session.rag_context[:1500]  # truncate for speed
+        prompt = TRIAGE_PROMPT.format(symptoms=session.symptoms, rag_context=rag_context)
+        result = await self.llm.json_call(
+            prompt, sections=prompt_sections(prompt, symptoms=session.symptoms, rag=rag_context))
         session.preliminary_triage = result.get("triage", rule_triage)
 
     def _rule_based_triage(self, symptoms: str) -> str:
@@ -109,11 +113,10 @@ class TriageAgent:
         Final triage after follow-up answers are collected.
         Called by AssessmentAgent to include in the full result.
         """
-        prompt = TRIAGE_PROMPT.format(
-            symptoms=session.to_context_string(),
-            rag_context=session.rag_context[:1500]
-        )
-        result = await self.llm.json_call(prompt)
+        rag_context = session.rag_context[:1500]
+        prompt = TRIAGE_PROMPT.format(symptoms=session.to_context_string(), rag_context=rag_context)
+        result = await self.llm.json_call(
+            prompt, sections=prompt_sections(prompt, context=session.context_sections(), rag=rag_context))
         return {
             "color": result.get("triage", session.preliminary_triage),
             "urgency_score": result.get("urgency_score", 5),
@@ -12,10 +12,47 @@ Supported image types:
   - Ophthalmology: red eye, discharge, swelling
   - ENT: throat, ear (requires otoscope)
   - Oral: mouth sores, tongue, gums
+
+Model selection is health-aware (utils.model_health): models in cooldown
+after repeated failures are skipped, a failure moves on to the next model
+immediately, and with hedging on a second model is started when the
+first runs past its p95 latency — the first good report wins.
+
+Several images per session (angles / close-ups of the same finding) are
+analyzed concurrently, up to MEDAI_VISION_IMAGE_CONCURRENCY at a time, and
+merged into one vision section: lines already stated for an earlier image
+are dropped and each report is trimmed to its share of the token budget.
+
+Reports are cached by perceptual image hash + symptoms (VisionReportCache),
+so a resubmitted photo reuses the earlier report without a model call.
+
+Config (env):
+  MEDAI_VISION_HEDGE          1 = hedge slow models, 0 = failover only (default 1)
+  MEDAI_VISION_HEDGE_DEFAULT  hedge delay in seconds before a model has p95 data (default 10)
+  MEDAI_VISION_TIMEOUT        per-request timeout in seconds (default 60)
+  MEDAI_VISION_IMAGE_CONCURRENCY  images analyzed at once per session (default 3)
+  MEDAI_VISION_REPORT_TOKENS  budget for the merged vision section (default 1200)
 """
 
+import asyncio
 import os
-from groq import Groq
+import re
+import time
+from groq import AsyncGroq
+from utils.llm_client import record_llm_call
+from utils.log import get_logger
+from utils.model_health import get_model_health
+from utils.tracing import span
+from utils.vision_cache import get_vision_cache
+
+VISION_HEDGE = os.getenv("MEDAI_VISION_HEDGE", "1") == "1"
+VISION_HEDGE_DEFAULT = float(os.getenv("MEDAI_VISION_HEDGE_DEFAULT", "10"))
+VISION_TIMEOUT = float(os.getenv("MEDAI_VISION_TIMEOUT", "60"))
+VISION_IMAGE_CONCURRENCY = int(os.getenv("MEDAI_VISION_IMAGE_CONCURRENCY", "3"))
+VISION_REPORT_BUDGET = int(os.getenv("MEDAI_VISION_REPORT_TOKENS", "1200"))
+CHARS_PER_TOKEN = 4
+
+log = get_logger("vision")
 
 VISION_PROMPT = """
 You are a clinical image analyst. Analyze this patient-submitted medical image carefully.
@@ -33,6 +70,43 @@ Be specific and use clinical terminology. Format your response as a clinical ima
 """
 
 
+def _line_key(line: str) -> str:
+    """Normalize a report line for duplicate detection: no numbering, bullets, case or punctuation."""
+    return re.sub(r"[^a-z0-9 ]", "", re.sub(r"^\s*(\d+[.)]|[-*•#]+)\s*", "", line.lower())).strip()
+
+
+def merge_reports(reports: list, budget_chars: int) -> str:
+    """
+    Merge per-image reports into one section. A line whose content already
+    appeared for an earlier image is dropped; each report gets an equal share
+    of budget_chars, cut at a line boundary.
+    """
+    if len(reports) == 1:
+        return reports[0][:budget_chars]
+    share = budget_chars // len(reports)
+    seen = set()
+    sections = []
+    for number, report in enumerate(reports, 1):
+        header = f"--- Image {number} of {len(reports)} ---"
+        if report is None:
+            sections.append(f"{header}\n[could not be analyzed]")
+            continue
+        kept, used = [], 0
+        for line in report.splitlines():
+            key = _line_key(line)
+            if len(key) > 20:  # short lines are headings / labels — keep them
+                if key in seen:
+                    continue
+                seen.add(key)
+            if used + len(line) + 1 > share:
+                kept.append("[…truncated]")
+                break
+            kept.append(line)
+            used += len(line) + 1
+        sections.append(header + "\n" + "\n".join(kept).strip())
+    return "\n\n".join(sections)
+
+
 class VisionAgent:
 
     VISION_MODELS = [
@@ -42,57 +116,144 @@ class VisionAgent:
     ]
 
     def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), timeout=VISION_TIMEOUT, max_retries=0)
+        self.cache = get_vision_cache()
+        self.health = get_model_health("vision")
 
     async def run(self, session):
-        """Analyze image and append findings to session.rag_context."""
+        """Analyze every image concurrently and append one merged report to session.rag_context."""
         if not session.has_image():
-            print("           [VISION] No image found in session, skipping.")
+            log.info("No image found in session, skipping")
             return
 
-        print(f"           [VISION] Image detected ({len(session.image_b64)} chars base64). Starting analysis...")
+        images = self._distinct(session.images)
+        log.info("Starting image analysis", images=len(session.images), distinct=len(images))
+
+        slots = asyncio.Semaphore(VISION_IMAGE_CONCURRENCY)
+
+        async def analyze(number, image):
+            cached = self.cache.get(image.phash, session.symptoms, session.cache_scope)
+            if cached is not None:
+                log.info("Reused cached report", image=number, chars=len(cached))
+                return cached
+            async with slots:
+                report = await self._analyze(image, session.symptoms)
+            if report is not None:
+                self.cache.put(image.phash, session.symptoms, session.cache_scope, report)
+            return report
 
-        for model in self.VISION_MODELS:
+        reports = await asyncio.gather(*(analyze(n, image) for n, image in enumerate(images, 1)))
+
+        if any(report is not None for report in reports):
+            self._attach_report(session, merge_reports(reports, VISION_REPORT_BUDGET * CHARS_PER_TOKEN))
+            return
+
+        log.warning("All vision models failed, proceeding text-only")
+        session.rag_context = (
+            "[VISION] Image was provided but could not be analyzed. "
+            "Proceeding with text-only assessment.\n\n" + session.rag_context
+        )
+
+    def _distinct(self, images: list) -> list:
+        """Drop near-identical images (same photo uploaded twice) so each is analyzed once."""
+        distinct = []
+        for image in images:
+            if not any(image.phash and bin(image.phash ^ kept.phash).count("1") <= self.cache.max_distance
+                       for kept in distinct):
+                distinct.append(image)
+        return distinct
+
+    async def _analyze(self, image, symptoms: str):
+        """
+        Try healthy models in preference order. A failure starts the next model
+        at once; with hedging on, so does a model running past its p95 latency.
+        The first good report wins and the other attempts are cancelled.
+        """
+        models = self.health.candidates(self.VISION_MODELS)
+        if not models:
+            models = [self.health.next_available(self.VISION_MODELS)]
+            log.warning("All models in cooldown", trying=models[0])
+        skipped = [m for m in self.VISION_MODELS if m not in models]
+        if skipped:
+            log.info("Skipping unhealthy models", models=skipped)
+
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "image_url", "image_url": {"url": image.data_url()}},
+                    {"type": "text", "text": VISION_PROMPT.format(symptoms=symptoms)},
+                ],
+            }
+        ]
+        attempts = {}
+        queue = list(models)
+
+        def launch():
+            model = queue.pop(0)
+            log.info("Trying model", model=model)
+            task = asyncio.ensure_future(self._attempt(model, messages))
+            attempts[task] = model
+            pending.add(task)
+            return model
+
+        pending = set()
+        try:
+            current = launch()
+            while pending:
+                delay = None
+                if VISION_HEDGE and queue:
+                    delay = self.health.p95_latency(current) or VISION_HEDGE_DEFAULT
+                done, pending = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    log.info("Model slow, hedging", model=current, delay_s=round(delay, 1))
+                    current = launch()
+                    continue
+                for task in done:
+                    model = attempts[task]
+                    if task.exception() is None:
+                        image_report = task.result()
+                        log.info("Image analyzed", model=model, chars=len(image_report))
+                        return image_report
+                    e = task.exception()
+                    log.warning("Model failed", model=model, error=f"{type(e).__name__}: {e}")
+                    if queue:
+                        current = launch()
+            return None
+        finally:
+            for task in attempts:
+                task.cancel()
+            for model in queue:
+                self.health.release(model)
+
+    async def _attempt(self, model: str, messages: list) -> str:
+        start = time.perf_counter()
+        with span("vision", kind="llm", model=model) as call:
             try:
-                print(f"           [VISION] Trying model: {model}")
-                response = self.client.chat.completions.create(
+                response = await self.client.chat.completions.create(
                     model=model,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{session.image_b64}",
-                                    },
-                                },
-                                {
-                                    "type": "text",
-                                    "text": VISION_PROMPT.format(symptoms=session.symptoms)
-                                }
-                            ],
-                        }
-                    ],
+                    messages=messages,
                     max_tokens=1024,
                     temperature=0.3,
                 )
-
                 image_report = response.choices[0].message.content.strip()
-                print(f"           [VISION] ✅ Success with {model} ({len(image_report)} chars).")
-
-                session.rag_context = (
-                    f"=== VISION ANALYSIS (Image Submitted by Patient) ===\n{image_report}\n\n"
-                    f"=== RETRIEVED MEDICAL CONTEXT ===\n{session.rag_context}"
-                )
-                return  # Success, stop trying models
-
+                if not image_report:
+                    raise ValueError("empty report")
+                record_llm_call(call, model, response.usage)
+            except asyncio.CancelledError:
+                record_llm_call(call, model, status="cancelled")
+                self.health.release(model)
+                raise
             except Exception as e:
-                print(f"           [VISION] ❌ Failed with {model}: {type(e).__name__}: {e}")
-                continue
+                record_llm_call(call, model, status="error")
+                self.health.record_failure(model, e)
+                raise
+        self.health.record_success(model, time.perf_counter() - start)
+        return image_report
 
-        print("           [VISION] ⚠️ All vision models failed. Proceeding text-only.")
+    @staticmethod
+    def _attach_report(session, image_report: str):
         session.rag_context = (
-            "[VISION] Image was provided but could not be analyzed. "
-            "Proceeding with text-only assessment.\n\n" + session.rag_context
+            f"=== VISION ANALYSIS (Image Submitted by Patient) ===\n{image_report}\n\n"
+            f"=== RETRIEVED MEDICAL CONTEXT ===\n{session.rag_context}"
         )
@@ -1,14 +1,58 @@
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import (FastAPI, UploadFile, File, Form, Header, Request, HTTPException, WebSocket,
+                     WebSocketDisconnect, Depends)
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
-import base64
+from contextlib import asynccontextmanager
+import asyncio
+import json
 
 from agents.orchestrator import MedicalOrchestrator
+from agents.chat_agent import CHAT_FALLBACK, ChatAgent
+from agents.live_intake import LiveIntake
 from utils.session import PatientSession
 from utils.llm_client import LLMClient
-
-app = FastAPI(title="MedAI Clinical Assistant", version="1.0.0")
+from utils.executor import run_cpu, shutdown_executor, loop_lag
+from utils.image_preprocess import MAX_IMAGES, ImageRejected, ImageTooLarge, preprocess_image
+from utils.vision_cache import get_vision_cache
+from utils.model_health import get_model_health
+from utils.question_bank import get_question_bank
+from utils.conversation_store import ConversationStore
+from utils.semantic_cache import get_semantic_cache, is_cacheable
+from utils.upload_limit import UploadSizeLimitMiddleware
+from utils.responses import CompressionMiddleware, FastJSONResponse, dumps, response_stats
+from utils.http_client import close_http_session
+from utils.label_cache import get_label_cache
+from utils.pair_cache import close_pair_caches
+from utils.log import get_logger, stop_logging
+from utils.metrics import render_prometheus
+from utils.tracing import span, start_trace
+from utils.usage import usage_stats
+from utils.admin import is_admin
+from utils.memory import MEMORY_TOP, memory_report, memory_stats, start_memory_tracking, take_baseline
+from utils.profiling import ProfilingMiddleware, list_profiles, profile_path
+
+log = get_logger("api")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_memory_tracking()
+    loop_lag.start()
+    await run_cpu(get_semantic_cache)  # loads the sentence encoder off the event loop
+    await run_cpu(take_baseline)
+    yield
+    await loop_lag.stop()
+    await close_http_session()
+    get_label_cache().close()
+    close_pair_caches()
+    shutdown_executor()
+    stop_logging()
+
+
+app = FastAPI(title="MedAI Clinical Assistant", version="1.0.0", lifespan=lifespan,
+              default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,9 +60,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadSizeLimitMiddleware, paths=("/assess/image",))
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware, paths=("/assess", "/assess/image", "/followup", "/chat"))
 
 orchestrator = MedicalOrchestrator()
 llm = LLMClient()
+chat_agent = ChatAgent()
+conversations = ConversationStore(summarize=chat_agent.summarize)
 
 
 class AssessRequest(BaseModel):
@@ -34,7 +83,8 @@ class FollowupRequest(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
-    history: List[dict] = []
+    conversation_id: Optional[str] = None
+    history: List[dict] = []  # only read when starting a conversation (legacy clients)
 
 
 class DrugCheckRequest(BaseModel):
@@ -47,76 +97,196 @@ async def health():
     return {
         "status": "ok",
         "service": "MedAI Clinical Assistant",
-        "agents": ["rag", "triage", "assessment", "drug", "vision", "followup", "chat"]
+        "agents": ["rag", "triage", "assessment", "drug", "vision", "followup", "chat"],
+        "event_loop_lag": loop_lag.stats(),
+        "vision_cache": get_vision_cache().stats(),
+        "vision_models": get_model_health("vision").stats(),
+        "question_bank": get_question_bank().stats(),
+        "chat_conversations": conversations.stats(),
+        "chat_semantic_cache": get_semantic_cache().stats() if get_semantic_cache() else None,
+        "responses": response_stats.snapshot(),
+        "llm_usage": usage_stats.snapshot(),
+        "memory": memory_stats(),
     }
 
 
+def traced_response(result: dict, trace, debug: bool = False) -> FastJSONResponse:
+    """Closes out a request: folds its token usage into the rolling stats, adds the debug section on request."""
+    usage_stats.record(trace)
+    if debug:
+        result = dict(result, debug=trace.debug())
+    return FastJSONResponse(result, headers={"X-Trace-Id": trace.id})
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus exposition: span latency histograms, LLM calls/tokens/retries, OpenFDA requests."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def admin_only(x_admin_token: Optional[str] = Header(None)):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required (MEDAI_ADMIN_TOKEN)")
+
+
+@app.get("/admin/profiles", dependencies=[Depends(admin_only)])
+async def profiles():
+    """Recent request profiles, newest first (see utils/profiling.py)."""
+    return {"profiles": await run_cpu(list_profiles)}
+
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(admin_only)])
+async def download_profile(profile_id: str):
+    """Collapsed stacks for flamegraph.pl / inferno / speedscope."""
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.collapsed")
+
+
+@app.get("/admin/memory", dependencies=[Depends(admin_only)])
+async def memory(top: int = MEMORY_TOP, group_by: str = "lineno"):
+    """Top allocation sites and growth since startup (needs MEDAI_TRACEMALLOC=1, see utils/memory.py)."""
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by must be lineno, filename or traceback")
+    return await run_cpu(memory_report, max(1, min(top, 200)), group_by)
+
+
 @app.post("/assess")
-async def assess_text(request: AssessRequest):
+async def assess_text(request: AssessRequest, debug: bool = False):
+    """Full text assessment. ?debug=1 adds timings, token usage and cost by stage."""
     session = PatientSession()
+    session.trace = start_trace("/assess")
     session.set_intake(symptoms=request.symptoms, medications=request.medications, image_path=None)
     if request.followup_answers:
         session.followup_answers = request.followup_answers
     result = await run_pipeline(session)
-    return result
+    return traced_response(result, session.trace, debug)
 
 
 @app.post("/followup")
-async def get_followup_questions(request: FollowupRequest):
+async def get_followup_questions(request: FollowupRequest, debug: bool = False):
     """Generate context-aware follow-up questions WITHOUT running the full pipeline."""
     from agents.rag_agent import RAGAgent
-    from agents.triage_agent import TriageAgent
     from agents.followup_agent import FollowUpAgent
 
     session = PatientSession()
+    session.trace = start_trace("/followup")
     session.set_intake(symptoms=request.symptoms, medications=request.medications, image_path=None)
 
-    await RAGAgent().run(session)
-    await TriageAgent().run_preliminary(session)
+    # Retrieval picks the symptom cluster; common clusters are answered from the question bank
+    with span("rag", kind="agent"):
+        await RAGAgent().run(session)
 
     agent = FollowUpAgent()
-    questions = await agent.generate_questions(session)
-    return {"questions": questions}
+    with span("followup", kind="agent"):
+        questions = await agent.generate_questions(session)
+    log.info("Follow-up questions ready", **session.trace.to_dict())
+    return traced_response({"questions": questions}, session.trace, debug)
+
+
+def _conversation_for(request: ChatRequest):
+    """The stored conversation for request.conversation_id, or a new one seeded from request.history."""
+    if request.conversation_id:
+        conversation = conversations.get(request.conversation_id)
+        if conversation is None:
+            raise HTTPException(status_code=404, detail="Conversation not found or expired — start a new one")
+        return conversation
+    return conversations.create(request.history)
+
+
+async def _semantic_lookup(message: str, conversation) -> tuple:
+    """
+    (cached answer or None, probe or None). Only first-turn generic questions are
+    probed (embedding + drug/condition mentions); the probe is returned so a miss can
+    be stored after the LLM call.
+    """
+    cache = get_semantic_cache()
+    if cache is None:
+        return None, None
+    if not conversation.is_empty() or not is_cacheable(message):
+        cache.record_skip()
+        return None, None
+    probe = await run_cpu(cache.probe, message)
+    hit = cache.lookup(probe)
+    if hit is None:
+        return None, probe
+    answer, similarity = hit
+    log.info("Semantic cache hit", similarity=round(similarity, 3))
+    return answer, None
 
 
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
-    """Medical assistant chatbot — answers health questions in plain language."""
-    history_text = ""
-    for msg in request.history[-6:]:  # last 6 turns for context
-        role = "Patient" if msg.get("role") == "user" else "Assistant"
-        history_text += f"{role}: {msg.get('content', '')}\n"
-
-    prompt = f"""You are MediTriage AI — a friendly, knowledgeable medical assistant.
-Answer health questions clearly in plain English. Always recommend consulting a doctor for diagnosis.
-Keep answers concise (2-4 sentences unless detail is needed). Never diagnose directly.
-
-Conversation so far:
-{history_text}
-Patient: {request.message}
-
-Respond in plain text (NOT JSON). Be empathetic, clear, and helpful."""
-
-    try:
-        # Use raw text call, not JSON
-        from groq import Groq
-        import os
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        resp = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=300,
-            temperature=0.7,
-        )
-        answer = resp.choices[0].message.content.strip()
-    except Exception as e:
-        answer = "I'm having trouble connecting right now. For urgent concerns, please call your doctor or emergency services."
-
-    return {"reply": answer}
+async def chat_endpoint(request: ChatRequest, debug: bool = False):
+    """
+    Medical assistant chatbot — answers health questions in plain language.
+    Send conversation_id from the previous reply to continue; history is not needed.
+    """
+    trace = start_trace("/chat")
+    conversation = _conversation_for(request)
+    answer, probe = await _semantic_lookup(request.message, conversation)
+    if answer is None:
+        answer = await chat_agent.reply(request.message, conversation.context())
+        if answer != CHAT_FALLBACK and probe is not None:
+            get_semantic_cache().store(probe, request.message, answer)
+    if answer != CHAT_FALLBACK:
+        conversations.record_exchange(conversation, request.message, answer)
+    return traced_response({"reply": answer, "conversation_id": conversation.id}, trace, debug)
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, debug: bool = False):
+    """
+    Same as /chat, streamed as Server-Sent Events:
+      event: delta  data: {"text": "..."}                        one per token batch
+      event: done   data: {"reply": "...", "conversation_id": ...}  full reply
+      event: error  data: {"reply": "...", "conversation_id": ...}  fallback, stream ends
+
+    Each event is written only after the previous one was accepted by the
+    connection, so a slow reader slows the upstream read (backpressure). On
+    disconnect the generator is closed, which closes the Groq stream.
+    With ?debug=1 the done event also carries the debug section.
+    """
+    trace = start_trace("/chat/stream")
+    conversation = _conversation_for(request)
+    cached, probe = await _semantic_lookup(request.message, conversation)
+
+    async def events():
+        if cached is not None:
+            conversations.record_exchange(conversation, request.message, cached)
+            yield sse_event("delta", {"text": cached})
+            yield sse_event("done", {"reply": cached, "conversation_id": conversation.id})
+            return
+        deltas = chat_agent.stream(request.message, conversation.context())
+        parts = []
+        try:
+            async for text in deltas:
+                parts.append(text)
+                yield sse_event("delta", {"text": text})
+            reply = "".join(parts).strip()
+            conversations.record_exchange(conversation, request.message, reply)
+            if probe is not None and reply:
+                get_semantic_cache().store(probe, request.message, reply)
+            done = {"reply": reply, "conversation_id": conversation.id}
+            yield sse_event("done", dict(done, debug=trace.debug()) if debug else done)
+        except Exception as e:
+            log.error("Stream error", error=f"{type(e).__name__}: {e}")
+            yield sse_event("error", {"reply": CHAT_FALLBACK, "conversation_id": conversation.id})
+        finally:
+            await asyncio.shield(deltas.aclose())
+            usage_stats.record(trace)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                                      "X-Conversation-Id": conversation.id})
 
 
 @app.post("/drug-check")
-async def standalone_drug_check(request: DrugCheckRequest):
+async def standalone_drug_check(request: DrugCheckRequest, debug: bool = False):
     """Standalone drug interaction check — no full pipeline, just meds."""
     from agents.drug_agent import DrugInteractionAgent
 
@@ -127,24 +297,155 @@ async def standalone_drug_check(request: DrugCheckRequest):
     session = MockSession(request.medications)
     conditions = [{"name": c} for c in request.conditions] if request.conditions else [{"name": "General health check"}]
 
+    trace = start_trace("/drug-check")
     agent = DrugInteractionAgent()
-    interactions = await agent.run(session, conditions)
-    return {"interactions": interactions, "medications": request.medications}
+    with span("drug", kind="agent"):
+        interactions = await agent.run(session, conditions)
+    return traced_response({"interactions": interactions, "medications": request.medications}, trace, debug)
+
+
+@app.post("/drug-check/bulk")
+async def bulk_drug_check(request: Request, debug: bool = False):
+    """
+    Bulk screening. Body: NDJSON, one {"id", "medications", "conditions"} per line.
+    Response: NDJSON, one result per patient as it finishes, then a summary line
+    (with ?debug=1 the summary line also carries the debug section).
+    """
+    from agents.bulk_drug_checker import BulkDrugChecker, iter_ndjson
+
+    # The body is parsed before streaming starts: Starlette's StreamingResponse
+    # listens on the same receive channel for disconnects while it streams.
+    records = [record async for record in iter_ndjson(request.stream())]
+    trace = start_trace("/drug-check/bulk")
+    checker = BulkDrugChecker()
+
+    async def ndjson():
+        try:
+            async for result in checker.run(records):
+                if debug and "summary" in result:
+                    result = dict(result, debug=trace.debug())
+                yield dumps(result) + b"\n"
+        finally:
+            usage_stats.record(trace)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers={"X-Trace-Id": trace.id})
+
+
+async def _receive_intake(websocket: WebSocket, intake: LiveIntake, push):
+    """Reads client messages into the live intake until it disconnects."""
+    while True:
+        try:
+            raw = await websocket.receive_text()
+        except WebSocketDisconnect:
+            return
+        try:
+            message = json.loads(raw)
+            kind = message.get("type")
+        except (ValueError, AttributeError):
+            await push({"type": "error", "detail": "Messages must be JSON objects with a \"type\""})
+            continue
+
+        if kind == "intake" and not intake.started:
+            symptoms = str(message.get("symptoms", "")).strip()
+            if not symptoms:
+                await push({"type": "error", "detail": "symptoms is required"})
+                continue
+            medications = [str(m).strip() for m in message.get("medications") or [] if str(m).strip()]
+            intake.start(symptoms, medications, debug=bool(message.get("debug")))
+        elif not intake.started:
+            await push({"type": "error", "detail": "Send an \"intake\" message first"})
+        elif kind == "answer":
+            question = message.get("question")
+            if question is None:
+                questions = intake.session.followup_questions
+                index = message.get("index")
+                if not isinstance(index, int) or not 0 <= index < len(questions):
+                    await push({"type": "error", "detail": "answer needs a question or a valid index"})
+                    continue
+                question = questions[index]
+            intake.answer(str(question), str(message.get("answer", "")))
+        elif kind == "submit":
+            intake.finish()
+        else:
+            await push({"type": "error", "detail": f"Unexpected message type {kind!r}"})
+
+
+@app.websocket("/ws/intake")
+async def intake_socket(websocket: WebSocket):
+    """
+    Interactive intake on one connection (see agents/live_intake.py).
+
+    Client → server:
+      {"type": "intake", "symptoms": "...", "medications": [...], "debug": false}   first message
+      {"type": "answer", "question": "..." | "index": 0, "answer": "..."}
+      {"type": "submit"}        assess now, without waiting for the remaining answers
+
+    Server → client, each as soon as it is ready:
+      questions, preliminary_triage, drug_interactions (final: false — medications only),
+      assessment, drug_interactions (final: true), result (same as /assess, plus "debug"
+      when asked for), error
+
+    The assessment starts once every question is answered (or on submit);
+    the socket is closed after "result".
+    """
+    await websocket.accept()
+    lock = asyncio.Lock()
+
+    async def push(event: dict):
+        async with lock:
+            await websocket.send_text(dumps(event).decode())
+
+    intake = LiveIntake(push)
+    receiver = asyncio.ensure_future(_receive_intake(websocket, intake, push))
+    finished = asyncio.ensure_future(intake.done.wait())
+    try:
+        await asyncio.wait({receiver, finished}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        receiver.cancel()
+        finished.cancel()
+        intake.close()
+    if finished.done() and not finished.cancelled():
+        await websocket.close()
 
 
 @app.post("/assess/image")
 async def assess_with_image(
     symptoms: str = Form(...),
     medications: str = Form(""),
-    image: UploadFile = File(...)
+    image: List[UploadFile] = File(...),
+    debug: bool = False,
+    x_session_id: Optional[str] = Header(None, max_length=64),
 ):
+    """
+    Full assessment with one or more photos (repeat the "image" form field for several).
+    Send the same X-Session-Id when resubmitting one patient's intake to reuse its image reports.
+    """
+    if len(image) > MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_IMAGES} images per assessment")
     session = PatientSession()
-    image_bytes = await image.read()
-    session.image_b64 = base64.b64encode(image_bytes).decode("utf-8")
+    session.trace = start_trace("/assess/image")
+    session.cache_scope = x_session_id
+    # Decode straight from the spooled upload files — raw uploads are never read into memory
+    try:
+        with span("preprocess", kind="agent", images=len(image)):
+            prepared = await asyncio.gather(*(run_cpu(preprocess_image, upload.file) for upload in image),
+                                            return_exceptions=True)
+    finally:
+        for upload in image:
+            await upload.close()
+    for item in prepared:
+        if isinstance(item, ImageRejected):
+            raise HTTPException(status_code=413 if isinstance(item, ImageTooLarge) else 415, detail=str(item))
+        if isinstance(item, BaseException):
+            raise item
+    for item in prepared:
+        log.info("Preprocessed upload", original_bytes=item.original_bytes, bytes=len(item.data),
+                 mime=item.mime, width=item.width, height=item.height)
+        session.add_image(item)
     meds = [m.strip() for m in medications.split(",") if m.strip()]
     session.set_intake(symptoms=symptoms, medications=meds, image_path=None)
     result = await run_pipeline(session)
-    return result
+    return traced_response(result, session.trace, debug)
 
 
 async def run_pipeline(session):
@@ -154,17 +455,23 @@ async def run_pipeline(session):
     from agents.assessment_agent import AssessmentAgent
     from agents.drug_agent import DrugInteractionAgent
 
-    await RAGAgent().run(session)
-    await TriageAgent().run_preliminary(session)
+    with span("rag", kind="agent"):
+        await RAGAgent().run(session)
+    with span("triage", kind="agent"):
+        await TriageAgent().run_preliminary(session)
 
     if session.has_image():
-        await VisionAgent().run(session)
+        with span("vision", kind="agent"):
+            await VisionAgent().run(session)
 
-    result = await AssessmentAgent().run(session)
+    with span("assessment", kind="agent"):
+        result = await AssessmentAgent().run(session)
 
     if session.medications:
-        result["drug_interactions"] = await DrugInteractionAgent().run(session, result.get("conditions", []))
+        with span("drug", kind="agent"):
+            result["drug_interactions"] = await DrugInteractionAgent().run(session, result.get("conditions", []))
     else:
         result["drug_interactions"] = []
 
+    log.info("Pipeline complete", **session.trace.to_dict())
     return result
@@ -0,0 +1,80 @@
+"""
+Benchmark PatientSession context rendering and serialization.
+
+Builds a representative session (symptoms, medications, five follow-up
+answers, ~3 KB of retrieved context, optionally one image) and reports:
+  - to_context_string(): first render, cached call, re-render after one field changes
+  - to_bytes() / from_bytes(): time per call and bytes per session in the
+    active format (msgpack if installed, else JSON), next to plain json.dumps
+
+Run:
+    python benchmark_session.py
+    python benchmark_session.py --image photo.jpg --number 20000
+"""
+
+import argparse
+import json
+import timeit
+from agents.rag_agent import MEDICAL_KB
+from utils.session import PatientSession, msgpack
+
+
+def build_session(image_path=None) -> PatientSession:
+    session = PatientSession()
+    session.set_intake(
+        symptoms="Crushing chest pain for 2 hours radiating to the left arm, sweating and nausea",
+        medications=["warfarin", "metoprolol", "atorvastatin", "lisinopril"],
+        image_path=image_path,
+    )
+    session.rag_context = "\n\n---\n\n".join(MEDICAL_KB.values())
+    session.rag_topics = ["chest pain"]
+    session.followup_answers = {
+        "Does the pain get worse when you breathe in deeply or lie flat?": "No, it is constant",
+        "Does the pain spread to your arm, jaw or back?": "Yes, to the left arm",
+        "Are you sweating or feeling sick to your stomach?": "Both",
+        "Did it start suddenly or build up over hours?": "Suddenly, while climbing stairs",
+        "Any history of heart disease, clots or high blood pressure?": "High blood pressure",
+    }
+    session.preliminary_triage = "RED"
+    return session
+
+
+def per_call_us(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PatientSession rendering and serialization.")
+    parser.add_argument("--image", help="include this image in the session")
+    parser.add_argument("--number", type=int, default=10000, help="calls per timing run")
+    args = parser.parse_args()
+
+    session = build_session(args.image)
+    n = args.number
+
+    def first_render():
+        session.rag_context = session.rag_context  # reassignment marks the section dirty
+        session.to_context_string()
+
+    def changed_answer():
+        session.preliminary_triage = "RED"          # not a context input: stays cached
+        session.followup_answers = session.followup_answers
+        session.to_context_string()
+
+    print("to_context_string()")
+    print(f"  re-render, rag section dirty : {per_call_us(first_render, n):8.2f} µs")
+    print(f"  re-render, Q&A section dirty : {per_call_us(changed_answer, n):8.2f} µs")
+    print(f"  cached                       : {per_call_us(session.to_context_string, n):8.2f} µs")
+
+    blob = session.to_bytes()
+    fmt = "msgpack" if msgpack is not None else "json (msgpack not installed)"
+    as_json = json.dumps(session._to_record(binary=False)).encode("utf-8")
+    print(f"\nserialization ({fmt})")
+    print(f"  to_bytes                     : {per_call_us(session.to_bytes, n):8.2f} µs")
+    print(f"  from_bytes                   : {per_call_us(lambda: PatientSession.from_bytes(blob), n):8.2f} µs")
+    print(f"  bytes per session            : {len(blob):8d}")
+    print(f"  json.dumps bytes (reference) : {len(as_json):8d}")
+
+
+if __name__ == "__main__":
+    main()
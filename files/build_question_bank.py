@@ -0,0 +1,56 @@
+"""
+Build the follow-up question bank (utils/question_bank.py) offline.
+
+  - every knowledge-base topic gets one LLM-generated question set
+  - clusters seen at least --min-history times in the follow-up history
+    log use the questions the LLM asked most often for them in production
+    (this also adds multi-topic clusters such as "fever+headache")
+
+Run:
+    python build_question_bank.py                  # LLM + history
+    python build_question_bank.py --no-llm         # history only
+    python build_question_bank.py --min-history 20 --top 5
+
+The API server loads the bank at startup; restart it to pick up a rebuild.
+"""
+
+import argparse
+import asyncio
+import time
+from agents.followup_agent import FollowUpAgent
+from agents.rag_agent import MEDICAL_KB
+from utils.question_bank import FOLLOWUP_HISTORY_PATH, QUESTION_BANK_PATH, rank_history, save_bank
+from utils.session import PatientSession
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Build the follow-up question bank.")
+    parser.add_argument("--history", default=FOLLOWUP_HISTORY_PATH, help="follow-up history NDJSON log")
+    parser.add_argument("--min-history", type=int, default=5, help="history entries needed to use a cluster")
+    parser.add_argument("--top", type=int, default=5, help="questions kept per history cluster")
+    parser.add_argument("--no-llm", action="store_true", help="only use the history log")
+    parser.add_argument("--out", default=QUESTION_BANK_PATH, help="bank file to write")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    clusters = {}
+
+    if not args.no_llm:
+        agent = FollowUpAgent()
+        for topic, note in MEDICAL_KB.items():
+            session = PatientSession(symptoms=topic, rag_context=note.strip(), rag_topics=[topic])
+            questions = await agent.generate_with_llm(session)
+            if questions:
+                clusters[topic] = {"questions": questions, "source": "llm"}
+            print(f"[BANK] {topic}: {len(questions)} question(s) from LLM")
+
+    for cluster, ranked in rank_history(args.history, args.min_history, args.top).items():
+        clusters[cluster] = {"questions": ranked["questions"], "source": "history", "entries": ranked["entries"]}
+        print(f"[BANK] {cluster}: {len(ranked['questions'])} question(s) from {ranked['entries']} logged generation(s)")
+
+    save_bank(clusters, args.out)
+    print(f"[BANK] Wrote {len(clusters)} cluster(s) to {args.out} in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""
+Bulk drug interaction screening from the command line.
+
+Input is NDJSON, one patient per line:
+    {"id": "p1", "medications": ["warfarin", "ibuprofen"], "conditions": ["peptic ulcer"]}
+(a bare JSON list of medications per line also works).
+
+Run:
+    python bulk_drug_check.py patients.ndjson > results.ndjson
+    cat patients.ndjson | python bulk_drug_check.py - --concurrency 16
+
+Results are written as NDJSON to stdout as each patient finishes; the
+throughput summary goes to stderr.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+from agents.bulk_drug_checker import BULK_CONCURRENCY, BulkDrugChecker, parse_ndjson_line
+from utils.http_client import close_http_session
+
+
+def read_records(path: str):
+    stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+    with stream:
+        for line_no, line in enumerate(stream, 1):
+            if line.strip():
+                yield parse_ndjson_line(line, line_no)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Bulk drug interaction screening (NDJSON in/out).")
+    parser.add_argument("input", help="NDJSON file, or - for stdin")
+    parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY)
+    args = parser.parse_args()
+
+    out = sys.stdout
+    checker = BulkDrugChecker(concurrency=args.concurrency)
+    # Agent progress prints go to stderr so stdout stays valid NDJSON
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            async for result in checker.run(read_records(args.input)):
+                if "summary" in result:
+                    print(f"[BULK] {json.dumps(result['summary'])}")
+                else:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+        finally:
+            await close_http_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
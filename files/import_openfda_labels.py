@@ -0,0 +1,69 @@
+"""
+Import the openFDA drug label bulk download into a local store so the
+drug agent can run fully offline (see utils/label_store.py).
+
+Download the drug/label partitions from https://open.fda.gov/data/downloads/
+(drug-label-0001-of-00NN.json.zip, ...) and run:
+
+    python import_openfda_labels.py drug-label-*.json.zip
+    python import_openfda_labels.py --out /data/openfda.sqlite --max-chars 2000 *.json
+
+Files are streamed (zip members are read without extracting), so memory
+stays flat regardless of file size. The store is built in a temp file and
+swapped in atomically.
+"""
+
+import argparse
+import io
+import os
+import time
+import zipfile
+from utils.label_store import OFFLINE_LABELS_PATH, LabelStoreWriter, iter_bulk_results
+
+
+def open_bulk_files(path: str):
+    """Yield (name, text stream) for a .json file or every .json member of a .zip."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for member in zf.namelist():
+                if member.endswith(".json"):
+                    with zf.open(member) as raw:
+                        yield f"{path}:{member}", io.TextIOWrapper(raw, encoding="utf-8")
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield path, f
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline openFDA label store.")
+    parser.add_argument("files", nargs="+", help="openFDA drug label bulk files (.json or .json.zip)")
+    parser.add_argument("--out", default=OFFLINE_LABELS_PATH, help="output SQLite path")
+    parser.add_argument("--max-chars", type=int, default=2000, help="max chars kept per section")
+    args = parser.parse_args()
+
+    tmp_path = args.out + ".building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    writer = LabelStoreWriter(tmp_path)
+    start = time.perf_counter()
+    seen = 0
+    for path in args.files:
+        for name, stream in open_bulk_files(path):
+            print(f"[IMPORT] {name}")
+            for label in iter_bulk_results(stream):
+                writer.add(label, args.max_chars)
+                seen += 1
+                if seen % 10000 == 0:
+                    print(f"[IMPORT]   {seen} labels read, {writer.count} kept "
+                          f"({seen / (time.perf_counter() - start):.0f}/s)")
+
+    kept = writer.count
+    has_fts = writer.finish()
+    os.replace(tmp_path, args.out)
+    print(f"[IMPORT] Done: {kept}/{seen} labels with names in {time.perf_counter() - start:.1f}s "
+          f"→ {args.out} (full-text search: {'yes' if has_fts else 'unavailable'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,11 +14,15 @@ Run:
 """
 
 import asyncio
+import os
 from agents.orchestrator import MedicalOrchestrator
 from utils.session import PatientSession
+from utils.http_client import close_http_session
+from utils.log import configure_logging
 
 
 async def main():
+    configure_logging(fmt=os.getenv("MEDAI_LOG_FORMAT", "text"))
     print("\n" + "="*60)
     print("       MedAI — Agentic Clinical Assistant")
     print("="*60)
@@ -40,7 +44,10 @@ async def main():
     session.set_intake(symptoms=symptoms, medications=medications, image_path=image_path)
 
     # ---------- AGENTIC PIPELINE ----------
-    result = await orchestrator.run(session)
+    try:
+        result = await orchestrator.run(session)
+    finally:
+        await close_http_session()
 
     # ---------- OUTPUT ----------
     print("\n" + "="*60)
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from agents.bulk_drug_checker import BulkDrugChecker, parse_ndjson_line
+
+
+@pytest.fixture
+def checker(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    return BulkDrugChecker()
+
+
+def run_all(checker, records):
+    async def collect():
+        return [result async for result in checker.run(records)]
+    return asyncio.run(asyncio.wait_for(collect(), 5))
+
+
+def test_non_utf8_line_is_a_line_error():
+    record = parse_ndjson_line(b'{"medications": ["\xff"]}', 3)
+    assert record["id"] == "line-3"
+    assert "error" in record
+
+
+@pytest.mark.parametrize("field, value", [
+    ("conditions", "diabetes"),
+    ("medications", "warfarin"),
+    ("medications", ["warfarin", 5]),
+    ("conditions", [None]),
+])
+def test_fields_must_be_lists_of_strings(checker, field, value):
+    record = {"id": "p1", "medications": [], field: value}
+    result, summary = run_all(checker, [record])
+    assert result == {"id": "p1", "error": f"{field} must be a list of strings"}
+    assert summary["summary"]["errors"] == 1
+
+
+def test_input_error_is_raised_not_hung(checker):
+    def records():
+        yield {"id": "p1", "medications": []}
+        raise OSError("input went away")
+
+    with pytest.raises(OSError):
+        run_all(checker, records())
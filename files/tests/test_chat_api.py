@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    from fastapi.testclient import TestClient
+    import api_server
+    return api_server, TestClient(api_server.app)
+
+
+class _FakeCache:
+    """Semantic cache that answers every probe — records what it was asked."""
+
+    def __init__(self):
+        self.probed = []
+
+    def record_skip(self):
+        pass
+
+    def probe(self, message):
+        self.probed.append(message)
+        return message
+
+    def lookup(self, probe):
+        return "cached answer", 0.99
+
+    def store(self, probe, question, answer):
+        pass
+
+
+def test_assistant_only_history_still_uses_semantic_cache(client, monkeypatch):
+    api_server, http = client
+    cache = _FakeCache()
+    monkeypatch.setattr(api_server, "get_semantic_cache", lambda: cache)
+
+    async def no_llm(message, context):
+        raise AssertionError("LLM must not be called on a cache hit")
+    monkeypatch.setattr(api_server.chat_agent, "reply", no_llm)
+
+    response = http.post("/chat", json={
+        "message": "What are common side effects of ibuprofen?",
+        "history": [{"role": "assistant", "content": "Hi! Ask me any health question."}],
+    })
+
+    assert response.status_code == 200
+    assert response.json()["reply"] == "cached answer"
+    assert cache.probed == ["What are common side effects of ibuprofen?"]
@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agents.drug_agent import DrugInteractionAgent
+
+
+class FakePairCache:
+    def __init__(self):
+        self.stored = {}
+
+    async def get_many(self, keys):
+        return {}
+
+    async def put_many(self, by_key):
+        self.stored.update(by_key)
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    agent = DrugInteractionAgent()
+    agent.pair_cache = FakePairCache()
+
+    async def no_openfda(medications):
+        return {}
+    monkeypatch.setattr(agent, "_query_openfda", no_openfda)
+    return agent
+
+
+def test_non_dict_interaction_items_are_skipped(agent, monkeypatch):
+    async def llm(prompt, **kwargs):
+        return {"interactions": ["oops", None, {
+            "drug1": "metformin", "drug2": "gabapentin", "severity": "Minor",
+            "mechanism": "m", "description": "d", "action": "a",
+        }]}
+    monkeypatch.setattr(agent.llm, "json_call", llm)
+
+    session = SimpleNamespace(medications=["metformin", "gabapentin"])
+    interactions = asyncio.run(agent.run(session, []))
+    assert [{i["drug1"], i["drug2"]} for i in interactions] == [{"metformin", "gabapentin"}]
+    assert all(agent.pair_cache.stored.values())  # no empty "no interaction" entries cached
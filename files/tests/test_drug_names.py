@@ -0,0 +1,52 @@
+import pytest
+
+from utils.drug_names import DrugNameNormalizer, edit_distance
+
+
+@pytest.fixture
+def normalizer():
+    return DrugNameNormalizer()
+
+
+@pytest.mark.parametrize("name", [
+    "lovastatin",          # pravastatin
+    "ampicillin",          # amoxicillin
+    "prednisolone",        # prednisone
+    "rabeprazole",         # omeprazole
+    "dexmethylphenidate",  # methylphenidate
+])
+def test_distinct_drugs_are_not_rewritten(normalizer, name):
+    assert normalizer.normalize(name) == name
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("lisinopril hydrochlorothiazide", "lisinopril hydrochlorothiazide"),
+    ("amoxicillin clavulanate", "amoxicillin clavulanate"),
+    ("tramadol acetaminophen", "tramadol acetaminophen"),
+    ("Tylenol PM", "tylenol pm"),
+    ("Advil PM", "advil pm"),
+])
+def test_combination_products_keep_all_components(normalizer, name, expected):
+    assert normalizer.normalize(name) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("warfrin", "warfarin"),
+    ("wafrarin", "warfarin"),
+    ("metforman", "metformin"),
+    ("Advil", "ibuprofen"),
+    ("Metoprolol Succinate ER", "metoprolol"),
+])
+def test_brands_salts_and_typos_resolve(normalizer, name, expected):
+    assert normalizer.normalize(name) == expected
+
+
+def test_ambiguous_typo_is_kept(normalizer):
+    normalizer.add("abcdefx", "abcdefx")
+    normalizer.add("abcdefy", "abcdefy")
+    assert normalizer.normalize("abcdefz") == "abcdefz"
+
+
+def test_edit_distance_counts_swaps_once():
+    assert edit_distance("warfarin", "wafrarin", 2) == 1
+    assert edit_distance("lovastatin", "pravastatin", 2) == 3
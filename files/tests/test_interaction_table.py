@@ -0,0 +1,25 @@
+import pytest
+
+import utils.drug_names
+from utils.drug_names import get_drug_normalizer
+from utils.interaction_table import lookup_pair, split_known_pairs, table_drugs
+
+
+@pytest.fixture
+def normalizer(monkeypatch):
+    monkeypatch.setattr(utils.drug_names, "_normalizer", None)
+    monkeypatch.setattr("utils.label_store.get_offline_store", lambda: None)
+    return get_drug_normalizer()
+
+
+def test_every_table_name_normalizes_to_itself(normalizer):
+    for drug in table_drugs():
+        assert normalizer.normalize(drug) == drug
+
+
+def test_statin_macrolide_pair_found_after_normalization(normalizer):
+    drugs = [normalizer.normalize(name) for name in ("Lovastatin", "clarithromycin")]
+    known, unknown = split_known_pairs(drugs)
+    assert known[("clarithromycin", "lovastatin")][0] == "Major"
+    assert unknown == []
+    assert lookup_pair("lovastatin", "clarithromycin") is not None
@@ -0,0 +1,44 @@
+import pytest
+
+import utils.drug_names
+from utils.semantic_cache import SemanticAnswerCache, find_mentions
+
+
+@pytest.fixture(autouse=True)
+def normalizer(monkeypatch):
+    monkeypatch.setattr(utils.drug_names, "_normalizer", None)
+    monkeypatch.setattr("utils.label_store.get_offline_store", lambda: None)
+
+
+IBUPROFEN = "Is it safe to drink alcohol while taking ibuprofen?"
+ACETAMINOPHEN = "Is it safe to drink alcohol while taking acetaminophen?"
+
+
+def test_mentions_name_the_drug_and_condition():
+    assert find_mentions(IBUPROFEN) == {"ibuprofen", "condition:alcohol"}
+    assert find_mentions("can you take Advil with alcohol") == {"ibuprofen", "condition:alcohol"}
+    assert find_mentions(ACETAMINOPHEN) == {"acetaminophen", "condition:alcohol"}
+    assert find_mentions("is ibuprofen ok with asthma") != find_mentions("is ibuprofen ok with kidney disease")
+
+
+class _SameVectorEncoder:
+    """Embeds every question identically — the worst case for a similarity-only cache."""
+
+    def __init__(self, np):
+        self.np = np
+
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+    def encode(self, texts, normalize_embeddings=True):
+        return self.np.array([[0.5, 0.5, 0.5, 0.5]] * len(texts))
+
+
+def test_answer_for_another_drug_is_not_served():
+    np = pytest.importorskip("numpy")
+    cache = SemanticAnswerCache(_SameVectorEncoder(np), size=8)
+    cache.store(cache.probe(IBUPROFEN), IBUPROFEN, "ibuprofen answer")
+
+    assert cache.lookup(cache.probe(ACETAMINOPHEN)) is None
+    answer, _ = cache.lookup(cache.probe("Can I drink alcohol when taking Advil?"))
+    assert answer == "ibuprofen answer"
@@ -0,0 +1,31 @@
+from utils.vision_cache import VisionReportCache
+
+PHOTO = 0b1011_0110_1110_0001
+SIMILAR_PHOTO = PHOTO ^ 0b11  # two bits apart, e.g. another patient's similar rash
+
+
+def test_reports_are_not_shared_between_sessions():
+    cache = VisionReportCache()
+    cache.put(PHOTO, "rash", "patient-a", "report for patient A")
+
+    assert cache.get(PHOTO, "rash", "patient-b") is None
+    assert cache.get(PHOTO, "rash", "patient-a") == "report for patient A"
+
+
+def test_without_a_scope_nothing_is_cached():
+    cache = VisionReportCache()
+    cache.put(PHOTO, "rash", None, "report")
+    assert cache.get(PHOTO, "rash", None) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_default_needs_the_same_image():
+    cache = VisionReportCache()
+    cache.put(PHOTO, "rash", "patient-a", "report")
+    assert cache.get(SIMILAR_PHOTO, "rash", "patient-a") is None
+
+
+def test_tolerance_is_opt_in():
+    cache = VisionReportCache(max_distance=6)
+    cache.put(PHOTO, "rash", "patient-a", "report")
+    assert cache.get(SIMILAR_PHOTO, "rash", "patient-a") == "report"
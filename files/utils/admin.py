@@ -0,0 +1,25 @@
+"""
+Admin
+======
+Access check for the /admin/* endpoints (profiles, memory) and for
+client-requested diagnostics such as the X-MedAI-Profile header.
+
+Admin access is off unless MEDAI_ADMIN_TOKEN is set; requests then have
+to send it in the X-Admin-Token header.
+
+Config (env):
+  MEDAI_ADMIN_TOKEN   shared secret for admin endpoints (default unset = disabled)
+"""
+
+import hmac
+import os
+
+ADMIN_TOKEN = os.getenv("MEDAI_ADMIN_TOKEN", "")
+
+
+def is_admin(token) -> bool:
+    if not ADMIN_TOKEN or token is None:
+        return False
+    # Bytes: compare_digest rejects non-ASCII str, and headers arrive as latin-1 text
+    supplied = token if isinstance(token, bytes) else str(token).encode("utf-8", "surrogateescape")
+    return hmac.compare_digest(supplied, ADMIN_TOKEN.encode("utf-8", "surrogateescape"))
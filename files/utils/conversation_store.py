@@ -0,0 +1,191 @@
+"""
+ConversationStore
+==================
+Server-side chat conversations, so a client sends only
+{conversation_id, message} instead of its whole history every turn.
+
+Each Conversation keeps:
+  - a running summary of older turns
+  - the recent turns, each formatted once when appended ("Patient: ..."),
+    with a running token estimate — the prompt context is a join of
+    already-formatted lines, never rebuilt from raw history
+
+When the recent turns pass CHAT_SUMMARY_TOKENS, a background task folds
+all but the last CHAT_KEEP_TURNS into the summary with the LLM. The
+request that crossed the threshold does not wait for it. Until the
+compaction lands, context() still caps itself at the newest turns that
+fit the budget, so prompt size is bounded either way.
+
+Clients that still send {message, history} without a conversation_id
+get a conversation seeded from the last LEGACY_HISTORY_TURNS messages of
+that history — the window the old endpoint used. A seeded conversation
+is not compacted until the client continues it by id: an old client
+never does, so summarizing it would be an LLM call nobody reads.
+
+Conversations live in memory only, with TTL and LRU bounds.
+
+Config (env):
+  MEDAI_CHAT_TTL             idle seconds before a conversation expires (default 1800)
+  MEDAI_CHAT_MAX_CONVERSATIONS  max stored conversations (default 10000)
+  MEDAI_CHAT_SUMMARY_TOKENS  recent-turn tokens that trigger compaction (default 800)
+  MEDAI_CHAT_KEEP_TURNS      turns kept verbatim after compaction (default 4)
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from utils.log import get_logger
+
+CHAT_TTL = float(os.getenv("MEDAI_CHAT_TTL", "1800"))
+CHAT_MAX_CONVERSATIONS = int(os.getenv("MEDAI_CHAT_MAX_CONVERSATIONS", "10000"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("MEDAI_CHAT_SUMMARY_TOKENS", "800"))
+CHAT_KEEP_TURNS = int(os.getenv("MEDAI_CHAT_KEEP_TURNS", "4"))
+
+CHARS_PER_TOKEN = 4
+LEGACY_HISTORY_TURNS = 6  # client-sent history kept when seeding a conversation
+
+log = get_logger("chat")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_turn(role: str, content: str) -> str:
+    return f"{'Patient' if role == 'user' else 'Assistant'}: {content}\n"
+
+
+class Conversation:
+
+    def __init__(self, conversation_id: str):
+        self.id = conversation_id
+        self.summary = ""
+        self.turns = deque()      # (formatted line, tokens)
+        self.tokens = 0           # sum over turns
+        self.total_turns = 0
+        self.updated_at = time.time()
+        self.compacting = False
+        self.seeded = False       # created from client history, not yet continued by id
+
+    def append(self, role: str, content: str):
+        line = format_turn(role, content)
+        tokens = estimate_tokens(line)
+        self.turns.append((line, tokens))
+        self.tokens += tokens
+        self.total_turns += 1
+        self.updated_at = time.time()
+
+    def is_empty(self) -> bool:
+        return not self.turns and not self.summary
+
+    def context(self, budget: int = CHAT_SUMMARY_TOKENS) -> str:
+        """Summary + the newest turns that fit the token budget."""
+        lines, used = [], 0
+        for line, tokens in reversed(self.turns):
+            if lines and used + tokens > budget:
+                break
+            lines.append(line)
+            used += tokens
+        recent = "".join(reversed(lines))
+        if self.summary:
+            return f"(Summary of earlier conversation: {self.summary})\n{recent}"
+        return recent
+
+
+class ConversationStore:
+
+    def __init__(self, summarize, ttl: float = CHAT_TTL, max_conversations: int = CHAT_MAX_CONVERSATIONS,
+                 summary_tokens: int = CHAT_SUMMARY_TOKENS, keep_turns: int = CHAT_KEEP_TURNS):
+        """summarize: async (previous_summary, transcript) -> new summary."""
+        self.summarize = summarize
+        self.ttl = ttl
+        self.max_conversations = max_conversations
+        self.summary_tokens = summary_tokens
+        self.keep_turns = keep_turns
+        self._conversations = OrderedDict()
+        self._tasks = set()
+        self.compactions = self.compaction_errors = self.expired = self.evicted = 0
+
+    def create(self, history: list = None) -> Conversation:
+        """New conversation, optionally seeded from a client-sent history (legacy clients)."""
+        self.purge_expired()
+        conversation = Conversation(uuid.uuid4().hex)
+        if not any(msg.get("role", "user") == "user" for msg in history or []):
+            history = []  # only a canned greeting: still a first turn (semantic cache, no seeding)
+        for msg in history[-LEGACY_HISTORY_TURNS:]:
+            conversation.append(msg.get("role", "user"), msg.get("content", ""))
+        conversation.seeded = bool(history)
+        self._conversations[conversation.id] = conversation
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+            self.evicted += 1
+        return conversation
+
+    def get(self, conversation_id: str):
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        if time.time() - conversation.updated_at > self.ttl:
+            del self._conversations[conversation_id]
+            self.expired += 1
+            return None
+        self._conversations.move_to_end(conversation_id)
+        conversation.seeded = False  # the client keeps the id, so compaction pays off now
+        return conversation
+
+    def record_exchange(self, conversation: Conversation, message: str, reply: str):
+        conversation.append("user", message)
+        conversation.append("assistant", reply)
+        self.maybe_compact(conversation)
+
+    def maybe_compact(self, conversation: Conversation):
+        if conversation.seeded:
+            return
+        if (conversation.tokens > self.summary_tokens and not conversation.compacting
+                and len(conversation.turns) > self.keep_turns):
+            conversation.compacting = True
+            task = asyncio.ensure_future(self._compact(conversation))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _compact(self, conversation: Conversation):
+        # Only the oldest turns are folded; turns appended meanwhile stay at the end untouched
+        count = len(conversation.turns) - self.keep_turns
+        old = [conversation.turns[i] for i in range(count)]
+        try:
+            summary = await self.summarize(conversation.summary, "".join(line for line, _ in old))
+        except Exception as e:
+            self.compaction_errors += 1
+            log.error("Summarization failed", conversation_id=conversation.id, error=f"{type(e).__name__}: {e}")
+            conversation.compacting = False
+            return
+        conversation.compacting = False
+        if summary:
+            conversation.summary = summary
+            for _ in range(count):
+                _, tokens = conversation.turns.popleft()
+                conversation.tokens -= tokens
+            self.compactions += 1
+            # Turns that arrived while summarizing may already be over the threshold again
+            self.maybe_compact(conversation)
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        while self._conversations:
+            conversation_id, conversation = next(iter(self._conversations.items()))
+            if conversation.updated_at >= cutoff:
+                break
+            del self._conversations[conversation_id]
+            self.expired += 1
+
+    def stats(self) -> dict:
+        self.purge_expired()
+        return {
+            "conversations": len(self._conversations),
+            "compactions": self.compactions,
+            "compaction_errors": self.compaction_errors,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,219 @@
+"""
+DrugNameNormalizer
+===================
+Maps user-entered medication names to one canonical generic name:
+
+  "Advil"                  → "ibuprofen"       (brand)
+  "metoprolol succinate"   → "metoprolol"      (salt form)
+  "warfrin"                → "warfarin"        (misspelling, one edit away)
+
+Two layers:
+  1. Exact dictionary  — aliases (brands, substances, generics) → canonical
+  2. Typo match        — a single-word input within MEDAI_DRUG_FUZZY_MAX_EDITS
+                         edits (insert/delete/substitute/swap) of exactly one
+                         known drug; a trigram index finds the candidates
+
+Many real, different drugs are only two or three edits apart (lovastatin /
+pravastatin, ampicillin / amoxicillin, prednisolone / prednisone), so the
+typo match is deliberately narrow. Multi-word input ("tramadol
+acetaminophen", "Tylenol PM") is a combination or a product name and is
+never fuzzed, and an ambiguous or distant input is kept as typed — an
+unresolved name costs a broader OpenFDA query, a wrong one a wrong answer.
+
+The vocabulary is seeded from COMMON_BRANDS, TOP_FORMULARY_DRUGS and the
+interaction table's drug names, and, when the offline label store exists,
+from every label's brand/substance/generic names.
+
+The canonical name is the cache key for label lookups and interaction
+caches, and lets the drug agent make exactly one precise OpenFDA query.
+
+Config (env):
+  MEDAI_DRUG_FUZZY_MAX_EDITS   edit distance accepted for a misspelling (default 1, 0 = off)
+"""
+
+import os
+import re
+from collections import defaultdict
+from utils.label_cache import normalize_key
+
+FUZZY_MAX_EDITS = int(os.getenv("MEDAI_DRUG_FUZZY_MAX_EDITS", "1"))
+FUZZY_MIN_LENGTH = 5  # shorter words are too close to everything
+
+# Salt / ester / hydrate words that do not change the active moiety
+SALT_WORDS = {
+    "hydrochloride", "hcl", "hydrobromide", "sodium", "potassium", "calcium", "magnesium",
+    "succinate", "tartrate", "besylate", "mesylate", "maleate", "fumarate", "citrate",
+    "sulfate", "phosphate", "acetate", "bromide", "chloride", "dihydrate", "monohydrate",
+    "trihydrate", "hemihydrate", "anhydrous", "carbonate", "oxide", "hydroxide", "er", "xr", "sr", "xl", "cr", "dr", "ir",
+}
+
+# Frequent brand names → generic (seed; label data extends this)
+COMMON_BRANDS = {
+    "advil": "ibuprofen", "motrin": "ibuprofen", "tylenol": "acetaminophen",
+    "paracetamol": "acetaminophen", "aleve": "naproxen", "bayer": "aspirin",
+    "coumadin": "warfarin", "jantoven": "warfarin", "eliquis": "apixaban",
+    "xarelto": "rivaroxaban", "plavix": "clopidogrel", "lipitor": "atorvastatin",
+    "crestor": "rosuvastatin", "zocor": "simvastatin", "synthroid": "levothyroxine",
+    "glucophage": "metformin", "zestril": "lisinopril", "prinivil": "lisinopril",
+    "norvasc": "amlodipine", "lopressor": "metoprolol", "toprol": "metoprolol",
+    "cozaar": "losartan", "neurontin": "gabapentin", "zoloft": "sertraline",
+    "lexapro": "escitalopram", "celexa": "citalopram", "prozac": "fluoxetine",
+    "wellbutrin": "bupropion", "cymbalta": "duloxetine", "effexor": "venlafaxine",
+    "lasix": "furosemide", "prilosec": "omeprazole", "nexium": "esomeprazole",
+    "protonix": "pantoprazole", "singulair": "montelukast", "flomax": "tamsulosin",
+    "coreg": "carvedilol", "mobic": "meloxicam", "deltasone": "prednisone",
+    "lantus": "insulin glargine", "ultram": "tramadol", "xanax": "alprazolam",
+    "klonopin": "clonazepam", "ambien": "zolpidem", "flexeril": "cyclobenzaprine",
+    "zyloprim": "allopurinol", "aldactone": "spironolactone", "glucotrol": "glipizide",
+    "ritalin": "methylphenidate", "adderall": "dextroamphetamine", "desyrel": "trazodone",
+    "ventolin": "albuterol", "proair": "albuterol", "amoxil": "amoxicillin",
+    "viagra": "sildenafil", "lanoxin": "digoxin", "cordarone": "amiodarone",
+}
+
+# Most-dispensed drugs in our formulary — always known, preloaded by warm_label_cache.py
+TOP_FORMULARY_DRUGS = [
+    "atorvastatin", "levothyroxine", "metformin", "lisinopril", "amlodipine",
+    "metoprolol", "albuterol", "omeprazole", "losartan", "gabapentin",
+    "hydrochlorothiazide", "sertraline", "simvastatin", "montelukast", "escitalopram",
+    "rosuvastatin", "bupropion", "furosemide", "pantoprazole", "trazodone",
+    "dextroamphetamine", "fluticasone", "tamsulosin", "fluoxetine", "carvedilol",
+    "duloxetine", "meloxicam", "clopidogrel", "prednisone", "citalopram",
+    "insulin glargine", "potassium chloride", "pravastatin", "tramadol", "aspirin",
+    "alprazolam", "ibuprofen", "cyclobenzaprine", "amoxicillin", "methylphenidate",
+    "allopurinol", "venlafaxine", "clonazepam", "ergocalciferol", "zolpidem",
+    "apixaban", "glipizide", "hydrocodone", "spironolactone", "warfarin",
+]
+
+
+def strip_salt_forms(name: str) -> str:
+    """'Metoprolol Succinate ER' → 'metoprolol'. Falls back to the input if nothing remains."""
+    words = re.sub(r"[^a-z0-9 ]+", " ", normalize_key(name)).split()
+    kept = [w for w in words if w not in SALT_WORDS and not re.fullmatch(r"\d+(mg|mcg|g|ml)?", w)]
+    return " ".join(kept) or normalize_key(name)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (a swap counts as one edit); limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DrugNameNormalizer:
+
+    def __init__(self):
+        self._aliases = {}                 # alias → canonical generic
+        self._index = defaultdict(set)     # trigram → aliases containing it
+        self._resolved = {}                # memo: raw input → canonical
+
+        for brand, generic in COMMON_BRANDS.items():
+            self.add(brand, generic)
+        for drug in TOP_FORMULARY_DRUGS:
+            self.add(drug, drug)
+
+    def add(self, alias: str, canonical: str):
+        """Register alias → canonical (the canonical name maps to itself)."""
+        canonical = strip_salt_forms(canonical)
+        for key in {strip_salt_forms(alias), canonical}:
+            if not key or key in self._aliases:
+                continue
+            self._aliases[key] = canonical
+            for gram in _trigrams(key):
+                self._index[gram].add(key)
+            self._resolved.clear()
+
+    def load_label_names(self, rows):
+        """rows: iterable of (label_id, name, kind) from the offline store, grouped by label."""
+        by_label = defaultdict(lambda: ([], []))
+        for label_id, name, kind in rows:
+            generics, others = by_label[label_id]
+            (generics if kind == "generic_name" else others).append(name)
+        for generics, others in by_label.values():
+            # Combination products (several generics) are indexed under their own full name
+            if len(generics) != 1:
+                continue
+            for alias in others + generics:
+                self.add(alias, generics[0])
+
+    def is_known(self, canonical: str) -> bool:
+        return canonical in self._aliases
+
+    def mentions(self, text: str) -> set:
+        """Canonical names of the known drugs mentioned in free text ("can I take advil with lisinopril")."""
+        words = re.findall(r"[a-z][a-z0-9]*", normalize_key(text))
+        found, i = set(), 0
+        while i < len(words):
+            pair = " ".join(words[i:i + 2])
+            if i + 1 < len(words) and pair in self._aliases:  # "insulin glargine", "potassium chloride"
+                found.add(self._aliases[pair])
+                i += 2
+                continue
+            canonical = self._aliases.get(words[i]) or self._fuzzy(words[i])
+            if canonical:
+                found.add(canonical)
+            i += 1
+        return found
+
+    def normalize(self, name: str) -> str:
+        """Canonical generic for `name`; the salt-stripped input if nothing matches."""
+        if name in self._resolved:
+            return self._resolved[name]
+        key = strip_salt_forms(name)
+        canonical = self._aliases.get(key)
+        if canonical is None and " " not in key:  # combinations / product names are never fuzzed
+            canonical = self._fuzzy(key)
+        canonical = canonical or key
+        if len(self._resolved) >= 10000:  # bound the memo against arbitrary user input
+            self._resolved.clear()
+        self._resolved[name] = canonical
+        return canonical
+
+    def _fuzzy(self, key: str):
+        """Canonical name of the one known drug within FUZZY_MAX_EDITS of `key`, else None."""
+        if FUZZY_MAX_EDITS <= 0 or len(key) < FUZZY_MIN_LENGTH:
+            return None
+        grams = _trigrams(key)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for alias in self._index.get(gram, ()):
+                overlap[alias] += 1
+        # One edit (a swap included) touches at most four of the input's trigrams
+        needed = len(grams) - 4 * FUZZY_MAX_EDITS
+        matches = {self._aliases[alias] for alias, common in overlap.items()
+                   if common >= needed and " " not in alias
+                   and edit_distance(key, alias, FUZZY_MAX_EDITS) <= FUZZY_MAX_EDITS}
+        # Two different drugs within reach: the input is ambiguous, not a typo of either
+        return matches.pop() if len(matches) == 1 else None
+
+
+_normalizer = None
+
+
+def get_drug_normalizer() -> DrugNameNormalizer:
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = DrugNameNormalizer()
+        from utils.interaction_table import table_drugs
+        for drug in sorted(table_drugs()):  # exact, so the table lookup sees its own names
+            _normalizer.add(drug, drug)
+        from utils.label_store import get_offline_store
+        store = get_offline_store()
+        if store is not None:
+            _normalizer.load_label_names(store.iter_names())
+    return _normalizer
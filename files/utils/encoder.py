@@ -0,0 +1,38 @@
+"""
+Sentence encoder
+=================
+One process-wide SentenceTransformer (all-MiniLM-L6-v2), shared by
+RAGAgent retrieval and the chat semantic answer cache. Loading the model
+takes seconds and ~100 MB, so it is done once, lazily.
+
+sentence-transformers is optional: get_encoder() returns None without it
+and callers fall back (keyword retrieval, no semantic cache).
+
+Config (env):
+  MEDAI_ENCODER_MODEL   model name (default all-MiniLM-L6-v2)
+"""
+
+import os
+import threading
+from utils.log import get_logger
+
+ENCODER_MODEL = os.getenv("MEDAI_ENCODER_MODEL", "all-MiniLM-L6-v2")
+
+log = get_logger("encoder")
+
+_encoder = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def get_encoder():
+    global _encoder, _loaded
+    with _lock:
+        if not _loaded:
+            _loaded = True
+            try:
+                from sentence_transformers import SentenceTransformer
+                _encoder = SentenceTransformer(ENCODER_MODEL)
+            except Exception as e:
+                log.warning("Sentence encoder unavailable", error=f"{type(e).__name__}: {e}")
+        return _encoder
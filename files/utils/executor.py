@@ -0,0 +1,100 @@
+"""
+Executor
+=========
+Execution policy for CPU-bound work inside the async pipeline.
+
+Agents run inside FastAPI's event loop, so any heavy synchronous step
+(base64 encoding an upload, SentenceTransformer.encode, regex triage,
+SQLite cache reads) stalls every other connection on the
+worker. All such steps go through run_cpu(), which hands them to one
+shared, sized thread pool.
+
+A thread pool (not a process pool) is used on purpose: the heavy calls
+here (base64, numpy/torch encode, sqlite) release the GIL or are short,
+and the encoder/regex objects they touch are not cheaply picklable.
+
+Config (env):
+  MEDAI_CPU_WORKERS        pool size (default: min(4, cpu count))
+  MEDAI_LOOP_LAG_INTERVAL  seconds between event-loop lag probes (default 0.5)
+"""
+
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CPU_WORKERS = int(os.getenv("MEDAI_CPU_WORKERS", min(4, os.cpu_count() or 1)))
+LOOP_LAG_INTERVAL = float(os.getenv("MEDAI_LOOP_LAG_INTERVAL", "0.5"))
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="medai-cpu")
+    return _executor
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Run a CPU-bound callable on the shared pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a sleep(interval) wakes up.
+    A blocked loop shows up directly as a large lag value.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = 0
+        self._total_ms = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._probe())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _probe(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - start - self.interval) * 1000)
+            self.last_ms = lag_ms
+            self.max_ms = max(self.max_ms, lag_ms)
+            self.samples += 1
+            self._total_ms += lag_ms
+
+    def stats(self) -> dict:
+        return {
+            "last_ms": round(self.last_ms, 2),
+            "max_ms": round(self.max_ms, 2),
+            "avg_ms": round(self._total_ms / self.samples, 2) if self.samples else 0.0,
+            "samples": self.samples,
+            "cpu_workers": CPU_WORKERS,
+        }
+
+
+loop_lag = LoopLagMonitor()
@@ -0,0 +1,65 @@
+"""
+HTTP Client
+============
+One application-scoped aiohttp session shared by every agent that talks
+to external HTTP APIs (currently OpenFDA).
+
+Creating a ClientSession per call means a fresh TCP + TLS handshake to
+api.fda.gov for every drug check. The shared session keeps connections
+alive and caches DNS, so request latency is mostly server time.
+
+Config (env):
+  MEDAI_HTTP_LIMIT            total open connections (default 100)
+  MEDAI_HTTP_LIMIT_PER_HOST   open connections per host (default 10)
+  MEDAI_HTTP_KEEPALIVE        idle keep-alive seconds (default 30)
+  MEDAI_HTTP_DNS_TTL          DNS cache TTL seconds (default 300)
+  MEDAI_OPENFDA_CONCURRENCY   max in-flight OpenFDA requests (default 8)
+
+Call close_http_session() on shutdown (api_server lifespan / main.py).
+"""
+
+import asyncio
+import os
+import aiohttp
+
+HTTP_LIMIT = int(os.getenv("MEDAI_HTTP_LIMIT", "100"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("MEDAI_HTTP_LIMIT_PER_HOST", "10"))
+HTTP_KEEPALIVE = float(os.getenv("MEDAI_HTTP_KEEPALIVE", "30"))
+HTTP_DNS_TTL = int(os.getenv("MEDAI_HTTP_DNS_TTL", "300"))
+OPENFDA_CONCURRENCY = int(os.getenv("MEDAI_OPENFDA_CONCURRENCY", "8"))
+
+_session = None
+_openfda_semaphore = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared session, creating it on first use inside the running loop."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_LIMIT,
+            limit_per_host=HTTP_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE,
+            ttl_dns_cache=HTTP_DNS_TTL,
+            use_dns_cache=True,
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+
+def openfda_slot() -> asyncio.Semaphore:
+    """Semaphore capping simultaneous OpenFDA requests across the process."""
+    global _openfda_semaphore
+    if _openfda_semaphore is None:
+        _openfda_semaphore = asyncio.Semaphore(OPENFDA_CONCURRENCY)
+    return _openfda_semaphore
+
+
+async def close_http_session():
+    global _session, _openfda_semaphore
+    if _session is not None and not _session.closed:
+        await _session.close()
+        # Give the connector a tick to close SSL transports cleanly
+        await asyncio.sleep(0.25)
+    _session = None
+    _openfda_semaphore = None
@@ -0,0 +1,160 @@
+"""
+Image preprocessing
+====================
+Normalizes patient uploads before they reach the vision model:
+
+  1. Reject uploads over MAX_UPLOAD_BYTES or MAX_PIXELS (decompression bombs)
+  2. Decode once, apply EXIF orientation, then drop all metadata (EXIF/GPS)
+  3. Downscale so the longest edge is at most MAX_EDGE — the vision models
+     tile/resize internally, so extra pixels only cost upload time
+  4. Re-encode as JPEG at bounded quality, flattening any alpha channel
+  5. Compute a 64-bit perceptual hash (DCT pHash) of the normalized image,
+     used by the vision report cache to recognize resubmitted photos
+
+The input may be bytes or a binary file object (an upload already
+spooled to disk by the multipart parser, or an open file): Pillow reads
+from the file directly, so the raw upload is never held in memory. The
+result carries its real MIME type so the data URL is correct.
+Pillow is optional: without it, the upload is passed through unchanged
+with a MIME type sniffed from its magic bytes.
+
+Config (env):
+  MEDAI_VISION_MAX_EDGE      longest edge in pixels (default 1120)
+  MEDAI_VISION_JPEG_QUALITY  JPEG quality 1-95 (default 85)
+  MEDAI_MAX_UPLOAD_MB        hard upload size limit (default 20)
+  MEDAI_MAX_IMAGE_MP         hard decoded size limit in megapixels (default 50)
+  MEDAI_MAX_IMAGES           images accepted per assessment (default 4)
+"""
+
+import base64
+import hashlib
+import io
+import math
+import os
+from dataclasses import dataclass
+
+MAX_EDGE = int(os.getenv("MEDAI_VISION_MAX_EDGE", "1120"))
+JPEG_QUALITY = int(os.getenv("MEDAI_VISION_JPEG_QUALITY", "85"))
+MAX_UPLOAD_BYTES = int(float(os.getenv("MEDAI_MAX_UPLOAD_MB", "20")) * 1024 * 1024)
+MAX_PIXELS = int(float(os.getenv("MEDAI_MAX_IMAGE_MP", "50")) * 1_000_000)
+MAX_IMAGES = int(os.getenv("MEDAI_MAX_IMAGES", "4"))
+
+_MAGIC = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+# pHash: 32x32 grayscale → 2D DCT → top-left 8x8 low frequencies vs their median
+_HASH_SIZE = 32
+_HASH_FREQS = 8
+_DCT = [[math.cos(math.pi * (2 * x + 1) * u / (2 * _HASH_SIZE)) for x in range(_HASH_SIZE)]
+        for u in range(_HASH_FREQS)]
+
+
+class ImageRejected(ValueError):
+    """Upload is not a usable image."""
+
+
+class ImageTooLarge(ImageRejected):
+    """Upload exceeds the byte or pixel limit."""
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime: str
+    width: int = 0
+    height: int = 0
+    original_bytes: int = 0
+    phash: int = 0
+
+    def data_url(self) -> str:
+        """Base64 data URL for a vision request. Built at send time — don't store it."""
+        return f"data:{self.mime};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+def sniff_mime(data: bytes) -> str:
+    for magic, mime in _MAGIC:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    raise ImageRejected("Unsupported image format (expected JPEG, PNG, GIF or WebP)")
+
+
+def perceptual_hash(image) -> int:
+    """64-bit DCT perceptual hash of a Pillow image. Near-duplicates differ in few bits."""
+    from PIL import Image
+    small = image.convert("L").resize((_HASH_SIZE, _HASH_SIZE), Image.LANCZOS)
+    pixels = list(small.getdata())
+    rows = [pixels[i:i + _HASH_SIZE] for i in range(0, len(pixels), _HASH_SIZE)]
+    # Separable DCT, computing only the low frequencies that are kept
+    row_freqs = [[sum(c * p for c, p in zip(basis, row)) for basis in _DCT] for row in rows]
+    coeffs = [sum(basis[y] * row_freqs[y][u] for y in range(_HASH_SIZE))
+              for v, basis in enumerate(_DCT) for u in range(_HASH_FREQS)]
+    # DC term excluded from the median so overall brightness doesn't dominate
+    median = sorted(coeffs[1:])[len(coeffs) // 2 - 1]
+    value = 0
+    for c in coeffs:
+        value = (value << 1) | (c > median)
+    return value
+
+
+def content_hash(data: bytes) -> int:
+    """Exact-match fallback when Pillow is unavailable."""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def _source_size(source) -> int:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    source.seek(0, io.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+    return size
+
+
+def preprocess_image(source) -> PreparedImage:
+    """
+    Decode, orient, strip, downscale and re-encode bytes or a binary file.
+    CPU-bound and may do blocking file I/O — call via run_cpu.
+    """
+    size = _source_size(source)
+    if size > MAX_UPLOAD_BYTES:
+        raise ImageTooLarge(f"Image exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+    fileobj = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        data = fileobj.read()
+        return PreparedImage(data=data, mime=sniff_mime(data), original_bytes=size,
+                             phash=content_hash(data))
+
+    try:
+        image = Image.open(fileobj)
+        if image.width * image.height > MAX_PIXELS:
+            raise ImageTooLarge(f"Image exceeds {MAX_PIXELS // 1_000_000} megapixel limit")
+        # JPEG draft mode decodes at a reduced scale directly — much cheaper for big photos
+        image.draft("RGB", (MAX_EDGE, MAX_EDGE))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((MAX_EDGE, MAX_EDGE), Image.LANCZOS)
+    except ImageRejected:
+        raise
+    except Exception as e:
+        raise ImageRejected(f"Could not decode image: {e}")
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.split()[-1])
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    out = io.BytesIO()
+    # A fresh save without exif= writes no metadata
+    image.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return PreparedImage(data=out.getvalue(), mime="image/jpeg", width=image.width,
+                         height=image.height, original_bytes=size, phash=perceptual_hash(image))
@@ -0,0 +1,238 @@
+"""
+InteractionTable
+=================
+Deterministic, local drug-drug interaction knowledge for well-known pairs,
+so common polypharmacy checks need no LLM call.
+
+Entries are written against canonical generic names (see drug_names.py,
+which registers every name used here as an exact entry) or drug classes,
+and expanded once at import into a flat dict:
+
+  (drug_a, drug_b) sorted  →  entry index  →  (severity, mechanism, description, action)
+
+Keys are order-independent (the pair is sorted), and identical entries
+are shared between all the pairs a class rule expands to.
+
+The table only asserts interactions that exist. A pair that is absent is
+"unknown", not "safe" — the drug agent still sends it to the LLM.
+"""
+
+from itertools import combinations
+
+DRUG_CLASSES = {
+    "nsaid": {"ibuprofen", "naproxen", "meloxicam", "diclofenac", "celecoxib", "ketorolac", "indomethacin"},
+    "anticoagulant": {"warfarin", "apixaban", "rivaroxaban", "dabigatran", "edoxaban"},
+    "antiplatelet": {"aspirin", "clopidogrel", "prasugrel", "ticagrelor"},
+    "ssri": {"sertraline", "fluoxetine", "escitalopram", "citalopram", "paroxetine"},
+    "snri": {"duloxetine", "venlafaxine", "desvenlafaxine"},
+    "ace_inhibitor": {"lisinopril", "enalapril", "ramipril", "benazepril"},
+    "arb": {"losartan", "valsartan", "irbesartan", "olmesartan"},
+    "potassium_sparing": {"spironolactone", "eplerenone", "amiloride", "triamterene"},
+    "benzodiazepine": {"alprazolam", "clonazepam", "lorazepam", "diazepam"},
+    "opioid": {"tramadol", "hydrocodone", "oxycodone", "morphine", "codeine", "fentanyl"},
+    "statin_cyp3a4": {"simvastatin", "lovastatin", "atorvastatin"},
+    "macrolide": {"clarithromycin", "erythromycin"},
+    "nitrate": {"nitroglycerin", "isosorbide mononitrate", "isosorbide dinitrate"},
+    "pde5": {"sildenafil", "tadalafil", "vardenafil"},
+}
+
+# (a, b, severity, mechanism, description, action) — a/b are generics or "class:<name>"
+INTERACTIONS = [
+    ("warfarin", "class:nsaid", "Major",
+     "Additive anticoagulant and antiplatelet effect; NSAID GI mucosal injury",
+     "Markedly increased risk of serious bleeding, especially GI bleeding.",
+     "Avoid combination; use acetaminophen for pain. If unavoidable, monitor INR and for bleeding."),
+    ("class:anticoagulant", "class:antiplatelet", "Major",
+     "Additive inhibition of coagulation and platelet function",
+     "Increased risk of major bleeding.",
+     "Use together only with a clear indication; monitor closely for bleeding."),
+    ("class:anticoagulant", "class:ssri", "Moderate",
+     "SSRIs impair platelet serotonin uptake",
+     "Increased bleeding risk when combined with anticoagulants.",
+     "Monitor for bleeding; check INR more often when starting or stopping the SSRI."),
+    ("aspirin", "class:nsaid", "Moderate",
+     "NSAIDs compete for the COX-1 binding site and add GI toxicity",
+     "May reduce aspirin's cardioprotective effect and increases GI bleeding risk.",
+     "Take aspirin at least 30 minutes before ibuprofen, or avoid regular NSAID use."),
+    ("class:ssri", "tramadol", "Major",
+     "Additive serotonergic effect; SSRIs also inhibit tramadol metabolism",
+     "Risk of serotonin syndrome and lowered seizure threshold.",
+     "Avoid if possible; if combined, use the lowest doses and monitor for serotonin toxicity."),
+    ("class:snri", "tramadol", "Major",
+     "Additive serotonergic effect",
+     "Risk of serotonin syndrome and seizures.",
+     "Avoid if possible; monitor for agitation, tremor, hyperthermia."),
+    ("class:ssri", "class:snri", "Major",
+     "Additive serotonergic effect",
+     "Risk of serotonin syndrome.",
+     "Avoid combining; cross-taper under supervision when switching."),
+    ("class:ssri", "class:nsaid", "Moderate",
+     "Platelet serotonin depletion plus NSAID GI injury",
+     "Increased risk of upper GI bleeding.",
+     "Consider gastroprotection (PPI) or an alternative analgesic."),
+    ("class:ace_inhibitor", "class:potassium_sparing", "Major",
+     "Both raise serum potassium",
+     "Risk of severe hyperkalemia and arrhythmia.",
+     "Monitor potassium and renal function closely; avoid in renal impairment."),
+    ("class:arb", "class:potassium_sparing", "Major",
+     "Both raise serum potassium",
+     "Risk of severe hyperkalemia and arrhythmia.",
+     "Monitor potassium and renal function closely; avoid in renal impairment."),
+    ("class:ace_inhibitor", "potassium chloride", "Moderate",
+     "ACE inhibitors reduce potassium excretion",
+     "Risk of hyperkalemia with potassium supplements.",
+     "Monitor serum potassium."),
+    ("class:ace_inhibitor", "class:nsaid", "Moderate",
+     "NSAIDs reduce renal prostaglandins, blunting antihypertensive effect",
+     "Reduced blood pressure control and risk of acute kidney injury.",
+     "Avoid chronic NSAID use; monitor blood pressure and renal function."),
+    ("class:arb", "class:nsaid", "Moderate",
+     "NSAIDs reduce renal prostaglandins, blunting antihypertensive effect",
+     "Reduced blood pressure control and risk of acute kidney injury.",
+     "Avoid chronic NSAID use; monitor blood pressure and renal function."),
+    ("class:ace_inhibitor", "class:arb", "Major",
+     "Dual renin-angiotensin system blockade",
+     "Increased risk of hyperkalemia, hypotension and renal failure without added benefit.",
+     "Avoid combination."),
+    ("class:opioid", "class:benzodiazepine", "Major",
+     "Additive CNS and respiratory depression",
+     "Risk of profound sedation, respiratory depression, coma and death (FDA boxed warning).",
+     "Avoid combination; if necessary use lowest doses and monitor respiration."),
+    ("class:opioid", "gabapentin", "Major",
+     "Additive CNS and respiratory depression",
+     "Increased risk of respiratory depression and sedation.",
+     "Use lowest effective doses; monitor for sedation and breathing problems."),
+    ("zolpidem", "class:benzodiazepine", "Major",
+     "Additive CNS depression",
+     "Excess sedation, impaired psychomotor function, respiratory depression.",
+     "Avoid combining sedative-hypnotics."),
+    ("zolpidem", "class:opioid", "Major",
+     "Additive CNS and respiratory depression",
+     "Risk of profound sedation and respiratory depression.",
+     "Avoid combination or use lowest doses with monitoring."),
+    ("class:statin_cyp3a4", "class:macrolide", "Major",
+     "Macrolide CYP3A4 inhibition raises statin levels",
+     "Increased risk of myopathy and rhabdomyolysis.",
+     "Hold the statin during the macrolide course or use azithromycin."),
+    ("simvastatin", "amiodarone", "Major",
+     "Amiodarone inhibits simvastatin metabolism",
+     "Increased risk of myopathy and rhabdomyolysis.",
+     "Do not exceed simvastatin 20 mg daily."),
+    ("simvastatin", "amlodipine", "Moderate",
+     "Amlodipine weakly inhibits CYP3A4",
+     "Raised simvastatin exposure and myopathy risk.",
+     "Do not exceed simvastatin 20 mg daily."),
+    ("warfarin", "amiodarone", "Major",
+     "Amiodarone inhibits warfarin metabolism (CYP2C9/3A4)",
+     "INR rises substantially; bleeding risk.",
+     "Reduce warfarin dose by 30-50% and monitor INR weekly."),
+    ("warfarin", "acetaminophen", "Minor",
+     "Regular high-dose acetaminophen may potentiate warfarin",
+     "Possible INR increase with sustained use above 2 g/day.",
+     "Occasional use is fine; monitor INR with regular use."),
+    ("warfarin", "fluconazole", "Major",
+     "Fluconazole inhibits CYP2C9",
+     "Marked INR elevation and bleeding risk.",
+     "Avoid or reduce warfarin dose and monitor INR closely."),
+    ("digoxin", "amiodarone", "Major",
+     "Amiodarone inhibits P-gp and renal digoxin clearance",
+     "Digoxin toxicity (arrhythmias, nausea, visual changes).",
+     "Halve the digoxin dose and monitor levels."),
+    ("digoxin", "furosemide", "Moderate",
+     "Loop diuretic-induced hypokalemia sensitizes the myocardium to digoxin",
+     "Increased risk of digoxin toxicity.",
+     "Monitor potassium and magnesium."),
+    ("class:pde5", "class:nitrate", "Major",
+     "Additive cGMP-mediated vasodilation",
+     "Severe, potentially fatal hypotension.",
+     "Contraindicated — do not combine."),
+    ("clopidogrel", "omeprazole", "Moderate",
+     "Omeprazole inhibits CYP2C19 activation of clopidogrel",
+     "Reduced antiplatelet effect.",
+     "Use pantoprazole instead of omeprazole/esomeprazole."),
+    ("clopidogrel", "esomeprazole", "Moderate",
+     "Esomeprazole inhibits CYP2C19 activation of clopidogrel",
+     "Reduced antiplatelet effect.",
+     "Use pantoprazole instead."),
+    ("levothyroxine", "calcium carbonate", "Moderate",
+     "Calcium binds levothyroxine in the gut",
+     "Reduced levothyroxine absorption.",
+     "Separate doses by at least 4 hours."),
+    ("levothyroxine", "omeprazole", "Minor",
+     "Reduced gastric acidity lowers levothyroxine absorption",
+     "TSH may rise over time.",
+     "Monitor TSH after starting a PPI."),
+    ("metformin", "furosemide", "Minor",
+     "Furosemide may increase metformin plasma levels",
+     "Small increase in metformin exposure.",
+     "Monitor glucose and renal function."),
+    ("allopurinol", "azathioprine", "Major",
+     "Allopurinol inhibits xanthine oxidase metabolism of azathioprine",
+     "Severe bone marrow suppression.",
+     "Reduce azathioprine dose to 25-33% or avoid."),
+    ("methotrexate", "class:nsaid", "Major",
+     "NSAIDs reduce renal methotrexate clearance",
+     "Methotrexate toxicity (myelosuppression, mucositis).",
+     "Avoid with high-dose methotrexate; monitor closely with low-dose."),
+    ("lithium", "class:nsaid", "Major",
+     "NSAIDs reduce renal lithium clearance",
+     "Lithium toxicity.",
+     "Avoid or monitor lithium levels closely."),
+    ("lithium", "class:ace_inhibitor", "Major",
+     "ACE inhibitors reduce lithium clearance",
+     "Lithium toxicity.",
+     "Monitor lithium levels; consider dose reduction."),
+]
+
+
+def _expand(name: str) -> set:
+    if name.startswith("class:"):
+        return DRUG_CLASSES[name[len("class:"):]]
+    return {name}
+
+
+def table_drugs() -> set:
+    """Every generic the table is written against — registered as exact names by get_drug_normalizer()."""
+    drugs = set()
+    for a, b, *_rest in INTERACTIONS:
+        drugs |= _expand(a) | _expand(b)
+    for members in DRUG_CLASSES.values():
+        drugs |= members
+    return drugs
+
+
+def pair_key(drug_a: str, drug_b: str) -> tuple:
+    """Order-independent key for a pair of canonical names."""
+    return (drug_a, drug_b) if drug_a <= drug_b else (drug_b, drug_a)
+
+
+def _build_index() -> dict:
+    index = {}
+    for i, (a, b, *_rest) in enumerate(INTERACTIONS):
+        for drug_a in _expand(a):
+            for drug_b in _expand(b):
+                if drug_a != drug_b:
+                    # First (most specific, listed earlier) entry wins
+                    index.setdefault(pair_key(drug_a, drug_b), i)
+    return index
+
+
+_PAIR_INDEX = _build_index()
+
+
+def lookup_pair(drug_a: str, drug_b: str):
+    """(severity, mechanism, description, action) for a canonical pair, or None."""
+    i = _PAIR_INDEX.get(pair_key(drug_a, drug_b))
+    return None if i is None else INTERACTIONS[i][2:]
+
+
+def split_known_pairs(drugs: list) -> tuple:
+    """Split all unordered pairs of canonical drugs into (known {pair: entry}, unknown [pair])."""
+    known, unknown = {}, []
+    for drug_a, drug_b in combinations(sorted(set(drugs)), 2):
+        entry = lookup_pair(drug_a, drug_b)
+        if entry is None:
+            unknown.append((drug_a, drug_b))
+        else:
+            known[(drug_a, drug_b)] = entry
+    return known, unknown
@@ -0,0 +1,169 @@
+"""
+LabelCache
+===========
+Two-tier cache for extracted OpenFDA label sections.
+
+  Tier 1 — in-memory LRU (OrderedDict), per process
+  Tier 2 — SQLite file, shared across restarts and workers
+
+Entries are keyed by normalized drug name and hold only the sections the
+drug agent uses ({"drug_interactions": ..., "warnings": ..., ...}).
+An empty dict is a valid entry: "FDA has no label for this name".
+
+Freshness policy:
+  age <= TTL                 → served as-is
+  TTL < age <= TTL + STALE   → served immediately, refreshed in background
+  older                      → refetched inline
+
+Config (env):
+  MEDAI_LABEL_CACHE_PATH     SQLite file (default .cache/openfda_labels.sqlite)
+  MEDAI_LABEL_CACHE_TTL      seconds an entry is fresh (default 7 days)
+  MEDAI_LABEL_CACHE_STALE    extra seconds a stale entry may be served (default 30 days)
+  MEDAI_LABEL_CACHE_MEMORY   in-memory LRU entries (default 512)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from utils.executor import run_cpu
+from utils.log import get_logger
+
+LABEL_CACHE_PATH = os.getenv("MEDAI_LABEL_CACHE_PATH", os.path.join(".cache", "openfda_labels.sqlite"))
+LABEL_CACHE_TTL = float(os.getenv("MEDAI_LABEL_CACHE_TTL", str(7 * 24 * 3600)))
+LABEL_CACHE_STALE = float(os.getenv("MEDAI_LABEL_CACHE_STALE", str(30 * 24 * 3600)))
+LABEL_CACHE_MEMORY = int(os.getenv("MEDAI_LABEL_CACHE_MEMORY", "512"))
+
+log = get_logger("label_cache")
+
+
+def normalize_key(drug_name: str) -> str:
+    return " ".join(drug_name.lower().split())
+
+
+class LabelCache:
+
+    def __init__(self, path: str = LABEL_CACHE_PATH, ttl: float = LABEL_CACHE_TTL,
+                 max_stale: float = LABEL_CACHE_STALE, memory_size: int = LABEL_CACHE_MEMORY):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.memory_size = memory_size
+        self._memory = OrderedDict()  # key -> (fetched_at, sections)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._tasks = set()
+        self.hits = self.stale_hits = self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS labels ("
+            " key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, sections TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    # ── Synchronous tier access (disk calls are run via run_cpu) ─────────────
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def lookup(self, key: str):
+        """Return (fetched_at, sections) from memory or disk, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            row = self._db.execute(
+                "SELECT fetched_at, sections FROM labels WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = (row[0], json.loads(row[1]))
+            self._remember(key, entry)
+            return entry
+
+    def store(self, key: str, sections: dict, fetched_at: float = None):
+        entry = (fetched_at or time.time(), sections)
+        with self._lock:
+            self._remember(key, entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO labels (key, fetched_at, sections) VALUES (?, ?, ?)",
+                (key, entry[0], json.dumps(sections)),
+            )
+            self._db.commit()
+
+    # ── Async API ────────────────────────────────────────────────────────────
+
+    async def get_or_fetch(self, key: str, fetch) -> dict:
+        """
+        Return sections for key, calling `fetch()` (async, returns sections dict)
+        on a miss. Exceptions from fetch propagate and are never cached.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            entry = await run_cpu(self.lookup, key)
+
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age <= self.ttl:
+                self.hits += 1
+                return entry[1]
+            if age <= self.ttl + self.max_stale:
+                self.stale_hits += 1
+                self._schedule_refresh(key, fetch)
+                return entry[1]
+
+        self.misses += 1
+        sections = await fetch()
+        await run_cpu(self.store, key, sections)
+        return sections
+
+    def _schedule_refresh(self, key: str, fetch):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.get_running_loop().create_task(self._refresh(key, fetch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: str, fetch):
+        try:
+            sections = await fetch()
+            await run_cpu(self.store, key, sections)
+        except Exception as e:
+            log.warning("Background refresh failed", key=key, error=str(e))
+        finally:
+            self._refreshing.discard(key)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+
+
+def get_label_cache() -> LabelCache:
+    global _cache
+    if _cache is None:
+        _cache = LabelCache()
+    return _cache
@@ -0,0 +1,284 @@
+"""
+OfflineLabelStore
+==================
+Local, searchable copy of the openFDA drug label bulk download
+(https://open.fda.gov/data/downloads/ → drug/label), for deployments
+that must not call api.fda.gov at request time.
+
+Only what DrugInteractionAgent uses is kept:
+  - drug_interactions, warnings, contraindications, precautions
+  - openfda.brand_name / generic_name / substance_name (lookup keys),
+    plus each generic name with salt forms stripped ("canonical")
+
+Schema (SQLite):
+  labels       one row per label, the four sections
+  label_names  (name, kind, effective_time, label_id) — indexed for exact lookup
+  labels_fts   FTS5 index over drug_interactions (when SQLite has FTS5)
+
+Lookups are a single indexed SELECT (tens of microseconds), so they run
+directly on the event loop. Build the store with import_openfda_labels.py.
+
+Config (env):
+  MEDAI_OFFLINE_LABELS   path to the store; enables offline lookups when the file exists
+  MEDAI_OPENFDA_OFFLINE  "1" → never call api.fda.gov, the store is authoritative
+"""
+
+import json
+import os
+import sqlite3
+from utils.drug_names import strip_salt_forms
+from utils.label_cache import normalize_key
+from utils.log import get_logger
+
+OFFLINE_LABELS_PATH = os.getenv("MEDAI_OFFLINE_LABELS", os.path.join(".cache", "openfda_offline.sqlite"))
+OPENFDA_OFFLINE = os.getenv("MEDAI_OPENFDA_OFFLINE", "0") == "1"
+
+log = get_logger("drug")
+
+LABEL_FIELDS = ["drug_interactions", "warnings", "contraindications", "precautions"]
+NAME_KINDS = ["brand_name", "generic_name", "substance_name"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    id INTEGER PRIMARY KEY,
+    set_id TEXT,
+    effective_time TEXT,
+    drug_interactions TEXT,
+    warnings TEXT,
+    contraindications TEXT,
+    precautions TEXT
+);
+CREATE TABLE IF NOT EXISTS label_names (
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    effective_time TEXT,
+    label_id INTEGER NOT NULL
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_label_names ON label_names (name, effective_time DESC, label_id);
+CREATE INDEX IF NOT EXISTS idx_label_names_kind ON label_names (kind, name);
+"""
+
+
+def iter_bulk_results(stream, chunk_size: int = 1 << 20):
+    """
+    Yield label dicts from an openFDA bulk file one at a time.
+
+    The file is {"meta": {...}, "results": [ {...}, {...}, ... ]}. It is read
+    in chunks and each element of "results" is decoded on its own, so memory
+    stays at roughly one label, not the whole multi-GB file.
+    `stream` is a text-mode file object.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip_ws(extra: str = ""):
+        nonlocal pos
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] in extra):
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    def expect(char: str):
+        nonlocal pos
+        skip_ws()
+        if pos >= len(buf) or buf[pos] != char:
+            raise ValueError(f"Malformed openFDA bulk file: expected {char!r} at offset {pos}")
+        pos += 1
+
+    def decode_value():
+        nonlocal pos
+        skip_ws()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A number at the end of the buffer may be cut short — make sure it is complete
+            if end == len(buf) and not eof:
+                fill()
+                continue
+            pos = end
+            return value
+
+    expect("{")
+    while True:
+        skip_ws(",")
+        if pos < len(buf) and buf[pos] == "}":
+            return
+        key = decode_value()
+        expect(":")
+        if key != "results":
+            decode_value()  # meta etc. — small, discarded
+            continue
+
+        expect("[")
+        while True:
+            skip_ws(",")
+            if pos >= len(buf):
+                raise ValueError("Malformed openFDA bulk file: unterminated results array")
+            if buf[pos] == "]":
+                pos += 1
+                break
+            yield decode_value()
+
+
+def extract_record(label: dict, max_chars: int) -> tuple:
+    """Reduce a full label to (names, sections). names is [(name, kind), ...]."""
+    openfda = label.get("openfda") or {}
+    names = set()
+    for kind in NAME_KINDS:
+        for name in openfda.get(kind) or []:
+            key = normalize_key(name)
+            if key:
+                names.add((key, kind))
+                if kind == "generic_name":
+                    names.add((strip_salt_forms(key), "canonical"))
+
+    sections = {}
+    for field in LABEL_FIELDS:
+        content = label.get(field)
+        if content:
+            if isinstance(content, list):
+                content = " ".join(content)
+            sections[field] = content[:max_chars]
+    return sorted(names), sections
+
+
+class OfflineLabelStore:
+
+    def __init__(self, path: str = OFFLINE_LABELS_PATH):
+        self.path = path
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.has_fts = self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'labels_fts'"
+        ).fetchone() is not None
+
+    def lookup(self, drug_name: str):
+        """Sections for the most recent label matching the name, or None if unknown."""
+        row = self._db.execute(
+            "SELECT l.drug_interactions, l.warnings, l.contraindications, l.precautions "
+            "FROM label_names n JOIN labels l ON l.id = n.label_id "
+            "WHERE n.name = ? ORDER BY n.effective_time DESC LIMIT 1",
+            (normalize_key(drug_name),),
+        ).fetchone()
+        if row is None:
+            return None
+        return {field: content for field, content in zip(LABEL_FIELDS, row) if content}
+
+    def iter_names(self):
+        """(label_id, name, kind) for every indexed name, grouped by label."""
+        return self._db.execute("SELECT label_id, name, kind FROM label_names ORDER BY label_id")
+
+    def search_interactions(self, query: str, limit: int = 10) -> list:
+        """Full-text search over drug_interactions sections. Returns [(generic names, snippet)]."""
+        if not self.has_fts:
+            raise RuntimeError("Offline label store was built without FTS5 support")
+        rows = self._db.execute(
+            "SELECT rowid, snippet(labels_fts, 0, '[', ']', '…', 16) FROM labels_fts "
+            "WHERE labels_fts MATCH ? ORDER BY rank LIMIT ?",
+            (query, limit),
+        ).fetchall()
+        results = []
+        for label_id, snippet in rows:
+            names = [r[0] for r in self._db.execute(
+                "SELECT name FROM label_names WHERE label_id = ? AND kind = 'generic_name'", (label_id,)
+            )]
+            results.append((names, snippet))
+        return results
+
+    def close(self):
+        self._db.close()
+
+
+class LabelStoreWriter:
+    """Bulk writer used by the importer — fast, unsafe pragmas, indexes built at the end."""
+
+    def __init__(self, path: str, batch_size: int = 2000):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode = OFF")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.executescript(SCHEMA)
+        self.batch_size = batch_size
+        self._next_id = (self._db.execute("SELECT MAX(id) FROM labels").fetchone()[0] or 0) + 1
+        self._labels = []
+        self._names = []
+        self.count = 0
+
+    def add(self, label: dict, max_chars: int):
+        names, sections = extract_record(label, max_chars)
+        if not names:
+            return False
+        label_id = self._next_id
+        self._next_id += 1
+        effective_time = label.get("effective_time")
+        self._labels.append((label_id, label.get("set_id"), effective_time,
+                             *[sections.get(field) for field in LABEL_FIELDS]))
+        self._names.extend((name, kind, effective_time, label_id) for name, kind in names)
+        self.count += 1
+        if len(self._labels) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        if self._labels:
+            self._db.executemany("INSERT INTO labels VALUES (?, ?, ?, ?, ?, ?, ?)", self._labels)
+            self._db.executemany("INSERT INTO label_names VALUES (?, ?, ?, ?)", self._names)
+            self._db.commit()
+        self._labels = []
+        self._names = []
+
+    def finish(self) -> bool:
+        """Build indexes (and FTS when available). Returns whether FTS5 was built."""
+        self.flush()
+        self._db.executescript(INDEXES)
+        try:
+            self._db.execute("DROP TABLE IF EXISTS labels_fts")
+            self._db.execute(
+                "CREATE VIRTUAL TABLE labels_fts USING fts5("
+                "drug_interactions, content='labels', content_rowid='id')"
+            )
+            self._db.execute("INSERT INTO labels_fts (labels_fts) VALUES ('rebuild')")
+            has_fts = True
+        except sqlite3.OperationalError:
+            has_fts = False
+        self._db.execute("ANALYZE")
+        self._db.commit()
+        self._db.close()
+        return has_fts
+
+
+_store = None
+_store_checked = False
+
+
+def get_offline_store():
+    """The offline store if MEDAI_OFFLINE_LABELS points at a built file, else None."""
+    global _store, _store_checked
+    if not _store_checked:
+        _store_checked = True
+        if os.path.exists(OFFLINE_LABELS_PATH):
+            _store = OfflineLabelStore(OFFLINE_LABELS_PATH)
+            log.info("Offline label store loaded", path=OFFLINE_LABELS_PATH)
+        elif OPENFDA_OFFLINE:
+            log.warning("MEDAI_OPENFDA_OFFLINE=1 but no offline label store", path=OFFLINE_LABELS_PATH)
+    return _store
@@ -0,0 +1,192 @@
+"""
+LabelSectionExtractor
+======================
+Incremental extractor for OpenFDA label responses.
+
+A label response is often hundreds of KB of prose, but the drug agent
+keeps only four fields of results[0], truncated. Instead of buffering the
+whole body and json-decoding all of it, the extractor is fed the body
+chunk by chunk and:
+
+  - scans structure with one C-level regex and skips string bodies with
+    bytes.find (never walked character by character in Python)
+  - keeps only the raw bytes of the wanted fields of results[0]
+  - reports done as soon as all wanted fields are captured or results[0]
+    closes, so the caller can stop parsing early
+
+Peak memory is one network chunk plus the wanted fields.
+"""
+
+import json
+import re
+
+_STRUCTURE = re.compile(rb'["{}\[\],:]')
+_BACKSLASH = 0x5C
+
+# Stack depth of results[0]: top object → "results" array → first element
+_LABEL_DEPTH = 3
+
+
+class LabelSectionExtractor:
+
+    def __init__(self, fields: list, max_chars: int):
+        self.fields = set(fields)
+        self.order = list(fields)
+        self.max_chars = max_chars
+        self.done = False
+
+        self._buf = b""
+        self._pos = 0
+        self._stack = []          # "{" / "["
+        self._keys = []           # current key per stack level (None for arrays)
+        self._expect_key = []     # per level: next string in this object is a key
+        self._in_results = False  # inside top-level "results" array
+        self._elements = 0        # elements seen in results
+        self._capture = None      # field whose value is being captured
+        self._capture_start = None
+        self._capture_depth = None
+        self._raw = {}            # field → raw JSON bytes
+        self._str_start = None    # buffer index of an unterminated string's opening quote
+        self._str_scan = None     # where to resume scanning that string
+        self._str_keep = False    # whether its bytes are needed (key or captured value)
+
+    def feed(self, chunk: bytes) -> bool:
+        """Consume the next chunk. Returns True once nothing more is needed."""
+        if self.done:
+            return True
+        # Keep only bytes still needed: a capture in progress or an open key/captured string
+        if self._capture_start is not None:
+            keep = self._capture_start
+        elif self._str_start is not None:
+            keep = self._str_start if self._str_keep else self._str_scan
+        else:
+            keep = self._pos
+        self._buf = self._buf[keep:] + chunk
+        self._pos -= keep
+        if self._capture_start is not None:
+            self._capture_start -= keep
+        if self._str_start is not None:
+            self._str_start -= keep
+            self._str_scan -= keep
+        self._scan()
+        return self.done
+
+    def sections(self) -> dict:
+        """Decoded, joined and truncated sections captured so far."""
+        sections = {}
+        for field in self.order:
+            raw = self._raw.get(field)
+            if raw is None:
+                continue
+            content = json.loads(raw)
+            if isinstance(content, list):
+                content = " ".join(str(c) for c in content)
+            if content:
+                sections[field] = content[:self.max_chars]
+        return sections
+
+    def _at_label(self) -> bool:
+        return self._in_results and self._elements == 1 and len(self._stack) == _LABEL_DEPTH
+
+    def _expect_string_kept(self) -> bool:
+        if self._stack and self._stack[-1] == "{" and self._expect_key[-1]:
+            return len(self._stack) == 1 or self._at_label()
+        return self._capture is not None and self._capture_start is None
+
+    def _continue_string(self) -> bool:
+        """Advance through the open string. False if it continues in the next chunk."""
+        buf = self._buf
+        scan = self._str_scan
+        while True:
+            end = buf.find(b'"', scan)
+            if end < 0:
+                # Resume before any trailing backslashes so a split escape is seen whole
+                scan = len(buf)
+                while scan > self._str_scan and buf[scan - 1] == _BACKSLASH:
+                    scan -= 1
+                self._str_scan = scan
+                self._pos = len(buf)
+                return False
+            run = end
+            while run > 0 and buf[run - 1] == _BACKSLASH:
+                run -= 1
+            if (end - run) % 2 == 0:
+                break  # unescaped closing quote
+            scan = end + 1
+
+        start = self._str_start
+        self._str_start = self._str_scan = None
+        self._pos = end + 1
+        if self._stack and self._stack[-1] == "{" and self._expect_key[-1]:
+            self._expect_key[-1] = False
+            # Keys are only decoded where they matter: top level and results[0]
+            self._keys[-1] = json.loads(buf[start:end + 1]) if self._str_keep else None
+        elif self._capture is not None and self._capture_start is None:
+            self._capture_start = start
+            self._finish_capture(end + 1)
+        return True
+
+    def _scan(self):
+        buf = self._buf
+        if self._str_start is not None and not self._continue_string():
+            return
+        while not self.done:
+            m = _STRUCTURE.search(buf, self._pos)
+            if m is None:
+                self._pos = len(buf)
+                return
+            i = m.start()
+            ch = buf[i:i + 1]
+
+            if ch == b'"':
+                self._str_start = i
+                self._str_scan = i + 1
+                self._str_keep = self._expect_string_kept()
+                if not self._continue_string():
+                    return
+                continue
+
+            self._pos = i + 1
+            if ch == b":":
+                if self._at_label() and self._keys[-1] in self.fields:
+                    self._capture = self._keys[-1]
+                    self._capture_start = None
+                    self._capture_depth = len(self._stack)
+            elif ch == b",":
+                if self._capture is not None and self._capture_start is None:
+                    self._capture = None  # null / number value
+                if self._stack and self._stack[-1] == "{":
+                    self._expect_key[-1] = True
+            elif ch in (b"{", b"["):
+                if self._capture is not None and self._capture_start is None:
+                    self._capture_start = i
+                if ch == b"[" and len(self._stack) == 1 and self._keys[0] == "results":
+                    self._in_results = True
+                if ch == b"{" and self._in_results and len(self._stack) == 2:
+                    self._elements += 1
+                self._stack.append(ch.decode())
+                self._keys.append(None)
+                self._expect_key.append(ch == b"{")
+            else:  # } or ]
+                if self._capture is not None and self._capture_start is None:
+                    self._capture = None
+                self._stack.pop()
+                self._keys.pop()
+                self._expect_key.pop()
+                depth = len(self._stack)
+                if self._capture is not None and depth == self._capture_depth:
+                    self._finish_capture(i + 1)
+                if self._in_results and self._elements == 1 and depth == _LABEL_DEPTH - 1:
+                    self.done = True  # results[0] closed
+                if depth == 1 and self._in_results:
+                    self._in_results = False
+                if depth == 0:
+                    self.done = True
+
+    def _finish_capture(self, end: int):
+        self._raw[self._capture] = self._buf[self._capture_start:end]
+        self._capture = None
+        self._capture_start = None
+        self._capture_depth = None
+        if len(self._raw) == len(self.fields):
+            self.done = True
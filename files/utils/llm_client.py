@@ -3,44 +3,81 @@ import re
 import json
 from dotenv import load_dotenv
 from groq import Groq
+from utils.metrics import counter
+from utils.tracing import current_trace, span
+from utils.usage import cost_usd
 
 load_dotenv()
 
+LLM_CALLS = counter("medai_llm_calls_total", "LLM requests by model and outcome", ("model", "status"))
+LLM_TOKENS = counter("medai_llm_tokens_total", "LLM tokens by model, pipeline stage and type", ("model", "stage", "type"))
+LLM_COST = counter("medai_llm_cost_usd_total", "Estimated LLM spend in USD by model and pipeline stage", ("model", "stage"))
+LLM_RETRIES = counter("medai_llm_retries_total", "LLM requests repeated after an unparseable reply", ("model",))
+
 SYSTEM_PROMPT = """You are MedAI, an expert clinical AI system operating as part of an agentic medical pipeline.
 You assist healthcare professionals and patients with symptom assessment, triage, and clinical documentation.
 You always respond with valid JSON as instructed. Never include markdown code fences.
 You are precise, evidence-based, and appropriately cautious about patient safety."""
 
 
+def record_llm_call(call: span, model: str, usage=None, status: str = "ok", sections: dict = None):
+    """
+    Outcome and token usage of one LLM request: on its span, in the metrics,
+    and in the active trace under the calling stage (see utils.usage).
+    sections: estimated prompt tokens per prompt part (utils.usage.prompt_sections).
+    """
+    LLM_CALLS.inc(model=model, status=status)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    cost = cost_usd(model, prompt_tokens, completion_tokens)
+    stage = call.stage() or call.name
+    call.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cost_usd=round(cost, 6))
+    LLM_TOKENS.inc(prompt_tokens, model=model, stage=stage, type="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, stage=stage, type="completion")
+    LLM_COST.inc(cost, model=model, stage=stage)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_usage(stage, prompt_tokens, completion_tokens, cost, sections)
+
+
 class LLMClient:
 
+    MODEL = "llama-3.3-70b-versatile"
+
     def __init__(self):
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise EnvironmentError("GROQ_API_KEY not set in .env file")
         self.client = Groq(api_key=api_key)
 
-    async def json_call(self, prompt: str, max_tokens: int = 1024) -> dict:
+    async def json_call(self, prompt: str, max_tokens: int = 1024, sections: dict = None) -> dict:
         for attempt in range(2):
-            try:
-                response = self.client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    messages=[
-                        {"role": "system", "content": SYSTEM_PROMPT},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=max_tokens,
-                    temperature=0.3
-                )
-                raw = response.choices[0].message.content.strip()
-                return self._extract_json(raw)
-            except json.JSONDecodeError:
-                if attempt == 0:
-                    prompt += "\n\nCRITICAL: Your ENTIRE response must be valid JSON only. No text before or after."
-                    continue
-                return {}
-            except Exception as e:
-                raise RuntimeError(f"Groq API error: {e}")
+            with span("llm", kind="llm", model=self.MODEL, attempt=attempt) as call:
+                try:
+                    response = self.client.chat.completions.create(
+                        model=self.MODEL,
+                        messages=[
+                            {"role": "system", "content": SYSTEM_PROMPT},
+                            {"role": "user", "content": prompt}
+                        ],
+                        max_tokens=max_tokens,
+                        temperature=0.3
+                    )
+                    record_llm_call(call, self.MODEL, response.usage, sections=sections)
+                    raw = response.choices[0].message.content.strip()
+                    return self._extract_json(raw)
+                except json.JSONDecodeError:
+                    call.set(error="invalid_json")
+                    if attempt == 0:
+                        LLM_RETRIES.inc(model=self.MODEL)
+                        prompt += "\n\nCRITICAL: Your ENTIRE response must be valid JSON only. No text before or after."
+                        continue
+                    return {}
+                except Exception as e:
+                    record_llm_call(call, self.MODEL, status="error")
+                    raise RuntimeError(f"Groq API error: {e}")
 
     def _extract_json(self, text: str) -> dict:
         text = re.sub(r"```json\s*", "", text)
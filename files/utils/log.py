@@ -0,0 +1,124 @@
+"""
+Log
+====
+Structured, non-blocking logging for agents and the API server.
+
+    log = get_logger("rag")
+    log.info("Retrieved medical context", chars=len(context))
+
+A call builds one LogRecord and puts it on an in-memory queue
+(QueueHandler); formatting and writing to stderr happen on a background
+thread (QueueListener), so the event loop never waits on a slow terminal
+or log pipe. Each record carries the active trace id (utils.tracing), so
+log lines can be joined with the spans of the same request.
+
+Formats:
+  json  one object per line: {"ts", "level", "component", "msg", "trace_id", ...fields}
+  text  the old console look: "           [RAG] Retrieved medical context chars=412"
+
+Config (env):
+  MEDAI_LOG_FORMAT   json | text (default json; main.py uses text)
+  MEDAI_LOG_LEVEL    DEBUG | INFO | WARNING | ERROR (default INFO)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from utils.tracing import current_trace
+
+LOG_FORMAT = os.getenv("MEDAI_LOG_FORMAT", "json")
+LOG_LEVEL = os.getenv("MEDAI_LOG_LEVEL", "INFO").upper()
+
+_ROOT = "medai"
+_listener = None
+
+
+class _JSONFormatter(logging.Formatter):
+
+    def format(self, record) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "component": record.name[len(_ROOT) + 1:],
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+
+    def format(self, record) -> str:
+        fields = getattr(record, "fields", {})
+        extra = " ".join(f"{key}={value}" for key, value in fields.items() if key != "trace_id")
+        tag = record.name[len(_ROOT) + 1:].upper()
+        return f"           [{tag}] {record.getMessage()}" + (f" {extra}" if extra else "")
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+
+    def prepare(self, record):
+        return record  # formatted on the writer thread, not by the caller
+
+
+def configure_logging(fmt: str = None, level: str = None):
+    """(Re)start the background writer. Safe to call more than once."""
+    global _listener
+    stop_logging()
+    handler = logging.StreamHandler()
+    handler.setFormatter(_TextFormatter() if (fmt or LOG_FORMAT) == "text" else _JSONFormatter())
+    records = queue.SimpleQueue()
+    root = logging.getLogger(_ROOT)
+    root.handlers[:] = [_QueueHandler(records)]
+    root.setLevel(level or LOG_LEVEL)
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class StructuredLogger:
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, component: str):
+        self._logger = logging.getLogger(f"{_ROOT}.{component}")
+
+    def _log(self, level: int, message: str, fields: dict):
+        if not self._logger.isEnabledFor(level):
+            return
+        trace = current_trace()
+        if trace is not None:
+            fields["trace_id"] = trace.id
+        self._logger.log(level, message, extra={"fields": fields})
+
+    def debug(self, message: str, **fields):
+        self._log(logging.DEBUG, message, fields)
+
+    def info(self, message: str, **fields):
+        self._log(logging.INFO, message, fields)
+
+    def warning(self, message: str, **fields):
+        self._log(logging.WARNING, message, fields)
+
+    def error(self, message: str, **fields):
+        self._log(logging.ERROR, message, fields)
+
+
+def get_logger(component: str) -> StructuredLogger:
+    if _listener is None:
+        configure_logging()
+    return StructuredLogger(component)
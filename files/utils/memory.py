@@ -0,0 +1,174 @@
+"""
+Memory
+=======
+Optional memory accounting for the agent pipeline, built on tracemalloc.
+
+With MEDAI_TRACEMALLOC=1 the server starts tracemalloc at startup and
+takes a baseline snapshot once warm-up (sentence encoder, caches) is
+done. Then:
+  - every agent span (utils.tracing) records the stage's memory:
+      mem_delta_kb  traced memory still held when the stage ends
+      mem_peak_kb   highest traced memory above the stage's starting
+                    point while it ran
+    so they appear in the trace, in ?debug=true responses, and in the
+    medai_stage_memory_peak_bytes histogram
+  - GET /admin/memory lists the top allocation sites and the growth since
+    the baseline, by line, file or traceback
+
+MEDAI_TRACEMALLOC_SNAPSHOTS=1 additionally snapshots around every agent
+stage and records its top growing sites as mem_top. A snapshot walks
+every traced block, which takes tens of milliseconds on the event loop,
+so this is for reproducing a leak locally, not for serving traffic.
+
+Stages overlap (triage runs beside vision, requests beside requests) and
+tracemalloc has one process-wide peak, so the peak is shared: whenever a
+stage starts, the running peak is folded into every stage in flight
+before it is reset. A stage's peak is therefore the process peak during
+its window — exact when it runs alone, an upper bound otherwise.
+
+tracemalloc costs CPU on every allocation and a few dozen bytes per
+traced block, so it stays off unless asked for. When it is off, spans do
+one flag check and nothing else.
+
+Config (env):
+  MEDAI_TRACEMALLOC            1 = trace allocations (default 0)
+  MEDAI_TRACEMALLOC_FRAMES     frames kept per allocation (default 10)
+  MEDAI_TRACEMALLOC_SNAPSHOTS  1 = snapshot diff around every agent stage (default 0)
+  MEDAI_MEMORY_TOP             allocation sites reported (default 20)
+"""
+
+import linecache
+import os
+import threading
+import time
+import tracemalloc
+from utils.metrics import histogram
+
+MEMORY_TRACKING = os.getenv("MEDAI_TRACEMALLOC", "0") == "1"
+TRACEMALLOC_FRAMES = int(os.getenv("MEDAI_TRACEMALLOC_FRAMES", "10"))
+STAGE_SNAPSHOTS = MEMORY_TRACKING and os.getenv("MEDAI_TRACEMALLOC_SNAPSHOTS", "0") == "1"
+MEMORY_TOP = int(os.getenv("MEDAI_MEMORY_TOP", "20"))
+
+STAGE_PEAK_BYTES = histogram(
+    "medai_stage_memory_peak_bytes", "Peak traced memory above the stage's start (MEDAI_TRACEMALLOC)", ("stage",),
+    buckets=(64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6),
+)
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_baseline = None
+_baseline_at = None
+_active = []  # stages in flight: [start, peak, snapshot]
+_lock = threading.Lock()
+
+
+def start_memory_tracking():
+    """Start tracemalloc if MEDAI_TRACEMALLOC is set (or it was started via PYTHONTRACEMALLOC)."""
+    if MEMORY_TRACKING and not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+
+def take_baseline():
+    """Snapshot that /admin/memory reports growth against. Call once warm-up is done."""
+    global _baseline, _baseline_at
+    if tracemalloc.is_tracing():
+        _baseline = _snapshot()
+        _baseline_at = time.time()
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+
+def _site(stat) -> str:
+    frame = stat.traceback[0]
+    return f"{frame.filename}:{frame.lineno}" if frame.lineno else frame.filename
+
+
+def stage_enter():
+    """State for stage_exit(); None when tracemalloc is not running."""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = _snapshot() if STAGE_SNAPSHOTS else None
+    with _lock:
+        current, peak = tracemalloc.get_traced_memory()
+        for stage in _active:
+            stage[1] = max(stage[1], peak)
+        tracemalloc.reset_peak()
+        state = [current, current, snapshot]
+        _active.append(state)
+    return state
+
+
+def stage_exit(state, stage: str) -> dict:
+    """Span attributes for a finished stage."""
+    if not tracemalloc.is_tracing():
+        return {}
+    with _lock:
+        current, peak = tracemalloc.get_traced_memory()
+        for active in _active:
+            active[1] = max(active[1], peak)
+        _active.remove(state)
+    start, peak, before = state
+    STAGE_PEAK_BYTES.observe(peak - start, stage=stage)
+    attrs = {"mem_delta_kb": round((current - start) / 1024, 1), "mem_peak_kb": round((peak - start) / 1024, 1)}
+    if before is not None:
+        attrs["mem_top"] = [
+            {"site": _site(stat), "size_diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff}
+            for stat in _snapshot().compare_to(before, "lineno")[:3] if stat.size_diff > 0
+        ]
+    return attrs
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_stats() -> dict:
+    """Cheap summary for /health."""
+    stats = {"rss_mb": None, "tracemalloc": tracemalloc.is_tracing()}
+    rss = _rss_bytes()
+    if rss is not None:
+        stats["rss_mb"] = round(rss / 2**20, 1)
+    if tracemalloc.is_tracing():
+        current, _ = tracemalloc.get_traced_memory()
+        stats["traced_mb"] = round(current / 2**20, 1)
+    return stats
+
+
+def memory_report(top: int = MEMORY_TOP, group_by: str = "lineno") -> dict:
+    """
+    Top allocation sites now and growth since the baseline. Takes a full
+    snapshot — run it off the event loop.
+    """
+    report = memory_stats()
+    if not tracemalloc.is_tracing():
+        report["hint"] = "Set MEDAI_TRACEMALLOC=1 to trace allocations"
+        return report
+    snapshot = _snapshot()
+    report["tracemalloc_overhead_mb"] = round(tracemalloc.get_tracemalloc_memory() / 2**20, 1)
+    report["top_allocations"] = [
+        {"site": _site(stat), "size_kb": round(stat.size / 1024, 1), "count": stat.count,
+         **({"traceback": stat.traceback.format()} if group_by == "traceback" else {})}
+        for stat in snapshot.statistics(group_by)[:top]
+    ]
+    if _baseline is not None:
+        growth = [stat for stat in snapshot.compare_to(_baseline, group_by) if stat.size_diff > 0][:top]
+        report["baseline_age_s"] = round(time.time() - _baseline_at)
+        report["growth_since_baseline"] = [
+            {"site": _site(stat), "size_diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff,
+             "size_kb": round(stat.size / 1024, 1),
+             **({"traceback": stat.traceback.format()} if group_by == "traceback" else {})}
+            for stat in growth
+        ]
+    return report
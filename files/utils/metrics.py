@@ -0,0 +1,127 @@
+"""
+Metrics
+========
+Process-wide counters and histograms, rendered in the Prometheus text
+exposition format for GET /metrics.
+
+Deliberately small: fixed buckets, label values as plain tuples, one lock
+per metric. An observation is a bisect and two additions, so metrics can
+be recorded on every span without measurable cost.
+
+Usage:
+    LLM_TOKENS = counter("medai_llm_tokens_total", "LLM tokens", ("model", "type"))
+    LLM_TOKENS.inc(812, model="llama-3.3-70b-versatile", type="prompt")
+"""
+
+import bisect
+import threading
+
+# Seconds — spans range from sub-millisecond regex triage to multi-second LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+
+
+class Histogram:
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label key → [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = 'le="%s"' % bound
+                yield f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}"
+            cumulative += state[len(self.buckets)]
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {_number(state[-1])}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {cumulative}"
+
+
+def _register(metric):
+    with _registry_lock:
+        existing = _registry.get(metric.name)
+        if existing is not None:
+            return existing
+        _registry[metric.name] = metric
+        return metric
+
+
+def counter(name: str, help_text: str, labels: tuple = ()) -> Counter:
+    return _register(Counter(name, help_text, labels))
+
+
+def histogram(name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help_text, labels, buckets))
+
+
+def render_prometheus() -> str:
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,152 @@
+"""
+ModelHealth
+============
+Per-model health state for agents that can choose between several
+equivalent models (currently VisionAgent's vision models).
+
+For each model it tracks:
+  - error rate and latency as EWMAs (recent behaviour, not lifetime)
+  - a window of recent successful latencies, for a p95 hedge delay
+  - consecutive failures; at MEDAI_MODEL_FAIL_THRESHOLD the model is put
+    in cooldown and skipped. When the cooldown ends one request probes
+    it — success restores it, failure doubles the cooldown (up to max)
+
+candidates() returns the models worth trying, in configured preference
+order, so a deprecated or down model costs one or two failures instead
+of one failure on every request.
+
+Config (env):
+  MEDAI_MODEL_FAIL_THRESHOLD   consecutive failures before cooldown (default 2)
+  MEDAI_MODEL_COOLDOWN         first cooldown in seconds (default 30)
+  MEDAI_MODEL_COOLDOWN_MAX     cooldown cap in seconds (default 600)
+  MEDAI_MODEL_EWMA_ALPHA       EWMA weight of the newest sample (default 0.2)
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+
+FAIL_THRESHOLD = int(os.getenv("MEDAI_MODEL_FAIL_THRESHOLD", "2"))
+COOLDOWN = float(os.getenv("MEDAI_MODEL_COOLDOWN", "30"))
+COOLDOWN_MAX = float(os.getenv("MEDAI_MODEL_COOLDOWN_MAX", "600"))
+EWMA_ALPHA = float(os.getenv("MEDAI_MODEL_EWMA_ALPHA", "0.2"))
+
+LATENCY_WINDOW = 50
+MIN_LATENCY_SAMPLES = 5
+
+
+class _ModelState:
+
+    def __init__(self):
+        self.latency_ewma = None
+        self.error_rate = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.consecutive_failures = 0
+        self.cooldown = 0.0
+        self.down_until = 0.0
+        self.probing = False
+        self.successes = 0
+        self.failures = 0
+        self.last_error = None
+
+
+class ModelHealth:
+
+    def __init__(self, fail_threshold: int = FAIL_THRESHOLD, cooldown: float = COOLDOWN,
+                 cooldown_max: float = COOLDOWN_MAX, alpha: float = EWMA_ALPHA):
+        self.fail_threshold = fail_threshold
+        self.base_cooldown = cooldown
+        self.cooldown_max = cooldown_max
+        self.alpha = alpha
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _state(self, model: str) -> _ModelState:
+        if model not in self._models:
+            self._models[model] = _ModelState()
+        return self._models[model]
+
+    def candidates(self, models: list) -> list:
+        """Models to try, in preference order. Models in cooldown are skipped; one request probes each expired one."""
+        now = time.monotonic()
+        chosen = []
+        with self._lock:
+            for model in models:
+                state = self._state(model)
+                if state.down_until == 0.0:
+                    chosen.append(model)
+                elif now >= state.down_until and not state.probing:
+                    state.probing = True
+                    chosen.append(model)
+        return chosen
+
+    def next_available(self, models: list) -> str:
+        """When every model is in cooldown: the one whose cooldown ends first."""
+        with self._lock:
+            return min(models, key=lambda model: self._state(model).down_until)
+
+    def record_success(self, model: str, latency: float):
+        with self._lock:
+            state = self._state(model)
+            state.successes += 1
+            state.latencies.append(latency)
+            state.latency_ewma = latency if state.latency_ewma is None else (
+                self.alpha * latency + (1 - self.alpha) * state.latency_ewma)
+            state.error_rate = (1 - self.alpha) * state.error_rate
+            state.consecutive_failures = 0
+            state.cooldown = 0.0
+            state.down_until = 0.0
+            state.probing = False
+
+    def record_failure(self, model: str, error: Exception):
+        with self._lock:
+            state = self._state(model)
+            state.failures += 1
+            state.last_error = f"{type(error).__name__}: {error}"[:200]
+            state.error_rate = self.alpha + (1 - self.alpha) * state.error_rate
+            state.consecutive_failures += 1
+            if state.probing or state.consecutive_failures >= self.fail_threshold:
+                state.cooldown = min(self.cooldown_max, state.cooldown * 2 if state.cooldown else self.base_cooldown)
+                state.down_until = time.monotonic() + state.cooldown
+            state.probing = False
+
+    def release(self, model: str):
+        """The attempt ended without a verdict (e.g. cancelled as a hedge loser)."""
+        with self._lock:
+            self._state(model).probing = False
+
+    def p95_latency(self, model: str):
+        """p95 of recent successful latencies, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._state(model).latencies)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)]
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model: {
+                    "available": state.down_until == 0.0 or now >= state.down_until,
+                    "error_rate": round(state.error_rate, 3),
+                    "latency_ewma_s": round(state.latency_ewma, 2) if state.latency_ewma is not None else None,
+                    "successes": state.successes,
+                    "failures": state.failures,
+                    "cooldown_remaining_s": round(max(0.0, state.down_until - now), 1),
+                    "last_error": state.last_error,
+                }
+                for model, state in self._models.items()
+            }
+
+
+_health = {}
+
+
+def get_model_health(name: str) -> ModelHealth:
+    """One registry per model family (e.g. "vision"), shared across requests."""
+    if name not in _health:
+        _health[name] = ModelHealth()
+    return _health[name]
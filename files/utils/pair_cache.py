@@ -0,0 +1,152 @@
+"""
+PairCache
+==========
+Memoizes synthesized interaction results per unordered pair, across
+patients, so a medication list that overlaps a previous one only sends
+the new pairs to the LLM.
+
+Keys:
+  "dd:<drug_a>|<drug_b>"      drug-drug, canonical names, sorted
+  "dc:<drug>|<condition>"     drug-condition, lowercased condition
+
+Values are the list of interaction dicts the LLM returned for that pair
+(an empty list means "checked, nothing clinically relevant").
+
+Every entry carries a version tag (prompt version + model). Entries with
+another tag are ignored, so changing the prompt or model invalidates the
+cache without a migration.
+
+Storage mirrors LabelCache: in-memory LRU over a SQLite table.
+
+Config (env):
+  MEDAI_PAIR_CACHE_PATH     SQLite file (default .cache/interaction_pairs.sqlite)
+  MEDAI_PAIR_CACHE_TTL      seconds an entry is valid (default 30 days)
+  MEDAI_PAIR_CACHE_MEMORY   in-memory LRU entries (default 4096)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from utils.executor import run_cpu
+from utils.label_cache import normalize_key
+
+PAIR_CACHE_PATH = os.getenv("MEDAI_PAIR_CACHE_PATH", os.path.join(".cache", "interaction_pairs.sqlite"))
+PAIR_CACHE_TTL = float(os.getenv("MEDAI_PAIR_CACHE_TTL", str(30 * 24 * 3600)))
+PAIR_CACHE_MEMORY = int(os.getenv("MEDAI_PAIR_CACHE_MEMORY", "4096"))
+
+
+def drug_pair_key(drug_a: str, drug_b: str) -> str:
+    a, b = sorted((drug_a, drug_b))
+    return f"dd:{a}|{b}"
+
+
+def condition_pair_key(drug: str, condition: str) -> str:
+    return f"dc:{drug}|{normalize_key(condition)}"
+
+
+class PairCache:
+
+    def __init__(self, version: str, path: str = PAIR_CACHE_PATH, ttl: float = PAIR_CACHE_TTL,
+                 memory_size: int = PAIR_CACHE_MEMORY):
+        self.version = version
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self._memory = OrderedDict()  # key → (created_at, interactions)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pairs ("
+            " key TEXT NOT NULL, version TEXT NOT NULL, created_at REAL NOT NULL,"
+            " interactions TEXT NOT NULL, PRIMARY KEY (key, version))"
+        )
+        self._db.commit()
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _get_many(self, keys: list) -> dict:
+        found = {}
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            missing = []
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is not None and entry[0] >= cutoff:
+                    self._memory.move_to_end(key)
+                    found[key] = entry[1]
+                else:
+                    missing.append(key)
+            if missing:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._db.execute(
+                    f"SELECT key, created_at, interactions FROM pairs "
+                    f"WHERE version = ? AND created_at >= ? AND key IN ({placeholders})",
+                    (self.version, cutoff, *missing),
+                ).fetchall()
+                for key, created_at, interactions in rows:
+                    entry = (created_at, json.loads(interactions))
+                    self._remember(key, entry)
+                    found[key] = entry[1]
+        return found
+
+    def _put_many(self, items: dict):
+        now = time.time()
+        with self._lock:
+            for key, interactions in items.items():
+                self._remember(key, (now, interactions))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO pairs (key, version, created_at, interactions) VALUES (?, ?, ?, ?)",
+                [(key, self.version, now, json.dumps(interactions)) for key, interactions in items.items()],
+            )
+            self._db.commit()
+
+    async def get_many(self, keys: list) -> dict:
+        """{key: interactions} for every key with a valid entry under the current version."""
+        if not keys:
+            return {}
+        found = await run_cpu(self._get_many, keys)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def put_many(self, items: dict):
+        if items:
+            await run_cpu(self._put_many, items)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_caches = {}
+
+
+def get_pair_cache(version: str) -> PairCache:
+    if version not in _caches:
+        _caches[version] = PairCache(version)
+    return _caches[version]
+
+
+def close_pair_caches():
+    for cache in _caches.values():
+        cache.close()
+    _caches.clear()
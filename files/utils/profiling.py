@@ -0,0 +1,195 @@
+"""
+Profiling
+==========
+Opt-in sampling profiler for live requests.
+
+A request is profiled when it sends "X-MedAI-Profile: 1" together with a
+valid X-Admin-Token (utils.admin), or when it is picked by
+MEDAI_PROFILE_SAMPLE_RATE. While it runs, a background thread samples
+the stacks of the event-loop thread and the CPU pool threads
+(utils.executor) every MEDAI_PROFILE_INTERVAL seconds. Time spent waiting
+on upstream calls shows up as the loop sitting in select(); JSON
+extraction, regex triage, embedding and serialization show up by
+function.
+
+The result is written to MEDAI_PROFILE_DIR as <profile id>.collapsed:
+one "frame;frame;frame count" line per distinct stack, the format
+flamegraph.pl, inferno and speedscope read directly. A <profile id>.json
+sidecar holds the path, duration, sample count and trace id. Only the
+newest MEDAI_PROFILE_KEEP profiles are kept. The response carries the id
+in X-Profile-Id.
+
+The loop thread is shared, so samples taken while a profiled request is
+awaiting can include other requests' work. Only one request is profiled
+at a time, and others pass through.
+
+When a request is not profiled, the middleware does one header lookup
+and, only if sampling is configured, one random() call. No thread is
+started and nothing is hooked into the interpreter.
+
+Config (env):
+  MEDAI_PROFILE_SAMPLE_RATE  fraction of pipeline requests profiled (default 0 = header only)
+  MEDAI_PROFILE_INTERVAL     seconds between stack samples (default 0.005)
+  MEDAI_PROFILE_DIR          output directory (default .cache/profiles)
+  MEDAI_PROFILE_KEEP         profiles kept on disk (default 200)
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from utils.admin import is_admin
+from utils.executor import run_cpu
+
+PROFILE_SAMPLE_RATE = float(os.getenv("MEDAI_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("MEDAI_PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("MEDAI_PROFILE_DIR", os.path.join(".cache", "profiles"))
+PROFILE_KEEP = int(os.getenv("MEDAI_PROFILE_KEEP", "200"))
+
+PROFILE_ID = re.compile(r"^[0-9a-f]{16}$")
+
+_active = threading.Lock()  # one profiled request at a time
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """Samples the stacks of the calling thread and the CPU pool threads from a background thread."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._loop_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="medai-profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> float:
+        self._stop.set()
+        self._thread.join()
+        return time.perf_counter() - self.started
+
+    def _targets(self) -> dict:
+        targets = {self._loop_thread: "loop"}
+        for thread in threading.enumerate():
+            if thread.name.startswith("medai-cpu"):
+                targets[thread.ident] = thread.name
+        return targets
+
+    def _run(self):
+        targets = self._targets()
+        next_refresh = time.perf_counter() + 1.0
+        while not self._stop.wait(self.interval):
+            if time.perf_counter() > next_refresh:  # pool threads are created on demand
+                targets = self._targets()
+                next_refresh = time.perf_counter() + 1.0
+            frames = sys._current_frames()
+            for ident, name in targets.items():
+                frame = frames.get(ident)
+                if frame is None or (name != "loop" and frame.f_code.co_name == "_worker"):
+                    continue  # idle pool thread waiting for work
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(name)
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _save(profile_id: str, collapsed: str, meta: dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.collapsed"), "w") as f:
+        f.write(collapsed)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump(meta, f)
+    for old in list_profiles()[PROFILE_KEEP:]:
+        for ext in (".collapsed", ".json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old["id"] + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> list:
+    """Saved profiles' metadata, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda meta: meta.get("created", 0), reverse=True)
+
+
+def profile_path(profile_id: str):
+    """Path of a saved .collapsed file, or None (also for malformed ids)."""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.collapsed")
+    return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, app, paths: tuple, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.paths = paths
+        self.sample_rate = sample_rate
+
+    def _wanted(self, scope) -> bool:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return False
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-medai-profile") == b"1":
+            return is_admin(headers.get(b"x-admin-token", b"").decode("latin-1"))
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if not self._wanted(scope) or not _active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+        meta = {"id": profile_id, "path": scope["path"], "created": time.time()}
+
+        async def tagged_send(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers") or [])
+                for key, value in headers:
+                    if key.lower() == b"x-trace-id":
+                        meta["trace_id"] = value.decode("latin-1")
+                meta["status"] = message["status"]
+                message = {**message, "headers": headers + [(b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            await self.app(scope, receive, tagged_send)
+        finally:
+            meta["duration_ms"] = round(profiler.stop() * 1000, 1)
+            _active.release()
+            meta["samples"] = profiler.samples
+            meta["interval_ms"] = profiler.interval * 1000
+            await run_cpu(_save, profile_id, profiler.collapsed(), meta)
@@ -0,0 +1,166 @@
+"""
+QuestionBank
+=============
+Precomputed follow-up questions keyed by symptom cluster, served from
+memory so common presentations skip the FollowUpAgent LLM call.
+
+Cluster: the sorted knowledge-base topics RAGAgent retrieved for the
+symptoms (session.rag_topics), e.g. "chest pain" or "fever+headache".
+Patients with the same cluster get nearly the same questions, so one
+good set per cluster is reused.
+
+Modifiers (age, pregnancy, infants, immunosuppression, ...) change which
+questions matter, so a presentation with any modifier — or one that maps
+to no cluster or an unknown one — still goes to the LLM.
+
+The bank is built offline by build_question_bank.py from:
+  - the LLM, one generation per knowledge-base topic
+  - logged history: questions the LLM produced for each cluster in
+    production (FOLLOWUP_HISTORY_PATH), ranked by how often they were asked
+
+Config (env):
+  MEDAI_QUESTION_BANK_PATH   JSON bank file (default .cache/question_bank.json)
+  MEDAI_FOLLOWUP_HISTORY     NDJSON log of LLM-generated questions
+                             (default .cache/followup_history.ndjson, "" disables)
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from utils.log import get_logger
+
+QUESTION_BANK_PATH = os.getenv("MEDAI_QUESTION_BANK_PATH", os.path.join(".cache", "question_bank.json"))
+FOLLOWUP_HISTORY_PATH = os.getenv("MEDAI_FOLLOWUP_HISTORY", os.path.join(".cache", "followup_history.ndjson"))
+
+log = get_logger("followup")
+
+MODIFIER_PATTERNS = {
+    "pregnancy": r"\bpregnan|\bweeks? pregnant\b|\btrimester\b|\bbreast ?feed",
+    "age": r"\b\d{1,3}[- ]?(years?|yrs?|y/?o|months?|mo)[- ]?old\b|\b\d{1,3} ?y/?o\b|\baged? \d{1,3}\b",
+    "pediatric": r"\b(infant|newborn|baby|toddler|child|kid|my son|my daughter)\b",
+    "elderly": r"\b(elderly|grandm|grandf|nursing home)\b",
+    "immunocompromised": r"\b(chemo|transplant|hiv|immunocompromis|immunosuppress|steroids?)\b",
+}
+_MODIFIERS = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in MODIFIER_PATTERNS.items()}
+
+
+def cluster_key(topics: list) -> str:
+    return "+".join(sorted(set(topics)))
+
+
+def find_modifiers(text: str) -> list:
+    return [name for name, pattern in _MODIFIERS.items() if pattern.search(text or "")]
+
+
+def _question_key(question: str) -> str:
+    return re.sub(r"[^a-z0-9 ]", "", question.lower()).strip()
+
+
+class QuestionBank:
+
+    def __init__(self, path: str = QUESTION_BANK_PATH):
+        self.path = path
+        self.clusters = {}
+        self.built_at = None
+        self.hits = self.misses = 0
+        self.load()
+
+    def load(self):
+        """(Re)load the bank file. A missing file means an empty bank — every request uses the LLM."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        self.clusters = {key: entry["questions"] for key, entry in data.get("clusters", {}).items()
+                         if entry.get("questions")}
+        self.built_at = data.get("built_at")
+        log.info("Question bank loaded", clusters=len(self.clusters))
+
+    def get(self, key: str):
+        questions = self.clusters.get(key) if key else None
+        if questions is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return list(questions)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "clusters": len(self.clusters),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "built_at": self.built_at,
+        }
+
+
+def save_bank(clusters: dict, path: str = QUESTION_BANK_PATH):
+    """clusters: {key: {"questions": [...], "source": "llm" | "history", ...}}"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "clusters": clusters},
+                  f, indent=2)
+    os.replace(tmp, path)
+
+
+_history_lock = threading.Lock()
+
+
+def log_history(key: str, modifiers: list, questions: list, path: str = FOLLOWUP_HISTORY_PATH):
+    """Append one LLM generation to the history log. Blocking file I/O — call via run_cpu."""
+    if not path or not key or not questions:
+        return
+    line = json.dumps({"ts": time.time(), "cluster": key, "modifiers": modifiers, "questions": questions})
+    with _history_lock:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+
+def rank_history(path: str = FOLLOWUP_HISTORY_PATH, min_entries: int = 5, top: int = 5) -> dict:
+    """
+    {cluster: {"questions": [...], "entries": n}} from the history log, for
+    clusters logged at least min_entries times without modifiers. Questions
+    are ranked by how many generations asked them (case/punctuation-insensitive).
+    """
+    counts = defaultdict(Counter)
+    phrasing = {}
+    entries = Counter()
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("modifiers") or not record.get("cluster"):
+                    continue
+                entries[record["cluster"]] += 1
+                for question in record.get("questions", []):
+                    key = _question_key(question)
+                    counts[record["cluster"]][key] += 1
+                    phrasing.setdefault(key, question)
+    except FileNotFoundError:
+        return {}
+    return {
+        cluster: {"questions": [phrasing[key] for key, _ in counts[cluster].most_common(top)], "entries": n}
+        for cluster, n in entries.items() if n >= min_entries
+    }
+
+
+_bank = None
+
+
+def get_question_bank() -> QuestionBank:
+    global _bank
+    if _bank is None:
+        _bank = QuestionBank()
+    return _bank
@@ -0,0 +1,190 @@
+"""
+Responses
+==========
+Response encoding for the API server.
+
+  - dumps(): orjson when installed (several times faster than json and
+    emits UTF-8 bytes directly), else compact stdlib json
+  - FastJSONResponse: the app's default response class. Endpoints that
+    return large pipeline results construct it directly, which also skips
+    FastAPI's jsonable_encoder pass over the nested dicts
+  - CompressionMiddleware: negotiated brotli (when installed) or gzip for
+    complete bodies of at least MEDAI_COMPRESS_MIN_BYTES with a
+    compressible content type. Streaming responses (SSE, NDJSON) pass
+    through untouched so each event is flushed as soon as it is written.
+    Bodies over COMPRESS_OFFLOAD_BYTES are compressed on the CPU pool.
+  - response_stats: per-route response count, raw and on-the-wire bytes,
+    keyed by route template so arbitrary URLs cannot grow it
+
+Config (env):
+  MEDAI_COMPRESS_MIN_BYTES   smallest body worth compressing (default 1024)
+  MEDAI_GZIP_LEVEL           gzip level 1-9 (default 6)
+  MEDAI_BROTLI_QUALITY       brotli quality 0-11 (default 5)
+"""
+
+import gzip
+import json
+import os
+import threading
+from starlette.responses import JSONResponse
+from utils.executor import run_cpu
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("MEDAI_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("MEDAI_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("MEDAI_BROTLI_QUALITY", "5"))
+COMPRESS_OFFLOAD_BYTES = 64 * 1024
+
+_COMPRESSIBLE = (b"application/json", b"text/", b"application/x-ndjson")
+
+
+def _default(obj):
+    if hasattr(obj, "items"):
+        return dict(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class ResponseStats:
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, raw_bytes: int, wire_bytes: int, encoding: str):
+        with self._lock:
+            stats = self._routes.setdefault(route, {"responses": 0, "raw_bytes": 0, "wire_bytes": 0,
+                                                    "max_raw_bytes": 0, "compressed": 0})
+            stats["responses"] += 1
+            stats["raw_bytes"] += raw_bytes
+            stats["wire_bytes"] += wire_bytes
+            stats["max_raw_bytes"] = max(stats["max_raw_bytes"], raw_bytes)
+            if encoding:
+                stats["compressed"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    **stats,
+                    "avg_raw_bytes": stats["raw_bytes"] // stats["responses"],
+                    "avg_wire_bytes": stats["wire_bytes"] // stats["responses"],
+                    "wire_ratio": round(stats["wire_bytes"] / stats["raw_bytes"], 3) if stats["raw_bytes"] else 1.0,
+                }
+                for route, stats in self._routes.items()
+            }
+
+
+response_stats = ResponseStats()
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    offered = set()
+    for part in accept_encoding.lower().replace(" ", "").split(","):
+        name, _, params = part.partition(";")
+        if params not in ("q=0", "q=0.0"):
+            offered.add(name)
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return ""
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def _route_template(scope) -> str:
+    """Matched route's path template ("/admin/profiles/{profile_id}"), or "other" (404s, scans)."""
+    route = scope.get("route")  # FastAPI's router adds it to the shared scope once a route matched
+    return getattr(route, "path", None) or "other"
+
+
+class CompressionMiddleware:
+
+    def __init__(self, app, min_bytes: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        state = {"start": None, "raw": 0, "wire": 0, "encoding": ""}
+
+        async def wrapped_send(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message  # held until we know whether the body is complete
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            state["raw"] += len(body)
+            if state["start"] is not None:
+                start, state["start"] = state["start"], None
+                # A first chunk with more_body is a stream: leave it uncompressed
+                if encoding and not message.get("more_body", False) and self._eligible(start, body):
+                    body = await self._compress(body, encoding)
+                    start = self._encoded_start(start, len(body), encoding)
+                    message = {"type": "http.response.body", "body": body}
+                    state["encoding"] = encoding
+                await send(start)
+            state["wire"] += len(message.get("body", b""))
+            await send(message)
+            if not message.get("more_body", False):
+                response_stats.record(_route_template(scope), state["raw"], state["wire"], state["encoding"])
+
+        await self.app(scope, receive, wrapped_send)
+
+    def _eligible(self, start: dict, body: bytes) -> bool:
+        if len(body) < self.min_bytes:
+            return False
+        response_headers = dict(start.get("headers") or [])
+        if b"content-encoding" in response_headers:
+            return False
+        content_type = response_headers.get(b"content-type", b"")
+        return content_type.startswith(_COMPRESSIBLE)
+
+    async def _compress(self, body: bytes, encoding: str) -> bytes:
+        if len(body) > COMPRESS_OFFLOAD_BYTES:
+            return await run_cpu(compress, body, encoding)
+        return compress(body, encoding)
+
+    @staticmethod
+    def _encoded_start(start: dict, length: int, encoding: str) -> dict:
+        headers = [(k, v) for k, v in start.get("headers") or [] if k.lower() not in (b"content-length", b"vary")]
+        vary = [v for k, v in start.get("headers") or [] if k.lower() == b"vary"]
+        vary_value = (vary[0] + b", Accept-Encoding") if vary else b"Accept-Encoding"
+        headers += [(b"content-encoding", encoding.encode()), (b"content-length", str(length).encode()),
+                    (b"vary", vary_value)]
+        return {**start, "headers": headers}
@@ -0,0 +1,179 @@
+"""
+SemanticAnswerCache
+====================
+Answers repeated generic /chat questions from memory: "is ibuprofen safe
+with alcohol" and "can I drink on advil" are the same question, so the
+second asker gets the first answer without an LLM call.
+
+Only first-turn, generic questions take part. A message is never looked
+up or stored when:
+  - it continues a conversation (the answer depends on context), or
+  - it carries personal details — numbers (ages, doses, durations),
+    "my ...", "I have / I take / I'm ...", pregnancy and other clinical
+    modifiers (utils.question_bank.find_modifiers), contact details
+
+Questions are embedded with the shared sentence encoder (normalized, so
+a dot product is cosine similarity). Similarity alone is not enough:
+"can I take ibuprofen with alcohol" and "can I take acetaminophen with
+alcohol" embed almost identically and have opposite answers. Each entry
+therefore also keeps the drugs (canonical, via utils.drug_names) and
+conditions (CONDITION_PATTERNS) the question mentions, and a hit
+requires exactly the same set. Embeddings live in one preallocated
+float32 matrix of MEDAI_CHAT_CACHE_SIZE rows; a lookup is a single
+matrix-vector product over it — exact nearest neighbour, well under a
+millisecond at this size, so no separate ANN index is needed. Rows are
+reused LRU-first; entries also expire after a TTL.
+
+Config (env):
+  MEDAI_CHAT_CACHE_SIZE       max cached answers (default 2048)
+  MEDAI_CHAT_CACHE_THRESHOLD  min cosine similarity for a hit (default 0.92)
+  MEDAI_CHAT_CACHE_TTL        seconds an answer is reused (default 86400)
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from utils.drug_names import get_drug_normalizer
+from utils.encoder import get_encoder
+from utils.question_bank import find_modifiers
+
+CHAT_CACHE_SIZE = int(os.getenv("MEDAI_CHAT_CACHE_SIZE", "2048"))
+CHAT_CACHE_THRESHOLD = float(os.getenv("MEDAI_CHAT_CACHE_THRESHOLD", "0.92"))
+CHAT_CACHE_TTL = float(os.getenv("MEDAI_CHAT_CACHE_TTL", "86400"))
+
+PERSONAL_PATTERNS = re.compile(
+    r"\d"                                                    # ages, doses, durations, dates
+    r"|\b(my|mine|myself)\b"
+    r"|\bi(?:'m| am| was| have| had| take| took| used| got| feel| felt|'ve)\b"
+    r"|\bme\b"
+    r"|@|\bwww\.|https?://",
+    re.IGNORECASE,
+)
+
+# Conditions that change the answer to an otherwise generic question
+CONDITION_PATTERNS = {
+    "hypertension": r"\bhypertensi|\bhigh blood pressure\b",
+    "hypotension": r"\bhypotensi|\blow blood pressure\b",
+    "diabetes": r"\bdiabet",
+    "asthma": r"\basthma",
+    "copd": r"\bcopd\b|\bemphysema\b",
+    "kidney": r"\bkidney|\brenal\b|\bdialysis\b",
+    "liver": r"\bliver\b|\bhepat|\bcirrhosis\b",
+    "heart": r"\bheart (disease|failure|attack|condition)|\bcardiac\b|\barrhythmi|\batrial fibrillation\b",
+    "stroke": r"\bstroke\b",
+    "ulcer": r"\bulcers?\b|\bgi bleed|\bstomach bleed",
+    "gout": r"\bgout\b",
+    "glaucoma": r"\bglaucoma\b",
+    "epilepsy": r"\bepilep|\bseizures?\b",
+    "thyroid": r"\bthyroid|\bhypothyroid|\bhyperthyroid",
+    "depression": r"\bdepressi",
+    "anxiety": r"\banxiety\b",
+    "migraine": r"\bmigraines?\b",
+    "bleeding_disorder": r"\bhemophilia\b|\bbleeding disorder\b",
+    "blood_thinner": r"\bblood thinners?\b|\banticoagula",
+    "alcohol": r"\balcohol|\bdrinking\b|\bbeer\b|\bwine\b",
+}
+_CONDITIONS = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in CONDITION_PATTERNS.items()}
+
+
+def find_mentions(message: str) -> frozenset:
+    """Drugs and conditions a question is about — cached answers are only shared between equal sets."""
+    conditions = {f"condition:{name}" for name, pattern in _CONDITIONS.items() if pattern.search(message)}
+    return frozenset(get_drug_normalizer().mentions(message)) | conditions
+
+
+def is_cacheable(message: str) -> bool:
+    """Generic question with no personal details."""
+    return bool(message.strip()) and not PERSONAL_PATTERNS.search(message) and not find_modifiers(message)
+
+
+class SemanticAnswerCache:
+
+    def __init__(self, encoder, size: int = CHAT_CACHE_SIZE, threshold: float = CHAT_CACHE_THRESHOLD,
+                 ttl: float = CHAT_CACHE_TTL):
+        import numpy as np
+        self._np = np
+        self.encoder = encoder
+        self.size = size
+        self.threshold = threshold
+        self.ttl = ttl
+        dim = encoder.get_sentence_embedding_dimension()
+        self._vectors = np.zeros((size, dim), dtype=np.float32)  # empty rows are zero → similarity 0
+        self._entries = OrderedDict()  # row → (created_at, question, answer, mentions), LRU order
+        self._free = list(range(size - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.skipped = self.stored = 0
+
+    def probe(self, message: str) -> tuple:
+        """(embedding, mentions) for lookup() and store(). CPU-bound — call via run_cpu."""
+        embedding = self.encoder.encode([message], normalize_embeddings=True)[0].astype(self._np.float32)
+        return embedding, find_mentions(message)
+
+    def lookup(self, probe: tuple):
+        """
+        (answer, similarity) for the nearest fresh entry above the threshold that
+        mentions the same drugs and conditions, else None. Thread-safe.
+        """
+        embedding, mentions = probe
+        with self._lock:
+            scores = self._vectors @ embedding
+            rows = self._np.flatnonzero(scores >= self.threshold)
+            for row in rows[self._np.argsort(-scores[rows])].tolist():
+                entry = self._entries.get(row)
+                if entry is None or entry[3] != mentions:
+                    continue
+                if time.time() - entry[0] > self.ttl:
+                    self._release(row)
+                    continue
+                self._entries.move_to_end(row)
+                self.hits += 1
+                return entry[2], float(scores[row])
+            self.misses += 1
+            return None
+
+    def store(self, probe: tuple, question: str, answer: str):
+        embedding, mentions = probe
+        with self._lock:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row, _ = self._entries.popitem(last=False)
+            self._vectors[row] = embedding
+            self._entries[row] = (time.time(), question, answer, mentions)
+            self.stored += 1
+
+    def _release(self, row: int):
+        del self._entries[row]
+        self._vectors[row] = 0.0
+        self._free.append(row)
+
+    def record_skip(self):
+        self.skipped += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped_personal_or_context": self.skipped,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+        }
+
+
+_cache = None
+_initialized = False
+
+
+def get_semantic_cache():
+    """Shared cache, or None when the sentence encoder (or numpy) is unavailable."""
+    global _cache, _initialized
+    if not _initialized:
+        _initialized = True
+        encoder = get_encoder()
+        if encoder is not None:
+            _cache = SemanticAnswerCache(encoder)
+    return _cache
@@ -1,32 +1,101 @@
 """
 PatientSession — stateful object passed between agents.
 Acts as the shared memory/context across the agentic pipeline.
+
+The session is slotted (no per-instance __dict__) and tracks which fields
+changed: to_context_string() caches each rendered prompt section and only
+re-renders a section when one of its inputs was reassigned. Collections
+are stored frozen (medications as a tuple, follow-up answers as a
+read-only mapping), so an in-place edit fails loudly instead of leaving a
+stale cached prompt — assign a new value instead.
+
+to_bytes() / from_bytes() give a compact, versioned binary form for
+persisting a session or handing it to another worker: msgpack when
+installed, otherwise compact JSON, behind a 4-byte header
+(b"PS", format, version).
 """
 
-from dataclasses import dataclass, field
-from typing import Optional
 import base64
 import json
+from types import MappingProxyType
+from typing import Optional
+from utils.image_preprocess import ImageRejected, PreparedImage, preprocess_image
+from utils.log import get_logger
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
-@dataclass
-class PatientSession:
-    # Intake
-    symptoms: str = ""
-    medications: list = field(default_factory=list)
-    image_path: Optional[str] = None
-    image_b64: Optional[str] = None
+SESSION_MAGIC = b"PS"
+SESSION_VERSION = 1
+_FORMAT_MSGPACK = b"m"
+_FORMAT_JSON = b"j"
 
-    # Follow-up Q&A
-    followup_questions: list = field(default_factory=list)
-    followup_answers: dict = field(default_factory=dict)
+log = get_logger("session")
 
-    # RAG context (retrieved medical docs)
-    rag_context: str = ""
+# Context section → fields it is rendered from
+_SECTION_INPUTS = {
+    "symptoms": ("symptoms",),
+    "medications": ("medications",),
+    "followup": ("followup_answers",),
+    "rag": ("rag_context",),
+}
+_SECTION_OF = {name: section for section, names in _SECTION_INPUTS.items() for name in names}
 
+_FIELDS = (
+    # Intake
+    "symptoms", "medications", "image_path",
+    "images",              # Preprocessed images (PreparedImage); base64 is only built at send time
+    # Follow-up Q&A
+    "followup_questions", "followup_answers",
+    # RAG context (retrieved medical docs)
+    "rag_context",
+    "rag_topics",          # knowledge-base entries retrieved (symptom cluster)
     # Intermediate + final outputs
-    preliminary_triage: Optional[str] = None
-    final_result: Optional[dict] = None
+    "preliminary_triage", "final_result",
+)
+
+
+class PatientSession:
+
+    # trace: the request's utils.tracing.Trace; cache_scope: the client's intake id
+    # (X-Session-Id), which scopes the vision report cache — runtime only, never serialized
+    __slots__ = _FIELDS + ("trace", "cache_scope", "_sections", "_context")
+
+    def __init__(self, symptoms: str = "", medications=(), image_path: Optional[str] = None,
+                 images: list = None, followup_questions: list = None, followup_answers: dict = None,
+                 rag_context: str = "", rag_topics: list = None, preliminary_triage: Optional[str] = None,
+                 final_result: Optional[dict] = None):
+        object.__setattr__(self, "_sections", {})
+        object.__setattr__(self, "_context", None)
+        self.symptoms = symptoms
+        self.medications = medications
+        self.image_path = image_path
+        self.images = images if images is not None else []
+        self.followup_questions = followup_questions if followup_questions is not None else []
+        self.followup_answers = followup_answers or {}
+        self.rag_context = rag_context
+        self.rag_topics = rag_topics if rag_topics is not None else []
+        self.preliminary_triage = preliminary_triage
+        self.final_result = final_result
+        self.trace = None
+        self.cache_scope = None
+
+    def __setattr__(self, name, value):
+        if name == "medications":
+            value = tuple(value or ())
+        elif name == "followup_answers":
+            value = MappingProxyType(dict(value or {}))
+        object.__setattr__(self, name, value)
+        section = _SECTION_OF.get(name)
+        if section is not None:
+            self._sections.pop(section, None)
+            object.__setattr__(self, "_context", None)
+
+    def __repr__(self) -> str:
+        return (f"PatientSession(symptoms={self.symptoms!r}, medications={list(self.medications)!r}, "
+                f"images={len(self.images)}, preliminary_triage={self.preliminary_triage!r})")
 
     def set_intake(self, symptoms: str, medications: list, image_path: Optional[str]):
         self.symptoms = symptoms
@@ -38,25 +107,99 @@ class PatientSession:
     def _load_image(self, path: str):
         try:
             with open(path, "rb") as f:
-                self.image_b64 = base64.b64encode(f.read()).decode("utf-8")
-            print(f"[SESSION] Image loaded: {path}")
+                image = preprocess_image(f)
+            self.add_image(image)
+            log.info("Image loaded", path=path)
         except FileNotFoundError:
-            print(f"[SESSION] Warning: Image not found at {path}. Proceeding without image.")
+            log.warning("Image not found, proceeding without image", path=path)
+        except ImageRejected as e:
+            log.warning("Image rejected, proceeding without image", path=path, reason=str(e))
 
     def add_followup_answers(self, answers: dict):
         self.followup_answers = answers
 
-    def to_context_string(self) -> str:
-        """Serializes session state for prompt injection."""
-        parts = [f"Symptoms: {self.symptoms}"]
-        if self.medications:
-            parts.append(f"Medications: {', '.join(self.medications)}")
-        if self.followup_answers:
+    def _section(self, section: str) -> str:
+        rendered = self._sections.get(section)
+        if rendered is None:
+            rendered = self._sections[section] = self._render(section)
+        return rendered
+
+    def _render(self, section: str) -> str:
+        if section == "symptoms":
+            return f"Symptoms: {self.symptoms}"
+        if section == "medications":
+            return f"Medications: {', '.join(self.medications)}" if self.medications else ""
+        if section == "followup":
+            if not self.followup_answers:
+                return ""
             qa = "\n".join([f"  Q: {q}\n  A: {a}" for q, a in self.followup_answers.items()])
-            parts.append(f"Follow-up Q&A:\n{qa}")
-        if self.rag_context:
-            parts.append(f"Retrieved Medical Context:\n{self.rag_context}")
-        return "\n\n".join(parts)
+            return f"Follow-up Q&A:\n{qa}"
+        return f"Retrieved Medical Context:\n{self.rag_context}" if self.rag_context else ""
+
+    def context_sections(self) -> dict:
+        """The rendered parts of to_context_string() by section, for prompt-size accounting."""
+        return {section: self._section(section) for section in _SECTION_INPUTS}
+
+    def to_context_string(self) -> str:
+        """Serializes session state for prompt injection. Cached until an input field changes."""
+        if self._context is None:
+            parts = [self._section(section) for section in _SECTION_INPUTS]
+            object.__setattr__(self, "_context", "\n\n".join(part for part in parts if part))
+        return self._context
+
+    def add_image(self, image):
+        self.images.append(image)
 
     def has_image(self) -> bool:
-        return self.image_b64 is not None
+        return bool(self.images)
+
+    # ── Serialization ─────────────────────────────────────────────────────────
+
+    def _to_record(self, binary: bool) -> dict:
+        def blob(data: bytes):
+            return data if binary else base64.b64encode(data).decode("ascii")
+
+        return {
+            "s": self.symptoms,
+            "m": list(self.medications),
+            "p": self.image_path,
+            "i": [[blob(img.data), img.mime, img.width, img.height, img.original_bytes, img.phash]
+                  for img in self.images],
+            "fq": list(self.followup_questions),
+            "fa": dict(self.followup_answers),
+            "rc": self.rag_context,
+            "rt": list(self.rag_topics),
+            "pt": self.preliminary_triage,
+            "fr": self.final_result,
+        }
+
+    def to_bytes(self) -> bytes:
+        if msgpack is not None:
+            body = msgpack.packb(self._to_record(binary=True), use_bin_type=True)
+            return SESSION_MAGIC + _FORMAT_MSGPACK + bytes([SESSION_VERSION]) + body
+        body = json.dumps(self._to_record(binary=False), separators=(",", ":")).encode("utf-8")
+        return SESSION_MAGIC + _FORMAT_JSON + bytes([SESSION_VERSION]) + body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PatientSession":
+        if data[:2] != SESSION_MAGIC or len(data) < 4:
+            raise ValueError("Not a serialized PatientSession")
+        fmt, version = data[2:3], data[3]
+        if version != SESSION_VERSION:
+            raise ValueError(f"Unsupported PatientSession version {version} (expected {SESSION_VERSION})")
+        if fmt == _FORMAT_MSGPACK:
+            if msgpack is None:
+                raise ValueError("Session was serialized with msgpack, which is not installed")
+            record = msgpack.unpackb(data[4:], raw=False)
+            blob = bytes
+        elif fmt == _FORMAT_JSON:
+            record = json.loads(data[4:])
+            blob = base64.b64decode
+        else:
+            raise ValueError(f"Unknown PatientSession format {fmt!r}")
+
+        images = [PreparedImage(data=blob(d), mime=mime, width=w, height=h, original_bytes=o, phash=ph)
+                  for d, mime, w, h, o, ph in record["i"]]
+        return cls(symptoms=record["s"], medications=record["m"], image_path=record["p"], images=images,
+                   followup_questions=record["fq"], followup_answers=record["fa"], rag_context=record["rc"],
+                   rag_topics=record["rt"], preliminary_triage=record["pt"], final_result=record["fr"])
@@ -0,0 +1,168 @@
+"""
+Tracing
+========
+Per-request traces for the agent pipeline.
+
+A Trace is started per pipeline run and kept on session.trace. Stages
+open spans:
+
+    with span("rag", kind="agent"):
+        await RAGAgent().run(session)
+
+Code that never sees the session (LLMClient, the OpenFDA fetch) opens
+spans the same way — the active trace and parent span travel in
+contextvars, which asyncio copies into every task a stage starts, so an
+LLM call made inside the triage stage is recorded as triage's child.
+
+A trace also collects the token usage and cost of its LLM calls by stage,
+and their prompt sizes by section (see utils.usage); Trace.debug() is the
+optional "debug" section of a response.
+
+Every span, traced or not, is also observed into the
+medai_span_duration_seconds histogram (utils.metrics), labelled by kind
+and name. A span costs two perf_counter() calls, a contextvar set/reset
+and a histogram observation — a few microseconds against stages that
+take milliseconds to seconds. With MEDAI_TRACEMALLOC=1, agent spans also
+record the stage's memory growth and peak (utils.memory).
+"""
+
+import time
+import uuid
+from contextvars import ContextVar
+from utils.memory import MEMORY_TRACKING, stage_enter, stage_exit
+from utils.metrics import histogram
+
+SPAN_SECONDS = histogram("medai_span_duration_seconds", "Duration of traced pipeline work", ("kind", "name"))
+
+_current_trace = ContextVar("medai_trace", default=None)
+_current_span = ContextVar("medai_span", default=None)
+
+
+class Trace:
+
+    __slots__ = ("id", "endpoint", "started", "spans", "usage", "prompt_sections")
+
+    def __init__(self, endpoint: str = ""):
+        self.id = uuid.uuid4().hex[:16]
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.spans = []
+        self.usage = {}            # stage → {calls, prompt_tokens, completion_tokens, cost_usd}
+        self.prompt_sections = {}  # "stage/section" → estimated prompt tokens
+
+    def add_usage(self, stage: str, prompt_tokens: int, completion_tokens: int, cost_usd: float,
+                  sections: dict = None):
+        usage = self.usage.get(stage)
+        if usage is None:
+            usage = self.usage[stage] = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+        usage["calls"] += 1
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+        usage["cost_usd"] += cost_usd
+        for section, tokens in (sections or {}).items():
+            key = f"{stage}/{section}"
+            self.prompt_sections[key] = self.prompt_sections.get(key, 0) + tokens
+
+    def usage_totals(self) -> dict:
+        return {
+            "calls": sum(u["calls"] for u in self.usage.values()),
+            "prompt_tokens": sum(u["prompt_tokens"] for u in self.usage.values()),
+            "completion_tokens": sum(u["completion_tokens"] for u in self.usage.values()),
+            "cost_usd": round(sum(u["cost_usd"] for u in self.usage.values()), 6),
+        }
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.id,
+            "endpoint": self.endpoint,
+            "duration_ms": round(self.elapsed_ms(), 1),
+            "spans": [s.to_dict(self.started) for s in sorted(self.spans, key=lambda s: s.start)],
+        }
+
+    def debug(self) -> dict:
+        """The optional "debug" section of a response: timings, usage and cost by stage, prompt sections."""
+        return {
+            **self.to_dict(),
+            "usage": {
+                "total": self.usage_totals(),
+                "by_stage": {stage: dict(u, cost_usd=round(u["cost_usd"], 6)) for stage, u in self.usage.items()},
+                "prompt_sections": self.prompt_sections,
+            },
+        }
+
+
+class span:
+    """Context manager timing one unit of work; attributes can be added while it runs via set()."""
+
+    __slots__ = ("name", "kind", "attrs", "parent", "start", "duration", "_token", "_mem")
+
+    def __init__(self, name: str, kind: str = "stage", **attrs):
+        self.name = name
+        self.kind = kind
+        self.attrs = attrs
+        self.parent = None
+        self.duration = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self._mem = stage_enter() if MEMORY_TRACKING and self.kind == "agent" else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            pass  # exited from another context (e.g. an async generator closed elsewhere)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        if self._mem is not None:
+            self.attrs.update(stage_exit(self._mem, self.name))
+        SPAN_SECONDS.observe(self.duration, kind=self.kind, name=self.name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append(self)
+        return False
+
+    def stage(self) -> str:
+        """Nearest enclosing agent span's name — the pipeline stage this work belongs to."""
+        node = self
+        while node is not None:
+            if node.kind == "agent":
+                return node.name
+            node = node.parent
+        return ""
+
+    def to_dict(self, origin: float) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "parent": self.parent.name if self.parent is not None else None,
+            "start_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round(self.duration * 1000, 1),
+            **self.attrs,
+        }
+
+
+def start_trace(endpoint: str = "") -> Trace:
+    """New trace, active for the current task and every task it starts from now on."""
+    trace = Trace(endpoint)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def current_span():
+    return _current_span.get()
@@ -0,0 +1,90 @@
+"""
+Upload Size Limit
+==================
+ASGI middleware enforcing a hard request-body limit on upload routes
+while the body is still streaming in.
+
+The multipart parser spools file parts to a temp file (in memory up to
+1 MB, then on disk), so an accepted upload never sits in RAM whole. This
+middleware makes sure an oversized one is never fully received either:
+
+  - a Content-Length over the limit is refused with 413 before reading
+  - otherwise bytes are counted as they arrive; once the limit is crossed
+    the body is cut off and whatever the app was about to send is
+    replaced with a 413
+
+Config (env):
+  MEDAI_MAX_UPLOAD_MB   per-file limit, shared with image_preprocess
+  MEDAI_MAX_IMAGES      files per request; the body limit is
+                        MAX_IMAGES × per-file limit + 1 MB for form fields
+"""
+
+import json
+from utils.image_preprocess import MAX_IMAGES, MAX_UPLOAD_BYTES
+
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+
+    def __init__(self, app, paths: tuple, max_bytes: int = MAX_IMAGES * MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.paths = tuple(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        state = {"received": 0, "exceeded": False, "responded": False}
+
+        async def limited_receive():
+            if state["exceeded"]:
+                raise _BodyTooLarge()
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > self.max_bytes:
+                    state["exceeded"] = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # The app turns the cut-off body into some error response — replace it
+            if state["exceeded"]:
+                if not state["responded"]:
+                    state["responded"] = True
+                    await self._reject(send)
+                return
+            if message["type"] == "http.response.start":
+                state["responded"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            pass
+        if state["exceeded"] and not state["responded"]:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Upload exceeds {self.max_bytes // (1024 * 1024)} MB limit"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,124 @@
+"""
+Usage
+======
+Token and cost accounting for LLM calls.
+
+Every LLM request (LLMClient, VisionAgent, ChatAgent) reports the usage
+block of its Groq response through utils.llm_client.record_llm_call.
+That adds it:
+  - to the active trace, under the pipeline stage that made the call
+    (nearest enclosing agent span; "chat" etc. outside the pipeline)
+  - to the medai_llm_tokens_total / medai_llm_cost_usd_total metrics,
+    labelled by model and stage
+
+Prompts can also be split into sections (prompt_sections()): estimated
+tokens per inserted part — patient context by section, RAG excerpt, FDA
+data, ... — with the fixed template text as the remainder. That shows
+which part of which prompt the tokens go to.
+
+When a request finishes, its trace is folded into UsageStats: a rolling
+window of the last MEDAI_USAGE_WINDOW requests per endpoint, reported
+under /health as per-request averages by stage and by prompt section.
+
+Prices are USD per million tokens (input, output). MODEL_PRICES holds
+Groq list prices; MEDAI_LLM_PRICES (JSON, same shape) overrides them.
+
+Config (env):
+  MEDAI_USAGE_WINDOW   requests kept per endpoint for rolling stats (default 500)
+  MEDAI_LLM_PRICES     {"model": [input_usd_per_M, output_usd_per_M], ...}
+"""
+
+import json
+import os
+import threading
+from collections import deque
+
+USAGE_WINDOW = int(os.getenv("MEDAI_USAGE_WINDOW", "500"))
+
+MODEL_PRICES = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "meta-llama/llama-4-scout-17b-16e-instruct": (0.11, 0.34),
+    "llama-3.2-11b-vision-preview": (0.18, 0.18),
+    "llama-3.2-90b-vision-preview": (0.90, 0.90),
+}
+MODEL_PRICES.update({model: tuple(price) for model, price in json.loads(os.getenv("MEDAI_LLM_PRICES", "{}")).items()})
+
+CHARS_PER_TOKEN = 4
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def prompt_sections(prompt: str, **parts) -> dict:
+    """
+    Estimated tokens per inserted part of a prompt. A dict value is expanded
+    with its keys as sub-sections ("context.rag"); whatever is left of the
+    prompt is counted as "template".
+    """
+    sections = {}
+    for name, value in parts.items():
+        if isinstance(value, dict):
+            for sub, text in value.items():
+                if text:
+                    sections[f"{name}.{sub}"] = len(text) // CHARS_PER_TOKEN
+        elif value:
+            sections[name] = len(value) // CHARS_PER_TOKEN
+    sections["template"] = max(0, len(prompt) // CHARS_PER_TOKEN - sum(sections.values()))
+    return sections
+
+
+class UsageStats:
+
+    def __init__(self, window: int = USAGE_WINDOW):
+        self.window = window
+        self._requests = {}  # endpoint → deque of per-request summaries
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        """Fold one finished request's trace into its endpoint's window."""
+        if not trace.usage:
+            return
+        with self._lock:
+            requests = self._requests.get(trace.endpoint)
+            if requests is None:
+                requests = self._requests[trace.endpoint] = deque(maxlen=self.window)
+            requests.append((trace.usage_totals(), dict(trace.usage), dict(trace.prompt_sections)))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            windows = {endpoint: list(requests) for endpoint, requests in self._requests.items()}
+        return {endpoint: self._summarize(requests) for endpoint, requests in windows.items()}
+
+    @staticmethod
+    def _summarize(requests: list) -> dict:
+        n = len(requests)
+        prompt = sorted(totals["prompt_tokens"] for totals, _, _ in requests)
+        by_stage, by_section = {}, {}
+        for _, stages, sections in requests:
+            for stage, usage in stages.items():
+                agg = by_stage.setdefault(stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                                  "cost_usd": 0.0})
+                for key in agg:
+                    agg[key] += usage[key]
+            for section, tokens in sections.items():
+                by_section[section] = by_section.get(section, 0) + tokens
+
+        def per_request(values: dict) -> dict:
+            return {key: round(value / n, 6 if key == "cost_usd" else 1) for key, value in values.items()}
+
+        return {
+            "requests": n,
+            "avg_prompt_tokens": round(sum(prompt) / n, 1),
+            "p95_prompt_tokens": prompt[min(n - 1, int(n * 0.95))],
+            "avg_completion_tokens": round(sum(t["completion_tokens"] for t, _, _ in requests) / n, 1),
+            "avg_cost_usd": round(sum(t["cost_usd"] for t, _, _ in requests) / n, 6),
+            "by_stage": {stage: per_request(values) for stage, values in by_stage.items()},
+            "prompt_sections_avg_tokens": {section: round(tokens / n, 1)
+                                           for section, tokens in sorted(by_section.items(),
+                                                                         key=lambda item: -item[1])},
+        }
+
+
+usage_stats = UsageStats()
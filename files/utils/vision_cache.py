@@ -0,0 +1,126 @@
+"""
+VisionReportCache
+==================
+Reuses image reports for resubmitted photos (patient retries after an
+error, doctor re-running an assessment) so a repeat skips the vision model.
+
+Key: the client's intake scope (session.cache_scope, sent as the
+X-Session-Id header), a hash of the normalized symptoms text and the
+perceptual hash of the normalized image (PreparedImage.phash). Reports
+are never shared between scopes — two patients' similar rash photos with
+the same short symptom text must each get their own analysis — and a
+request without a scope is neither looked up nor stored.
+
+Within a scope, a lookup matches an image hash within
+VISION_CACHE_MAX_DISTANCE bits. The default, 0, needs the same
+normalized image; raising it lets a re-encoded or re-scaled resubmission
+of the same photo hit too.
+
+Entries live only in memory (patient images stay out of persistent
+storage), bounded by LRU size and TTL. Lookups scan only the entries
+for the same scope and symptoms, so they stay cheap.
+
+Config (env):
+  MEDAI_VISION_CACHE_SIZE          max entries (default 1024)
+  MEDAI_VISION_CACHE_TTL           seconds an entry is valid (default 3600)
+  MEDAI_VISION_CACHE_MAX_DISTANCE  max Hamming distance for a hit (default 0 = same image)
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+VISION_CACHE_SIZE = int(os.getenv("MEDAI_VISION_CACHE_SIZE", "1024"))
+VISION_CACHE_TTL = float(os.getenv("MEDAI_VISION_CACHE_TTL", "3600"))
+VISION_CACHE_MAX_DISTANCE = int(os.getenv("MEDAI_VISION_CACHE_MAX_DISTANCE", "0"))
+
+
+def symptoms_key(symptoms: str) -> str:
+    normalized = " ".join((symptoms or "").lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+class VisionReportCache:
+
+    def __init__(self, size: int = VISION_CACHE_SIZE, ttl: float = VISION_CACHE_TTL,
+                 max_distance: int = VISION_CACHE_MAX_DISTANCE):
+        self.size = size
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # ((scope, symptoms_key), phash) → (created_at, report)
+        self._by_symptoms = {}         # (scope, symptoms_key) → set of phashes
+        self._lock = threading.Lock()
+        self.hits = self.near_hits = self.misses = 0
+        self.evictions = self.expirations = 0
+
+    def _drop(self, key: tuple):
+        del self._entries[key]
+        phashes = self._by_symptoms.get(key[0])
+        if phashes is not None:
+            phashes.discard(key[1])
+            if not phashes:
+                del self._by_symptoms[key[0]]
+
+    def get(self, phash: int, symptoms: str, scope: str):
+        """Stored report for the same (or near-duplicate) image with the same symptoms in this scope, else None."""
+        if not phash or not scope:
+            return None
+        skey = (scope, symptoms_key(symptoms))
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            best = None
+            for candidate in list(self._by_symptoms.get(skey, ())):
+                key = (skey, candidate)
+                if self._entries[key][0] < cutoff:
+                    self._drop(key)
+                    self.expirations += 1
+                    continue
+                distance = bin(candidate ^ phash).count("1")
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, key)
+            if best is None:
+                self.misses += 1
+                return None
+            distance, key = best
+            self._entries.move_to_end(key)
+            if distance:
+                self.near_hits += 1
+            else:
+                self.hits += 1
+            return self._entries[key][1]
+
+    def put(self, phash: int, symptoms: str, scope: str, report: str):
+        if not phash or not scope:
+            return
+        key = ((scope, symptoms_key(symptoms)), phash)
+        with self._lock:
+            self._entries[key] = (time.time(), report)
+            self._entries.move_to_end(key)
+            self._by_symptoms.setdefault(key[0], set()).add(phash)
+            while len(self._entries) > self.size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.near_hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.near_hits) / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self._entries),
+        }
+
+
+_cache = None
+
+
+def get_vision_cache() -> VisionReportCache:
+    global _cache
+    if _cache is None:
+        _cache = VisionReportCache()
+    return _cache
@@ -0,0 +1,49 @@
+"""
+Preload the OpenFDA label cache with the top N formulary drugs so the
+common case needs no network at request time.
+
+Run:
+    python warm_label_cache.py            # all of TOP_FORMULARY_DRUGS
+    python warm_label_cache.py --top 20
+    python warm_label_cache.py --file formulary.txt   # one drug per line, all of them
+
+Only label lookups are made, so GROQ_API_KEY is not needed.
+"""
+
+import argparse
+import asyncio
+import time
+from agents.drug_agent import query_openfda
+from utils.drug_names import TOP_FORMULARY_DRUGS
+from utils.http_client import close_http_session
+from utils.label_cache import get_label_cache
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Preload the OpenFDA label cache.")
+    parser.add_argument("--top", type=int, default=None, help="preload only the first N drugs (default: all)")
+    parser.add_argument("--file", help="formulary file, one drug per line, most-dispensed first")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file) as f:
+            drugs = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        drugs = TOP_FORMULARY_DRUGS
+    if args.top is not None:
+        drugs = drugs[:args.top]
+
+    print(f"[WARMUP] Preloading {len(drugs)} drug label(s)...")
+    start = time.perf_counter()
+    try:
+        await query_openfda(drugs)
+    finally:
+        await close_http_session()
+
+    cache = get_label_cache()
+    print(f"[WARMUP] Done in {time.perf_counter() - start:.1f}s. {cache.stats()}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -17,6 +17,7 @@ export default function ChatbotWidget() {
     ]);
     const [input, setInput] = useState('');
     const [loading, setLoading] = useState(false);
+    const [conversationId, setConversationId] = useState<string | null>(null);
     const bottomRef = useRef<HTMLDivElement>(null);
 
     useEffect(() => {
@@ -36,7 +37,10 @@ export default function ChatbotWidget() {
         setMessages(prev => [...prev, userMsg]);
         setLoading(true);
         try {
-            const reply = await chatWithAI(text, [...messages, userMsg]);
+            // The canned greeting is not conversation: leave it out so a first question counts as one
+            const history = messages.some(m => m.role === 'user') ? messages : [];
+            const { reply, conversationId: id } = await chatWithAI(text, conversationId, history);
+            setConversationId(id);
             setMessages(prev => [...prev, { role: 'assistant', content: reply }]);
         } catch {
             setMessages(prev => [...prev, { role: 'assistant', content: 'Sorry, I can\'t connect right now. For urgent concerns, please call emergency services.' }]);
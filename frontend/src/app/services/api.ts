@@ -47,10 +47,13 @@ export async function analyzeSymptoms(
     return response.json();
 }
 
+// sessionId: one id per patient intake, reused when resubmitting it — lets the AI service
+// reuse that intake's image reports (never another patient's)
 export async function analyzeSymptomsWithImage(
     symptoms: string,
     medications: string[] = [],
-    imageFile: File
+    imageFile: File,
+    sessionId?: string
 ): Promise<AIResult> {
     const formData = new FormData();
     formData.append('symptoms', symptoms);
@@ -58,6 +61,7 @@ export async function analyzeSymptomsWithImage(
     formData.append('image', imageFile);
     const response = await fetch(`${AI_BASE_URL}/assess/image`, {
         method: 'POST',
+        headers: sessionId ? { 'X-Session-Id': sessionId } : undefined,
         body: formData,
     });
     if (!response.ok) {
@@ -81,18 +85,22 @@ export async function getFollowupQuestions(
     return data.questions || [];
 }
 
+// The AI service keeps the conversation: send back the conversationId it returned.
+// history is only used to start a new conversation (e.g. after the old one expired).
 export async function chatWithAI(
     message: string,
+    conversationId: string | null = null,
     history: Array<{ role: string; content: string }> = []
-): Promise<string> {
+): Promise<{ reply: string; conversationId: string | null }> {
     const response = await fetch(`${AI_BASE_URL}/chat`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message, history }),
+        body: JSON.stringify(conversationId ? { message, conversation_id: conversationId } : { message, history }),
     });
-    if (!response.ok) return 'Sorry, I could not connect to the AI service.';
+    if (response.status === 404 && conversationId) return chatWithAI(message, null, history);
+    if (!response.ok) return { reply: 'Sorry, I could not connect to the AI service.', conversationId };
     const data = await response.json();
-    return data.reply || 'No response.';
+    return { reply: data.reply || 'No response.', conversationId: data.conversation_id || null };
 }
 
 // ── Auth ──